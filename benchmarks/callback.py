@@ -0,0 +1,135 @@
+"""
+Microbenchmark of the audio callback hot path.
+
+Runs CaptureHub.callback with the listener's wake-word consumer attached
+(a detector stub that only keeps the frame) on 512-sample blocks, once with
+the float32 blocks the stream used to deliver and once with int16 blocks,
+and reports the time per callback and the memory allocated per minute of
+audio (tracemalloc).
+
+It also checks that the detector receives exactly the frames the old
+`(indata[:, 0] * 32767).astype(np.int16)` conversion produced: on the float32
+path, and on the int16 path when the device delivers those same samples.
+
+Usage (from the repository root):
+    python -m benchmarks.callback [--callbacks 20000] [--seconds 60]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from raven.assistant.audio import CaptureHub
+from raven.assistant.listener import Listener
+from raven.settings import DEFAULT_SETTINGS, Settings
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 512
+
+class Detector:
+    """
+    Stands in for Porcupine: records the last frame (or every frame, as copies).
+    """
+
+    def __init__(self, keep: bool = False):
+        self.keep = keep
+        self.frames = []
+        self.last = None
+
+    def process(self, pcm) -> int:
+        if self.keep:
+            self.frames.append(np.array(pcm))
+        self.last = pcm
+        return -1
+
+def listen(detector: Detector):
+    """
+    A hub with the listener's wake-word consumer attached.
+    """
+
+    hub = CaptureHub(SAMPLE_RATE, FRAME_LENGTH)
+    listener = Listener(Settings(dict(DEFAULT_SETTINGS)), detector, None, hub)
+    listener.start()
+    return hub, listener
+
+def float_blocks(n: int, seed: int = 0) -> list:
+    """
+    `n` float32 input blocks shaped like sounddevice's (frames, channels).
+    """
+
+    rng = np.random.default_rng(seed)
+    audio = (rng.standard_normal(n * FRAME_LENGTH) * 0.2).clip(-1.0, 1.0).astype(np.float32)
+    return [block.reshape(-1, 1) for block in np.split(audio, n)]
+
+def old_conversion(block: np.ndarray) -> np.ndarray:
+    return (block[:, 0] * 32767).astype(np.int16)
+
+def measure(blocks: list, callbacks: int, seconds: float) -> dict:
+    hub, listener = listen(Detector())
+    try:
+        for block in blocks[:200]:
+            hub.callback(block, FRAME_LENGTH, None, None)
+
+        started = time.perf_counter()
+        for i in range(callbacks):
+            hub.callback(blocks[i % len(blocks)], FRAME_LENGTH, None, None)
+        per_callback = (time.perf_counter() - started) / callbacks
+
+        # Count allocations over `seconds` of audio
+        count = int(seconds * SAMPLE_RATE / FRAME_LENGTH)
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for i in range(count):
+            hub.callback(blocks[i % len(blocks)], FRAME_LENGTH, None, None)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    finally:
+        listener.stop()
+
+    diff = after.compare_to(before, "filename")
+    # Blocks allocated and freed again within the loop are in the counts
+    allocated = sum(max(stat.size_diff, 0) for stat in diff)
+    return {"us": per_callback * 1e6, "bytes_per_minute": allocated * 60 / seconds}
+
+def frames_match(blocks: list) -> dict:
+    """
+    Compares what the detector receives with the old conversion, block by block.
+    """
+
+    expected = [old_conversion(block) for block in blocks]
+    results = {}
+    for name, inputs in (("float32", blocks), ("int16", [e.reshape(-1, 1) for e in expected])):
+        detector = Detector(keep=True)
+        hub, listener = listen(detector)
+        try:
+            for block in inputs:
+                hub.callback(block, FRAME_LENGTH, None, None)
+        finally:
+            listener.stop()
+        results[name] = len(detector.frames) == len(expected) and all(
+            frame.dtype == np.int16 and np.array_equal(frame, e) for frame, e in zip(detector.frames, expected))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the audio callback for float32 and int16 input.")
+    parser.add_argument("--callbacks", type=int, default=20000, help="callbacks to time per dtype")
+    parser.add_argument("--seconds", type=float, default=60.0, help="audio to count allocations over")
+    args = parser.parse_args()
+
+    blocks = float_blocks(1000)
+    inputs = {"float32": blocks, "int16": [old_conversion(block).reshape(-1, 1) for block in blocks]}
+    for dtype, data in inputs.items():
+        r = measure(data, args.callbacks, args.seconds)
+        print(f"{dtype:8} {r['us']:6.2f} us/callback  {r['bytes_per_minute'] / 1024:8.1f} KiB allocated per minute")
+
+    # Full scale, clipping and values just below each integer step
+    edges = np.array([-1.0, 1.0, 0.0, -0.0, 1 / 32767, -1 / 32767, 0.99999994, -0.99999994]
+                     + [np.nextafter(k / 32767, 0) for k in range(-5, 6)], dtype=np.float32)
+    edges = np.resize(edges, FRAME_LENGTH).reshape(-1, 1)
+    for dtype, ok in frames_match(blocks + [edges]).items():
+        print(f"{dtype:8} detector frames match the old conversion: {'yes' if ok else 'NO'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Allocations and CPU per block of command capture, before and after the
+preallocated ring buffer.
+
+- original: the old `record_command` callback. It converts every float32 block
+  to int16, appends it to a deque, meters it with `np.abs(chunk).mean()`
+  and joins everything with `np.concatenate(...).flatten().tobytes()` at the end.
+- ring: CommandRecorder writing int16 blocks (what the stream now delivers)
+  into its preallocated RingBuffer, with the VAD deciding the endpoint and
+  the audio handed over as a zero-copy memoryview. "ring only" leaves out
+  the VAD, which does more per block than the old metering.
+
+Both get the same 1024-sample blocks of continuous speech-like audio. CPU is
+measured with `time.process_time`. Allocations are measured with
+tracemalloc, as bytes allocated and freed within a block (transient) and
+bytes still held after it (retained). The last line shows the memory held
+after `--talk` seconds of speech that never falls silent.
+
+Usage (from the repository root):
+    python -m benchmarks.capture [--seconds 10] [--repeat 20] [--talk 60]
+"""
+
+import argparse
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+from raven.assistant.audio import CommandRecorder
+from raven.assistant.vad import VoiceActivityDetector
+
+SAMPLE_RATE = 16000
+BLOCK = 1024
+
+def speech_blocks(seconds: float, dtype=np.float32, seed: int = 0) -> list:
+    """
+    Blocks shaped like sounddevice's (frames, channels) input.
+    """
+
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE) // BLOCK
+    t = np.arange(n * BLOCK) / SAMPLE_RATE
+    audio = 0.1 * np.sin(2 * np.pi * 200 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)) + rng.normal(0, 0.002, len(t))
+    audio = audio.astype(np.float32)
+    if dtype == np.int16:
+        audio = (audio * 32767).astype(np.int16)
+    return [block.reshape(-1, 1) for block in np.split(audio, n)]
+
+class Original:
+    """
+    The capture path before the ring buffer.
+    """
+
+    dtype = np.float32
+
+    def __init__(self, max_samples: int):
+        self.buffer = deque()
+        self.silence_chunks = 0
+
+    def feed(self, indata):
+        chunk = (indata[:, 0] * 32767).astype(np.int16)
+        self.buffer.append(chunk)
+        volume = int(np.abs(chunk).mean())
+        self.silence_chunks = 0 if volume > 10 else self.silence_chunks + 1
+
+    def finish(self):
+        return np.concatenate(list(self.buffer)).flatten().tobytes()
+
+class Ring:
+    """
+    The capture path on a preallocated ring buffer.
+    """
+
+    dtype = np.int16
+
+    def __init__(self, max_samples: int):
+        vad = VoiceActivityDetector(SAMPLE_RATE)
+        self.recorder = CommandRecorder(max_samples, vad.process)
+
+    def feed(self, block):
+        self.recorder.feed(block[:, 0])
+
+    def finish(self):
+        return memoryview(self.recorder.buffer.linear()).cast("B")
+
+class RingOnly(Ring):
+    """
+    The ring buffer alone, to separate its cost from the VAD's.
+    """
+
+    def __init__(self, max_samples: int):
+        self.recorder = CommandRecorder(max_samples, lambda block: False)
+
+def cpu_per_block(path, blocks: list, max_samples: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        capture = path(max_samples)
+        started = time.process_time()
+        for block in blocks:
+            capture.feed(block)
+        capture.finish()
+        best = min(best, time.process_time() - started)
+    return best / len(blocks) * 1e6
+
+def allocations_per_block(path, blocks: list, max_samples: int) -> dict:
+    capture = path(max_samples)
+    tracemalloc.start()
+    transient = retained = 0
+    for block in blocks:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        capture.feed(block)
+        current, peak = tracemalloc.get_traced_memory()
+        transient += peak - current
+        retained += current - before
+
+    before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    audio = capture.finish()
+    finish = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    del audio
+    return {"transient": transient / len(blocks), "retained": retained / len(blocks), "finish": finish}
+
+def held_after(path, seconds: float, max_samples: int) -> int:
+    """
+    Bytes held by a capture fed `seconds` of speech with no pause.
+    """
+
+    blocks = speech_blocks(1.0, path.dtype)
+    tracemalloc.start()
+    capture = path(max_samples)
+    for i in range(int(seconds * SAMPLE_RATE) // BLOCK):
+        capture.feed(blocks[i % len(blocks)])
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure allocations and CPU per captured block.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of the utterance (and of the ring buffer)")
+    parser.add_argument("--repeat", type=int, default=20, help="timing runs per path (the best is kept)")
+    parser.add_argument("--talk", type=float, default=60.0, help="seconds of non-stop speech for the memory bound")
+    args = parser.parse_args()
+
+    max_samples = int(args.seconds * SAMPLE_RATE)
+    print(f"{int(args.seconds * SAMPLE_RATE) // BLOCK} blocks of {BLOCK} samples")
+
+    for name, path in (("original", Original), ("ring", Ring), ("ring only", RingOnly)):
+        blocks = speech_blocks(args.seconds, path.dtype)
+        cpu = cpu_per_block(path, blocks, max_samples, args.repeat)
+        alloc = allocations_per_block(path, blocks, max_samples)
+        held = held_after(path, args.talk, max_samples)
+        print(f"{name:9} {cpu:6.2f} us CPU/block  {alloc['transient']:8.0f} B transient/block  "
+              f"{alloc['retained']:7.0f} B retained/block  {alloc['finish'] / 1024:6.1f} KiB to hand over  "
+              f"{held / 1024:7.1f} KiB held after {args.talk:.0f}s of speech")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Endpointing delay of command capture, driven by WAV files.
+
+Each clip is replayed through the listener (raven.assistant.replay) with the
+wake word at a known position. The delay is the audio between the end of
+speech and the end of the capture, i.e. the dead time before recognition
+starts; a negative delay means the VAD cut the speaker off.
+
+Without files, clips are generated (wake word, a pause, a command with a
+short gap between words, then room noise) in a quiet and a noisy room, and
+written to WAV files first so they take the same path as recordings. For
+recordings the speech end is given with --speech-end or, failing that,
+estimated from the clip's energy.
+
+Usage (from the repository root):
+    python -m benchmarks.endpointing [file.wav ...] [--wake-at 1.2,0.9] [--speech-end 3.1,2.4] [--sensitivity 50]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import wave
+
+import numpy as np
+
+from raven.assistant.replay import FRAME_LENGTH, SAMPLE_RATE, load_wav, replay
+
+# (room, noise level, command seconds) of the generated clips
+CLIPS = [(room, noise, length) for room, noise in (("quiet", 40), ("noisy", 400))
+         for length in (0.6, 1.2, 2.0, 3.0)]
+
+def speech(seconds: float, rng) -> np.ndarray:
+    """
+    A speech-like burst of `seconds` with a 150 ms gap between "words".
+    """
+
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    burst = 3000 * np.sin(2 * np.pi * rng.uniform(150, 250) * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+    gap = int(0.4 * len(t))
+    burst[gap:gap + int(0.15 * SAMPLE_RATE)] = 0
+    # Fade out over the last 50 ms, like a trailing syllable
+    fade = min(len(t), int(0.05 * SAMPLE_RATE))
+    burst[len(t) - fade:] *= np.linspace(1, 0, fade)
+    return burst
+
+def generate(noise: float, length: float, seed: int):
+    """
+    Returns (samples, wake word end, speech end) for one generated clip.
+    """
+
+    rng = np.random.default_rng(seed)
+    wake_at = int(1.5 * SAMPLE_RATE)
+    start = wake_at + int(0.3 * SAMPLE_RATE)
+    words = speech(length, rng)
+    samples = rng.normal(0, noise, start + len(words) + 3 * SAMPLE_RATE)
+    samples[wake_at - int(0.6 * SAMPLE_RATE):wake_at] += speech(0.6, rng)
+    samples[start:start + len(words)] += words
+    return np.clip(samples, -32768, 32767).astype(np.int16), wake_at, start + len(words)
+
+def write_wav(path: str, samples: np.ndarray):
+    with wave.open(path, "wb") as fh:
+        fh.setnchannels(1)
+        fh.setsampwidth(2)
+        fh.setframerate(SAMPLE_RATE)
+        fh.writeframes(samples.tobytes())
+
+def estimate_speech_end(samples: np.ndarray, wake_at: int) -> int:
+    """
+    The end of the last 10 ms frame after the wake word that is well above
+    the clip's noise floor.
+    """
+
+    hop = SAMPLE_RATE // 100
+    frames = samples[:len(samples) // hop * hop].astype(np.float64).reshape(-1, hop)
+    energy = (frames ** 2).mean(axis=1)
+    floor = max(np.percentile(energy, 10), 1.0)
+    loud = np.flatnonzero(energy[wake_at // hop:] > floor * 10)
+    return wake_at + (int(loud[-1]) + 1) * hop if len(loud) else wake_at
+
+def measure(samples: np.ndarray, wake_at: int, speech_end: int, sensitivity: float, verbose: bool) -> dict:
+    out = io.StringIO()
+    with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(out):
+        report = replay(samples, [wake_at], settings={"mic_sensitivity": sensitivity})
+    if not report["captures"]:
+        return {"delay_ms": None}
+    start, end = report["captures"][0]
+    return {"delay_ms": (end - speech_end) / SAMPLE_RATE * 1000, "capture_ms": (end - start) / SAMPLE_RATE * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the delay from end of speech to end of capture.")
+    parser.add_argument("files", nargs="*", help="16 kHz 16-bit WAV files, one command each (generated if omitted)")
+    parser.add_argument("--wake-at", default="", help="comma-separated wake word end per file, in seconds")
+    parser.add_argument("--speech-end", default="", help="comma-separated end of speech per file, in seconds")
+    parser.add_argument("--sensitivity", type=float, default=50, help="mic_sensitivity setting (0-100)")
+    parser.add_argument("--verbose", action="store_true", help="show the listener's output")
+    args = parser.parse_args()
+
+    clips = []
+    if args.files:
+        wakes = [float(t) for t in args.wake_at.split(",")] if args.wake_at else [0.0] * len(args.files)
+        ends = [float(t) for t in args.speech_end.split(",")] if args.speech_end else [None] * len(args.files)
+        for path, wake, end in zip(args.files, wakes, ends):
+            samples = load_wav(path)
+            wake_at = int(wake * SAMPLE_RATE)
+            speech_end = int(end * SAMPLE_RATE) if end is not None else estimate_speech_end(samples, wake_at)
+            clips.append((os.path.basename(path), samples, wake_at, speech_end))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            for seed, (room, noise, length) in enumerate(CLIPS):
+                samples, wake_at, speech_end = generate(noise, length, seed)
+                path = os.path.join(tmp, f"{room}_{length:.1f}s.wav")
+                write_wav(path, samples)
+                clips.append((os.path.basename(path), load_wav(path), wake_at, speech_end))
+
+    delays = []
+    cut_off = 0
+    for name, samples, wake_at, speech_end in clips:
+        # The detector fires on the frame holding the wake word's last sample
+        r = measure(samples, max(wake_at - 1, 0), speech_end, args.sensitivity, args.verbose)
+        if r["delay_ms"] is None:
+            print(f"{name:24} no capture")
+            continue
+        # Capture ends on frame boundaries, so allow one frame of early end
+        cut = r["delay_ms"] < -FRAME_LENGTH / SAMPLE_RATE * 1000
+        delays.append(r["delay_ms"])
+        cut_off += cut
+        note = "  CUT OFF" if cut else ""
+        print(f"{name:24} speech ends {speech_end / SAMPLE_RATE:5.2f}s  capture {r['capture_ms']:6.0f} ms  "
+              f"endpointing delay {r['delay_ms']:6.0f} ms{note}")
+
+    if delays:
+        print(f"\nEndpointing delay: p50 {np.percentile(delays, 50):.0f} ms, max {max(delays):.0f} ms, "
+              f"{cut_off} of {len(delays)} cut off (sensitivity {args.sensitivity:.0f})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Latency of a current-weather answer with the forecast cache off, warm and stale.
+
+A local HTTP server stands in for Open-Meteo: it answers every forecast
+request with a realistic payload after `--latency` seconds, like a network
+round trip. Each mode calls `parse_meteo_message` (forecast lookup plus
+formatting) `--requests` times:
+
+- off: the cache is emptied before every call, so each one waits for the server;
+- warm: the entry is fresh and answered from memory;
+- stale: the entry is past its expiry before every call, so the cached data
+  is returned at once and a background refresh goes to the server.
+
+Usage (from the repository root):
+    python -m benchmarks.forecast_cache [--requests 200] [--latency 0.15]
+"""
+
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from raven.assistant.actions import weather
+from raven.assistant.actions.forecast import FORECAST_DAYS
+
+LAT, LON = 48.8566, 2.3522
+
+def payload() -> dict:
+    """
+    An Open-Meteo response for the forecast fields Raven requests.
+    """
+
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    hours = [now + timedelta(hours=h) for h in range(FORECAST_DAYS * 24)]
+    days = [now.date() + timedelta(days=d) for d in range(FORECAST_DAYS)]
+    return {
+        "latitude": LAT,
+        "longitude": LON,
+        "utc_offset_seconds": 0,
+        "current_weather": {"time": now.isoformat(timespec="minutes"), "interval": 900, "temperature": 61.3,
+                            "windspeed": 7.4, "winddirection": 220, "weathercode": 3},
+        "hourly": {"time": [h.isoformat(timespec="minutes") for h in hours],
+                   "temperature_2m": [60 + (i % 24) / 3 for i in range(len(hours))],
+                   "precipitation_probability": [(i * 7) % 100 for i in range(len(hours))],
+                   "weathercode": [(0, 2, 3, 61)[i % 4] for i in range(len(hours))]},
+        "daily": {"time": [d.isoformat() for d in days], "weathercode": [3] * len(days),
+                  "temperature_2m_max": [68.0] * len(days), "temperature_2m_min": [52.0] * len(days),
+                  "precipitation_probability_max": [40] * len(days)},
+    }
+
+class FakeOpenMeteo:
+    """
+    Local stand-in for api.open-meteo.com.
+    """
+
+    def __init__(self, latency: float):
+        body = json.dumps(payload()).encode()
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/v1/forecast"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def clear():
+    with weather.forecast_lock:
+        weather.forecast_cache.clear()
+
+def make_stale():
+    with weather.forecast_lock:
+        entry = weather.forecast_cache[weather.forecast_bucket(LAT, LON)]
+        entry["expires"] = time.time() - 1
+
+def wait_for_refresh():
+    while weather.forecast_refreshing:
+        time.sleep(0.001)
+
+def run(requests: int, before=None, after=None) -> np.ndarray:
+    times = np.zeros(requests)
+    for i in range(requests):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        message = weather.parse_meteo_message(LAT, LON, "Paris, France")
+        times[i] = time.perf_counter() - started
+        if message is None:
+            raise RuntimeError("no weather message")
+        if after is not None:
+            after()
+    return times * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Time weather answers with the forecast cache off, warm and stale.")
+    parser.add_argument("--requests", type=int, default=200, help="answers to time per mode")
+    parser.add_argument("--latency", type=float, default=0.15, help="seconds the fake server takes to answer")
+    args = parser.parse_args()
+
+    server = FakeOpenMeteo(args.latency)
+    url, weather.FORECAST_URL = weather.FORECAST_URL, server.url
+    try:
+        # Open the pooled connection first so "off" measures requests, not the handshake
+        clear()
+        run(1)
+
+        modes = (("off", clear, None), ("warm", None, None), ("stale", make_stale, wait_for_refresh))
+        for name, before, after in modes:
+            requests = server.requests
+            times = run(args.requests, before, after)
+            print(f"{name:6} p50 {np.percentile(times, 50):8.3f} ms  p99 {np.percentile(times, 99):8.3f} ms  "
+                  f"server requests {server.requests - requests}")
+    finally:
+        weather.FORECAST_URL = url
+        server.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Equivalence check and benchmark of the heuristic intent router.
+
+Three routers run on every utterance of benchmarks/intent_corpus.txt, about
+3000 commands phrased as speech recognition returns them (`--generate` adds
+random recombinations of their words, to probe odd word orders):
+
+- indexed: `detect_heuristic`, which only tries the rules anchored on a word
+  of the utterance;
+- linear: every rule of INTENT_RULES in priority order, without the index;
+- original: the router before the rule table, one `re.search` per intent.
+
+The indexed router must return exactly what the linear one does; a
+difference means a rule's anchor words miss a phrasing its pattern accepts.
+Against the original router the intents must agree, as must payloads
+except for weather, whose location now has time qualifiers removed. The
+weather phrasings in PARSE_CASES must parse to their expected location and
+time qualifier.
+
+Usage (from the repository root):
+    python -m benchmarks.intents [--generate 0] [--repeat 5]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+from raven.assistant.processor import INTENT_RULES, detect_heuristic, match_rule
+
+CORPUS_PATH = Path(__file__).with_name("intent_corpus.txt")
+
+# Weather phrasings and their expected (location, time qualifier)
+PARSE_CASES = [
+    ("weather in paris for tomorrow", "paris", "tomorrow"),
+    ("weather for tomorrow in paris", "paris", "tomorrow"),
+    ("what's the weather in paris tomorrow", "paris", "tomorrow"),
+    ("weather in berlin today", "berlin", "today"),
+    ("weather tonight in madrid", "madrid", "tonight"),
+    ("weather in London this evening", "London", "this evening"),
+    ("temperature in tokyo later today", "tokyo", "later"),
+    ("forecast for london for the next 3 hours", "london", "next 3 hours"),
+    ("what is the weather like in paris during the next few hours", "paris", "next few hours"),
+    ("is there rain in the forecast for london", "london", None),
+    ("weather in new york", "new york", None),
+    ("will it rain later", None, "later"),
+    ("weather", None, None),
+]
+
+def load_corpus(path: Path = CORPUS_PATH) -> list:
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [line for line in lines if line.strip() and not line.startswith("#")]
+
+def generate(corpus: list, n: int, seed: int = 0) -> list:
+    """
+    `n` utterances of 1-8 words drawn from the corpus vocabulary.
+    """
+
+    rng = random.Random(seed)
+    words = sorted({word for line in corpus for word in line.split()})
+    return [" ".join(rng.choices(words, k=rng.randint(1, 8))) for _ in range(n)]
+
+def detect_linear(text: str) -> dict:
+    for i in range(len(INTENT_RULES)):
+        result = match_rule(i, text)
+        if result is not None:
+            return result
+    return {"intent": "unknown", "payload": text}
+
+def detect_original(text: str) -> dict:
+    m = re.search(r"\b(?:weather|forecast|temperature|rain|snow|wind)\b(?:.*(?:in|for)\s+(.+))?", text)
+    if m:
+        loc = m.group(1).strip() if m.group(1) else None
+        return {"intent": "weather", "payload": loc}
+
+    if re.search(r"\b(hello|hi|hey|hiya|howdy|yo|good\s+(morning|afternoon|evening)|raven)\b", text):
+        return {"intent": "greeting", "payload": None}
+
+    if re.search(r"\b(time|what(?:'s| is) the time|current time|tell me the time|what time)\b", text):
+        return {"intent": "time", "payload": None}
+
+    if re.search(r"\b(stop|cancel|pause|quit|exit|never mind|don't)\b", text):
+        return {"intent": "stop", "payload": None}
+
+    m = re.search(r"\b(?:play|start|listen to|put on)\b\s+(.+)", text)
+    if m:
+        return {"intent": "play", "payload": m.group(1).strip()}
+
+    m = re.search(r"\b(?:open|go to|show|visit|take me to|launch)\b\s+([^\n]+)", text)
+    if m:
+        return {"intent": "open", "payload": m.group(1).strip()}
+
+    m = re.search(r"\b(?:search for|find|look up|lookup|google|look for|what is|what's)\b\s+(.+)", text)
+    if m:
+        return {"intent": "search", "payload": m.group(1).strip()}
+
+    if re.search(r"\byoutube\b", text):
+        payload = re.sub(r"\b(play|open|youtube|on|please)\b", "", text).strip()
+        return {"intent": "play", "payload": payload}
+
+    return {"intent": "unknown", "payload": text}
+
+def per_utterance_us(router, utterances: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in utterances:
+            router(text)
+        best = min(best, time.perf_counter() - started)
+    return best / len(utterances) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the heuristic intent router.")
+    parser.add_argument("--generate", type=int, default=0, help="random word recombinations to add to the corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per router (the best is kept)")
+    parser.add_argument("--show", type=int, default=5, help="mismatches to print")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    utterances = corpus + generate(corpus, args.generate)
+
+    wrong = []
+    for text, location, when in PARSE_CASES:
+        result = detect_heuristic(text)
+        if (result["intent"], result["payload"], result.get("when")) != ("weather", location, when):
+            wrong.append(text)
+
+    different = []
+    intent_changed = []
+    payload_changed = []
+    for text in utterances:
+        new = detect_heuristic(text)
+        if new != detect_linear(text):
+            different.append(text)
+        old = detect_original(text)
+        if new["intent"] != old["intent"]:
+            intent_changed.append(text)
+        elif new["intent"] != "weather" and new["payload"] != old["payload"]:
+            payload_changed.append(text)
+
+    print(f"{len(utterances)} utterances ({len(corpus)} from the corpus)")
+    for label, texts in (("weather parse cases wrong", wrong), ("indexed != linear", different),
+                         ("intent differs from the original", intent_changed),
+                         ("payload differs from the original", payload_changed)):
+        print(f"  {label}: {len(texts)}")
+        for text in texts[:args.show]:
+            print(f"    {text!r}: {detect_heuristic(text)}")
+
+    for name, router in (("original", detect_original), ("linear", detect_linear), ("indexed", detect_heuristic)):
+        us = per_utterance_us(router, utterances, args.repeat)
+        print(f"{name:9} {us:6.2f} us/utterance  {1e6 / us:9,.0f} utterances/s")
+
+    sys.exit(1 if wrong or different or intent_changed or payload_changed else 0)
+
+if __name__ == "__main__":
+    main()
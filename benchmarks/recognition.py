@@ -0,0 +1,113 @@
+"""
+Recognition latency and real-time factor of each speech backend over WAV files.
+
+Every utterance is streamed through a RecognitionSession the way the
+listener does it: 1024-sample blocks go to `feed` at the pace of the audio
+(or as fast as possible with --no-pace), then the whole utterance goes to
+`Recognizer.transcribe`. The end of each file is taken as the end of speech,
+so `last_latency` is the wait from end of speech to transcript and
+`last_rtf` the processing time over the audio duration.
+
+Backends are created from the settings like the listener does (vosk needs
+the package and a model at --vosk-model, google a network connection).
+When neither can be loaded, ScriptedRecognizer stands in so the harness
+still runs. Without files, speech-like clips are generated; real backends
+will not understand them, which is reported but still timed.
+
+Usage (from the repository root):
+    python -m benchmarks.recognition [file.wav ...] [--backends vosk,google] [--vosk-model models/vosk]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.endpointing import speech, write_wav
+from raven.assistant.recognizers import BACKENDS, RecognizerError, SpeechNotUnderstood
+from raven.assistant.replay import SAMPLE_RATE, ScriptedRecognizer, load_wav
+
+BLOCK = 1024
+
+def generated_corpus(directory: str, count: int = 6) -> list:
+    """
+    Writes `count` clips of 0.3 s noise, 1-3 s of speech and 0.2 s noise.
+    """
+
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        words = speech(1.0 + 2.0 * i / max(count - 1, 1), rng)
+        samples = rng.normal(0, 40, len(words) + int(0.5 * SAMPLE_RATE))
+        start = int(0.3 * SAMPLE_RATE)
+        samples[start:start + len(words)] += words
+        path = os.path.join(directory, f"utterance_{i}.wav")
+        write_wav(path, np.clip(samples, -32768, 32767).astype(np.int16))
+        paths.append(path)
+    return paths
+
+def create_backends(names: list, settings: dict, stt_latency: float) -> list:
+    recognizers = []
+    for name in names:
+        try:
+            recognizers.append(BACKENDS[name](settings))
+        except (ImportError, RecognizerError) as e:
+            print(f"{name}: unavailable ({e})")
+    if not recognizers:
+        print(f"No backend available, using the scripted stand-in ({stt_latency * 1000:.0f} ms)")
+        recognizers.append(ScriptedRecognizer(latency=stt_latency))
+    return recognizers
+
+def recognize(recognizer, samples: np.ndarray, pace: bool) -> dict:
+    session = recognizer.start(SAMPLE_RATE)
+    started = time.perf_counter()
+    for i, offset in enumerate(range(0, len(samples), BLOCK)):
+        if pace:
+            delay = started + i * BLOCK / SAMPLE_RATE - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        session.feed(samples[offset:offset + BLOCK])
+
+    try:
+        text = recognizer.transcribe(session, memoryview(samples).cast("B"))
+    except SpeechNotUnderstood:
+        text = None
+    except RecognizerError as e:
+        text = f"<error: {e}>"
+    finally:
+        session.close()
+    return {"text": text, "latency_ms": recognizer.last_latency * 1000, "rtf": recognizer.last_rtf}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure recognition latency and real-time factor per backend.")
+    parser.add_argument("files", nargs="*", help="16 kHz 16-bit WAV files, one utterance each (generated if omitted)")
+    parser.add_argument("--backends", default="vosk,google", help="comma-separated backends to try")
+    parser.add_argument("--vosk-model", default="models/vosk", help="Vosk model directory")
+    parser.add_argument("--stt-latency", type=float, default=0.05, help="latency of the scripted stand-in")
+    parser.add_argument("--no-pace", action="store_true", help="feed blocks as fast as possible")
+    args = parser.parse_args()
+
+    settings = {"vosk_model_path": args.vosk_model}
+    recognizers = create_backends([n for n in args.backends.split(",") if n], settings, args.stt_latency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = args.files or generated_corpus(tmp)
+        clips = [(os.path.basename(path), load_wav(path)) for path in paths]
+
+    for recognizer in recognizers:
+        print(f"\n{recognizer.name}")
+        latencies, rtfs = [], []
+        for name, samples in clips:
+            r = recognize(recognizer, samples, not args.no_pace)
+            latencies.append(r["latency_ms"])
+            rtfs.append(r["rtf"])
+            text = "(not understood)" if r["text"] is None else repr(r["text"])
+            print(f"  {name:24} {len(samples) / SAMPLE_RATE:5.2f}s  latency {r['latency_ms']:7.1f} ms  "
+                  f"RTF {r['rtf']:5.3f}  {text}")
+        print(f"  latency after end of speech: p50 {np.percentile(latencies, 50):.1f} ms, "
+              f"max {max(latencies):.1f} ms; RTF p50 {np.percentile(rtfs, 50):.3f}, max {max(rtfs):.3f}")
+
+if __name__ == "__main__":
+    main()
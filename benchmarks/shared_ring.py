@@ -0,0 +1,206 @@
+"""
+Stress test of the audio hand-off while the main process is busy.
+
+A simulated 16 kHz input device calls the capture callback every 32 ms, like
+the driver does, and loses input (an overflow) when a callback runs more
+than DRIVER_BLOCKS periods late. Meanwhile `--load` threads in the main
+process hold the GIL, standing in for the GUI, the keyboard hook and actions.
+
+- inprocess: the device and its callback run in the main process (CaptureHub),
+  as with `audio_process` off.
+- process: the device runs in a child process and writes a SharedRingBuffer;
+  the main process reads it through RemoteCaptureHub, as with `audio_process` on.
+
+Every sample carries a value derived from its position in the device's
+stream, so the reader also checks that it received every frame in order and
+intact.
+
+Usage (from the repository root):
+    python -m benchmarks.shared_ring [--seconds 5] [--load 3] [--mode both]
+"""
+
+import argparse
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from raven.assistant.audio import CaptureHub, preroll_capacity
+from raven.assistant.audio_process import FRAME_LENGTH, SAMPLE_RATE, RemoteCaptureHub, SharedRingBuffer
+
+# Blocks the simulated driver buffers before it drops input
+DRIVER_BLOCKS = 2
+
+# Sample value = position * STEP mod 2**16; STEP is odd, so it can be inverted
+STEP = 7919
+INVERSE = pow(STEP, -1, 1 << 16)
+
+class Status:
+    """
+    The callback status flags sounddevice passes.
+    """
+
+    def __init__(self, overflow: bool):
+        self.input_overflow = overflow
+        self.input_underflow = False
+
+    def __bool__(self):
+        return self.input_overflow
+
+def pattern(start: int, n: int) -> np.ndarray:
+    """
+    The samples the device produces at positions [start, start + n).
+    """
+
+    return ((np.arange(start, start + n, dtype=np.int64) * STEP) & 0xFFFF).astype(np.uint16).view(np.int16)
+
+def source_position(frame: np.ndarray) -> int:
+    """
+    The device position (mod 2**16) of the first sample of `frame`.
+    """
+
+    return (int(frame[0]) & 0xFFFF) * INVERSE & 0xFFFF
+
+def detector_work(frame: np.ndarray, start: int):
+    # Roughly the per-frame numeric work of a keyword engine
+    f = frame.astype(np.float32)
+    float(np.dot(f, f))
+
+def run_device(hub: CaptureHub, seconds: float) -> dict:
+    """
+    Calls `hub.callback` on the driver's schedule for `seconds`.
+    Returns the number of callbacks, overflows and frames lost.
+    """
+
+    period = FRAME_LENGTH / SAMPLE_RATE
+    frames = int(seconds / period)
+    position = callbacks = lost = 0
+    deadline = time.perf_counter() + period
+
+    while position < frames * FRAME_LENGTH:
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+        late = time.perf_counter() - deadline
+
+        # The driver only holds DRIVER_BLOCKS blocks; older input is gone
+        overflow = late > DRIVER_BLOCKS * period
+        if overflow:
+            missed = int(late / period) - DRIVER_BLOCKS + 1
+            lost += missed
+            position += missed * FRAME_LENGTH
+            deadline = time.perf_counter()
+
+        hub.callback(pattern(position, FRAME_LENGTH).reshape(-1, 1), FRAME_LENGTH, None, Status(overflow))
+        position += FRAME_LENGTH
+        callbacks += 1
+        deadline += period
+
+    return {"callbacks": callbacks, "overflows": hub.overflows, "lost_frames": lost}
+
+def device_process(shm_name: str, capacity: int, seconds: float, results):
+    """
+    Child process entry point: runs the device into the shared ring.
+    """
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = SharedRingBuffer(capacity, shm)
+    try:
+        hub = CaptureHub(SAMPLE_RATE, FRAME_LENGTH, ring=ring)
+        hub.add_consumer(detector_work)
+        results.put(run_device(hub, seconds))
+    finally:
+        ring.release()
+
+class Verifier:
+    """
+    Consumer checking that the device's samples arrive in order and
+    unchanged. `missing` counts the device samples that never arrived,
+    whether the driver or the reader lost them.
+    """
+
+    def __init__(self):
+        self.next = None
+        self.samples = 0
+        self.missing = 0
+        self.corrupt = 0
+
+    def __call__(self, frame: np.ndarray, start: int):
+        position = source_position(frame)
+        if self.next is not None:
+            self.missing += (position - self.next) & 0xFFFF
+        self.next = (position + len(frame)) & 0xFFFF
+        self.samples += len(frame)
+        if not np.array_equal(frame, pattern(position, len(frame))):
+            self.corrupt += 1
+
+def load(stop: threading.Event):
+    # Pure-Python work that holds the GIL
+    while not stop.is_set():
+        x = 0
+        for i in range(200000):
+            x += i * i
+
+def run_inprocess(seconds: float, threads: int) -> dict:
+    hub = CaptureHub(SAMPLE_RATE, FRAME_LENGTH)
+    verifier = Verifier()
+    hub.add_consumer(detector_work)
+    hub.add_consumer(verifier)
+
+    stop = threading.Event()
+    loaders = [threading.Thread(target=load, args=(stop,), daemon=True) for _ in range(threads)]
+    for t in loaders:
+        t.start()
+    try:
+        device = run_device(hub, seconds)
+    finally:
+        stop.set()
+    return dict(device, missing=verifier.missing // FRAME_LENGTH, corrupt=verifier.corrupt, overruns=0)
+
+def run_process(seconds: float, threads: int) -> dict:
+    capacity = preroll_capacity(SAMPLE_RATE, FRAME_LENGTH, 1.0)
+    shm = shared_memory.SharedMemory(create=True, size=SharedRingBuffer.size(capacity))
+    ring = SharedRingBuffer(capacity, shm)
+    ring.header[:] = 0
+
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    child = ctx.Process(target=device_process, args=(shm.name, capacity, seconds, results), daemon=True)
+
+    hub = RemoteCaptureHub(ring)
+    verifier = Verifier()
+    stop = threading.Event()
+    loaders = [threading.Thread(target=load, args=(stop,), daemon=True) for _ in range(threads)]
+
+    try:
+        hub.start()
+        hub.add_consumer(verifier)
+        child.start()
+        for t in loaders:
+            t.start()
+        device = results.get(timeout=seconds + 30)
+        child.join(5)
+    finally:
+        stop.set()
+        hub.stop()
+        ring.release()
+        shm.unlink()
+
+    return dict(device, missing=verifier.missing // FRAME_LENGTH, corrupt=verifier.corrupt, overruns=hub.overruns)
+
+def main():
+    parser = argparse.ArgumentParser(description="Count dropped audio frames with and without the audio process.")
+    parser.add_argument("--seconds", type=float, default=5.0, help="audio to capture per mode")
+    parser.add_argument("--load", type=int, default=3, help="GIL-bound threads in the main process")
+    parser.add_argument("--mode", choices=("inprocess", "process", "both"), default="both")
+    args = parser.parse_args()
+
+    modes = ("inprocess", "process") if args.mode == "both" else (args.mode,)
+    for mode in modes:
+        run = run_inprocess if mode == "inprocess" else run_process
+        r = run(args.seconds, args.load)
+        print(f"{mode:9}  callbacks {r['callbacks']:4}  overflows {r['overflows']:3}  lost frames {r['lost_frames']:3}  "
+              f"reader overruns {r['overruns']}  frames missing at reader {r['missing']}  corrupt {r['corrupt']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Lookup latency of the site index at directory scale.
+
+Builds a `--entries` name directory (pronounceable one to three word names
+like "tora belvik", many with a common word like "news" or "music", whose
+trigrams have long posting lists) in a temporary folder, compiles it with
+raven.assistant.actions.sites and times `SiteIndex.resolve` for:
+
+- exact: names as indexed;
+- typo: names with one letter substituted, inserted or dropped (fuzzy path);
+- miss: made-up names that resolve to nothing (fuzzy path, no match).
+
+Also reports how many typos resolve to the intended host, to another name
+just as close, or to nothing (e.g. a letter added at the end, which reads
+as a different word). Exits with status 1 when the p99 of any kind is over
+--budget milliseconds (sub-millisecond by default).
+
+Usage (from the repository root):
+    python -m benchmarks.sites [--entries 100000] [--lookups 2000] [--budget 1.0]
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from raven.assistant.actions.sites import SiteIndex, build_index, compact
+
+SYLLABLES = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"] + ["ar", "el", "in", "on", "ex", "ix", "ly"]
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+COMMON = ["news", "shop", "music", "online", "store", "app", "games", "bank", "mail", "cloud", "tv", "club",
+          "hub", "live", "pay", "maps", "books", "travel", "sports", "radio", "the", "my", "go", "get"]
+
+def word(rng) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+def directory(entries: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    sites = {}
+    while len(sites) < entries:
+        words = [word(rng) for _ in range(rng.choice((1, 1, 2, 3)))]
+        if rng.random() < 0.5:
+            words.insert(rng.choice((0, len(words))), rng.choice(COMMON))
+        name = " ".join(words)
+        sites.setdefault(name, f"{compact(name).decode()}.com")
+    return sites
+
+def typo(name: str, rng) -> str:
+    i = rng.randrange(len(name))
+    kind = rng.choice(("substitute", "insert", "drop"))
+    if kind == "substitute":
+        return name[:i] + rng.choice(LETTERS.replace(name[i], "")) + name[i + 1:]
+    if kind == "insert":
+        return name[:i] + rng.choice(LETTERS) + name[i:]
+    return name[:i] + name[i + 1:]
+
+def time_lookups(index: SiteIndex, names: list) -> np.ndarray:
+    times = np.zeros(len(names))
+    for i, name in enumerate(names):
+        started = time.perf_counter()
+        index.resolve(name)
+        times[i] = time.perf_counter() - started
+    return times * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Time site index lookups on a generated directory.")
+    parser.add_argument("--entries", type=int, default=100000, help="names in the generated directory")
+    parser.add_argument("--lookups", type=int, default=2000, help="lookups timed per kind")
+    parser.add_argument("--budget", type=float, default=1.0, help="p99 budget per lookup in milliseconds")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    sites = directory(args.entries)
+    names = list(sites)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source, path = Path(tmp) / "sites.json", Path(tmp) / "sites.idx"
+        source.write_text(json.dumps(sites), encoding="utf-8")
+        started = time.perf_counter()
+        build_index(source, path)
+        print(f"{len(sites)} names indexed in {time.perf_counter() - started:.1f}s, "
+              f"{path.stat().st_size / 2 ** 20:.1f} MiB on disk")
+
+        index = SiteIndex(source, path)
+        exact = rng.sample(names, args.lookups)
+        # Only names long enough to be matched fuzzily
+        typos = [(name, typo(name, rng)) for name in rng.sample(names, args.lookups * 3)
+                 if len(compact(name)) > 4][:args.lookups]
+        misses = [word(rng) + word(rng) for _ in range(args.lookups)]
+
+        index.resolve(exact[0])
+        over = False
+        for kind, queries in (("exact", exact), ("typo", [t for _, t in typos]), ("miss", misses)):
+            times = time_lookups(index, queries)
+            p99 = np.percentile(times, 99)
+            over |= p99 > args.budget
+            print(f"{kind:6} p50 {np.percentile(times, 50):6.3f} ms  p99 {p99:6.3f} ms  max {times.max():6.3f} ms")
+
+        hosts = [index.resolve(query) for _, query in typos]
+        right = sum(host == sites[name] for (name, _), host in zip(typos, hosts))
+        unresolved = hosts.count(None)
+        print(f"typos: {right} to the intended host, {len(typos) - right - unresolved} to another "
+              f"name as close, {unresolved} unresolved")
+        index.close()
+
+    sys.exit(1 if over else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Startup benchmark.
+
+1. Import time: runs `python -X importtime -c "import main"` in a fresh
+   interpreter and reports the cumulative import time of `main`, its
+   slowest imports and any heavy module that should load lazily but was
+   imported up front.
+2. Time to ready: in fresh interpreters, imports main, starts the
+   supervisor with only the listener subsystem and measures the time from
+   `supervisor.start()` until the listener reports it can hear the wake
+   word. This opens the real microphone and Porcupine, so it needs
+   RAVEN_PV_ACCESS_KEY (or stand-in modules on PYTHONPATH).
+
+Exits with status 1 when a heavy module is imported up front, the listener
+fails to start or a budget given on the command line is exceeded.
+
+Usage (from the repository root):
+    python -m benchmarks.startup [--runs 5] [--import-budget MS] [--ready-budget MS]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules main.py defers to the subsystem threads that use them
+DEFERRED = ("numpy", "dearpygui", "keyboard", "sounddevice", "pvporcupine", "speech_recognition", "requests", "vosk")
+
+CHILD = """
+import json, time
+began = time.perf_counter()
+from functools import partial
+import main
+imported = time.perf_counter()
+
+settings = main.load_settings()
+main.supervisor.add("listener", partial(main.run_listener, settings), on_stop=main.stop_listener)
+started = time.perf_counter()
+main.supervisor.start()
+ready = time.perf_counter()
+listener = main.supervisor.subsystems[0]
+main.supervisor.stop()
+
+print("RESULT " + json.dumps({
+    "import_ms": (imported - began) * 1000,
+    "ready_ms": (ready - started) * 1000,
+    "ok": listener.startup_time is not None,
+}))
+"""
+
+def import_times() -> list:
+    """
+    Returns (module, self µs, cumulative µs) for every module `import main` loads.
+    """
+
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                          capture_output=True, text=True, env=os.environ.copy())
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((module[1:].rstrip(), int(own), int(cumulative)))
+
+    # Children are listed before their parent, indented; keep main's tree only
+    end = next(i for i, row in enumerate(rows) if row[0] == "main")
+    start = max((i + 1 for i, row in enumerate(rows[:end]) if not row[0].startswith(" ")), default=0)
+    return [(module.strip(), own, cumulative) for module, own, cumulative in rows[start:end + 1]]
+
+def time_to_ready() -> dict:
+    proc = subprocess.run([sys.executable, "-c", CHILD], capture_output=True, text=True, timeout=60, env=os.environ.copy())
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError((proc.stderr or proc.stdout).strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to ready.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters for the time to ready")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    parser.add_argument("--import-budget", type=float, help="fail above this many ms to import main")
+    parser.add_argument("--ready-budget", type=float, help="fail above this median ms to ready")
+    args = parser.parse_args()
+    failed = False
+
+    rows = import_times()
+    total = next(cumulative for module, own, cumulative in rows if module == "main") / 1000
+    print(f"import main: {total:.1f} ms cumulative")
+    for module, own, cumulative in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"  {module:40} {own / 1000:7.2f} ms self  {cumulative / 1000:7.2f} ms cumulative")
+
+    eager = sorted({module for module, _, _ in rows if module.split(".")[0] in DEFERRED})
+    if eager:
+        print(f"  imported up front but should be deferred: {', '.join(eager)}")
+        failed = True
+    if args.import_budget is not None and total > args.import_budget:
+        print(f"  over the {args.import_budget:.0f} ms import budget")
+        failed = True
+
+    runs = [time_to_ready() for _ in range(args.runs)]
+    ready = [run["ready_ms"] for run in runs]
+    print(f"supervisor start -> listener ready: median {statistics.median(ready):.0f} ms, "
+          f"min {min(ready):.0f} ms, max {max(ready):.0f} ms over {len(ready)} runs")
+    if not all(run["ok"] for run in runs):
+        print("  the listener did not become ready in every run")
+        failed = True
+    if args.ready_budget is not None and statistics.median(ready) > args.ready_budget:
+        print(f"  over the {args.ready_budget:.0f} ms ready budget")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
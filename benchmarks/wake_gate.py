@@ -0,0 +1,121 @@
+"""
+Idle CPU and wake-word recall with the energy gate on and off.
+
+Audio is replayed through the listener (raven.assistant.replay, as with
+`--gate`) with a stand-in detector that burns `--detector-us` of CPU per
+frame, roughly what Porcupine costs, so skipping frames saves what it would
+save live.
+
+- Idle: `--idle` minutes of quiet room noise. Reports CPU seconds per hour of
+  audio and the frames the detector processed.
+- Recall: wake words at known positions. A wake word counts as recalled when
+  every frame it spans reached the detector (replayed from the gate's
+  lookback if need be), so Porcupine gets the same audio with the gate as
+  without. The recordings are WAV files with their
+  wake word end times (--wake-at) and length (--wake-length); without
+  files, wake words are generated in a quiet and a noisy room.
+
+Usage (from the repository root):
+    python -m benchmarks.wake_gate [file.wav ...] [--wake-at 2.1,7.4] [--wake-length 0.8] [--idle 10]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from raven.assistant.replay import FRAME_LENGTH, SAMPLE_RATE, ScriptedDetector, load_wav, replay
+
+class CostlyDetector(ScriptedDetector):
+    """
+    ScriptedDetector that spends `cost` seconds of CPU per frame and
+    records the start of every frame it processes.
+    """
+
+    def __init__(self, wake_samples: list, cost: float):
+        super().__init__(wake_samples)
+        self.cost = cost
+        self.seen = set()
+
+    def process(self, pcm) -> int:
+        self.seen.add(self.starts[0] if self.starts else self.position)
+        until = time.perf_counter() + self.cost
+        while time.perf_counter() < until:
+            pass
+        return super().process(pcm)
+
+def room_noise(seconds: float, level: float, rng) -> np.ndarray:
+    return rng.normal(0, level, int(seconds * SAMPLE_RATE))
+
+def wake_clips(seed: int = 0):
+    """
+    Wake words (0.7 s speech-like bursts) every 5 s in a quiet and a noisy room.
+    Returns (samples, wake word end positions).
+    """
+
+    rng = np.random.default_rng(seed)
+    parts, wakes, offset = [], [], 0
+    for level in (40, 400):
+        clip = room_noise(30.0, level, rng)
+        for i in range(5):
+            start = int((2.0 + i * 5.0) * SAMPLE_RATE)
+            t = np.arange(int(0.7 * SAMPLE_RATE)) / SAMPLE_RATE
+            # Rises from a whisper, like the start of "hey"
+            clip[start:start + len(t)] += 3000 * np.sin(2 * np.pi * 180 * t) * np.minimum(t / 0.15, 1.0)
+            wakes.append(offset + start + len(t))
+        parts.append(clip)
+        offset += len(clip)
+    return np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16), wakes
+
+def run(samples: np.ndarray, wakes: list, gate: bool, cost: float) -> dict:
+    detector = CostlyDetector(wakes, cost)
+    started = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = replay(samples, wakes, settings={"wake_gate_enabled": gate}, detector=detector)
+    cpu = time.process_time() - started
+    return dict(report, cpu=cpu, detector=detector)
+
+def recalled(detector: CostlyDetector, wakes: list, length: int) -> int:
+    count = 0
+    for end in wakes:
+        first = max(end - length, 0) // FRAME_LENGTH * FRAME_LENGTH
+        if all(start in detector.seen for start in range(first, end, FRAME_LENGTH)):
+            count += 1
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure idle CPU and recall with the wake-word energy gate.")
+    parser.add_argument("files", nargs="*", help="16 kHz 16-bit WAV files with wake words (generated if omitted)")
+    parser.add_argument("--wake-at", default="", help="comma-separated wake word end times in seconds, across all files")
+    parser.add_argument("--wake-length", type=float, default=0.8, help="seconds a wake word lasts")
+    parser.add_argument("--idle", type=float, default=10.0, help="minutes of room noise for the idle CPU")
+    parser.add_argument("--detector-us", type=float, default=40.0, help="CPU the stand-in detector spends per frame")
+    args = parser.parse_args()
+    cost = args.detector_us / 1e6
+
+    idle = np.clip(room_noise(args.idle * 60, 40, np.random.default_rng(1)), -32768, 32767).astype(np.int16)
+    hours = len(idle) / SAMPLE_RATE / 3600
+    print(f"Idle: {args.idle:.0f} min of room noise, detector {args.detector_us:.0f} us/frame")
+    for gate in (False, True):
+        r = run(idle, [], gate, cost)
+        skipped = f", {r['gate']['skipped_ratio'] * 100:.1f}% of frames skipped" if r["gate"] else ""
+        print(f"  gate {'on ' if gate else 'off'}  {r['cpu'] / hours:7.1f} CPU s per hour of audio  "
+              f"{len(r['detector'].seen) / hours:9.0f} detector frames per hour{skipped}")
+
+    if args.files:
+        samples = np.concatenate([load_wav(path) for path in args.files])
+        wakes = [int(float(t) * SAMPLE_RATE) for t in args.wake_at.split(",") if t]
+    else:
+        samples, wakes = wake_clips()
+    length = int(args.wake_length * SAMPLE_RATE)
+
+    print(f"Recall: {len(wakes)} wake words in {len(samples) / SAMPLE_RATE:.0f}s of audio")
+    for gate in (False, True):
+        r = run(samples, wakes, gate, cost)
+        print(f"  gate {'on ' if gate else 'off'}  {recalled(r['detector'], wakes, length)} of {len(wakes)} recalled, "
+              f"{r['detections']} detections")
+
+if __name__ == "__main__":
+    main()
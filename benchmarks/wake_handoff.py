@@ -0,0 +1,156 @@
+"""
+Time from wake word to first captured sample, before and after the shared
+capture stream.
+
+Runs on the real audio device (or stand-in modules on PYTHONPATH). A
+stand-in detector fires every `--interval` seconds, `--trials` times per
+path:
+
+- before: the old hand-off. The wake-word stream's callback starts a thread
+  that opens and starts a second `sd.InputStream` (1024-sample blocks, as
+  `record_command` did); the command's first sample is the first one that
+  stream delivers. Samples lost are those spoken between the detection and
+  the start of that first block, which began one block before it arrived.
+- after: the listener on a CaptureHub. The capture thread attaches the
+  recorder with `hub.attach`, which replays the pre-roll from the sample the
+  wake word ended on. Samples lost are those missing between the end of the
+  wake word and the first replayed sample (the pre-roll holds one second).
+
+Latency is from the detection to the first captured sample being available
+to the recorder.
+
+Usage (from the repository root):
+    python -m benchmarks.wake_handoff [--trials 10] [--interval 2.0]
+"""
+
+import argparse
+import contextlib
+import io
+import threading
+import time
+
+import numpy as np
+
+from raven.assistant.audio import CaptureHub
+from raven.assistant.listener import Listener
+from raven.assistant.replay import ScriptedRecognizer
+from raven.settings import DEFAULT_SETTINGS, Settings
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 512
+RECORD_BLOCK = 1024
+
+class Trigger:
+    """
+    Detector that reports a wake word every `every` frames and records
+    (wake end sample, detection time) for each.
+    """
+
+    def __init__(self, every: int):
+        self.every = every
+        self.frames = 0
+        self.detections = []
+
+    def process(self, pcm) -> int:
+        self.frames += 1
+        if self.frames % self.every:
+            return -1
+        self.detections.append((self.frames * FRAME_LENGTH, time.perf_counter()))
+        return 0
+
+    def delete(self):
+        pass
+
+def before(trials: int, every: int) -> list:
+    """
+    Returns (latency ms, samples lost) per trial for the second-stream hand-off.
+    """
+
+    import sounddevice as sd
+
+    results = []
+    heard = [0]
+    finished = threading.Event()
+
+    def record_command(detected_at: float):
+        first = {}
+        started = threading.Event()
+
+        def record_callback(indata, frames, time_info, status):
+            if not first:
+                first.update(at=time.perf_counter(), frames=frames)
+                started.set()
+
+        with sd.InputStream(channels=1, samplerate=SAMPLE_RATE, blocksize=RECORD_BLOCK, callback=record_callback):
+            started.wait(5.0)
+        if first:
+            began = first["at"] - first["frames"] / SAMPLE_RATE
+            results.append(((first["at"] - detected_at) * 1000, max(round((began - detected_at) * SAMPLE_RATE), 0)))
+        if len(results) >= trials:
+            finished.set()
+
+    def audio_callback(indata, frames, time_info, status):
+        pcm = (indata[:, 0] * 32767).astype(np.int16)
+        heard[0] += len(pcm)
+        if heard[0] // FRAME_LENGTH % every == 0:
+            threading.Thread(target=record_command, args=(time.perf_counter(),), daemon=True).start()
+
+    with sd.InputStream(channels=1, samplerate=SAMPLE_RATE, blocksize=FRAME_LENGTH, callback=audio_callback):
+        finished.wait(trials * every * FRAME_LENGTH / SAMPLE_RATE + 10)
+    return results[:trials]
+
+def after(trials: int, every: int) -> list:
+    """
+    Returns (latency ms, samples lost) per trial for the shared-stream hand-off.
+    """
+
+    settings = Settings(dict(DEFAULT_SETTINGS, max_command_seconds=min(every * FRAME_LENGTH / SAMPLE_RATE / 2, 1.0),
+                             wake_refractory_seconds=0))
+    hub = CaptureHub(SAMPLE_RATE, FRAME_LENGTH)
+    detector = Trigger(every)
+    listener = Listener(settings, detector, ScriptedRecognizer(), hub, on_command=lambda command, settings: None)
+
+    attaches = []
+    attach = hub.attach
+
+    def timed_attach(consumer, start):
+        attaches.append((time.perf_counter(), start, max(start, hub.ring.written - hub.ring.capacity)))
+        return attach(consumer, start)
+
+    hub.attach = timed_attach
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        hub.start()
+        listener.start()
+        deadline = time.perf_counter() + trials * every * FRAME_LENGTH / SAMPLE_RATE + 10
+        while len(attaches) < trials and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        hub.stop()
+        listener.stop()
+
+    results = []
+    for (_, detected_at), (attached_at, start, first) in zip(detector.detections, attaches):
+        results.append(((attached_at - detected_at) * 1000, first - start))
+    return results[:trials]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure wake word to first captured sample, old and new hand-off.")
+    parser.add_argument("--trials", type=int, default=10, help="wake words per path")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between wake words")
+    args = parser.parse_args()
+    every = max(int(args.interval * SAMPLE_RATE / FRAME_LENGTH), 1)
+
+    for name, path in (("before", before), ("after", after)):
+        results = path(args.trials, every)
+        if not results:
+            print(f"{name:6} no captures")
+            continue
+        latency = np.array([r[0] for r in results])
+        lost = np.array([r[1] for r in results])
+        print(f"{name:6} wake word to first sample: p50 {np.percentile(latency, 50):6.1f} ms, "
+              f"max {latency.max():6.1f} ms; samples lost: p50 {np.percentile(lost, 50):5.0f} "
+              f"({np.percentile(lost, 50) / SAMPLE_RATE * 1000:4.0f} ms), max {lost.max():5.0f} "
+              f"over {len(results)} wake words")
+
+if __name__ == "__main__":
+    main()
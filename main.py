@@ -1,49 +1,184 @@
-from raven.settings import load_settings
-from raven.gui import create_gui
-from raven.assistant.listener import start_listener
-import threading
 import time
-import keyboard
 
+# Reference point for the "ready" timings below
+LAUNCHED = time.perf_counter()
+
+# Only light modules are imported up front. DearPyGui, keyboard, NumPy and the
+# audio stack load on the subsystem threads that need them, in parallel.
+# Check with: python -X importtime main.py
+from raven.settings import load_settings, SettingsWatcher
+from raven.supervisor import Supervisor
+from raven import tracing
+from functools import partial
+import threading
+
+gui = None
 gui_open = False
-program_enabled = True
+gui_requested = threading.Event()
+supervisor = Supervisor()
 
 def main():
     """
     Executes the main functionality and the heart of the program.
     """
 
-    global program_enabled
     settings = load_settings()
 
-    # Start assistant thread
-    threading.Thread(target=start_listener, args=(settings,), daemon=True).start()
+    # Per-command latency traces go to data/traces.jsonl
+    if settings["trace_commands"]:
+        tracing.start_file_logging()
+
+    # Subsystems start in this order and stop in reverse
+    supervisor.add("listener", partial(run_listener, settings), on_stop=stop_listener)
+
+    # Pre-open connections to the hosts used by network actions
+    if settings["network_warmup"]:
+        supervisor.add("network warm-up", warm_up_network, restart=False)
 
-    if settings["start_visible"]:
-        open_gui(settings)
+    # Keep the home location's weather prefetched
+    if settings["weather_prefetch"]:
+        supervisor.add("weather prefetch", partial(run_weather_prefetch, settings))
+
+    # Apply hand edits of settings.json while running
+    if settings["settings_watch"]:
+        supervisor.add("settings watcher", partial(run_settings_watcher, settings))
+
+    supervisor.add("gui", partial(run_gui, settings), on_stop=stop_gui)
 
     # Hotkey to open the GUI
-    keyboard.add_hotkey("tab+`", lambda: open_gui(settings))
+    supervisor.add("hotkey", partial(run_hotkey, settings))
+
+    # The GUI's context is created while Porcupine and the audio device initialize
+    supervisor.start()
+
+    # Sleep until the GUI (or Ctrl+C) asks to shut down
+    supervisor.wait()
+    supervisor.stop()
+
+    # Write any settings change still waiting in the background writer
+    settings.flush()
+    tracing.stop_file_logging()
+
+def run_listener(settings, stop, ready):
+    """
+    Runs the wake-word listener and reports when it can hear the wake word.
+    """
+
+    from raven.assistant.listener import start_listener
+    from raven.assistant.actions.executor import executor
+
+    def listening():
+        ready()
+        print(f"[Raven] Ready to hear the wake word {(time.perf_counter() - LAUNCHED) * 1000:.0f} ms after launch")
+
+    try:
+        start_listener(settings, stop, listening)
+    finally:
+        # Cancel actions still running for commands it heard
+        executor.shutdown()
+
+def stop_listener():
+    """
+    Wakes the listener if it is waiting on the audio process instead of `stop`.
+    """
+
+    from raven.assistant.listener import interrupt_listener
+    interrupt_listener()
+
+def warm_up_network(stop, ready):
+    """
+    Opens pooled connections to the hosts the network actions use.
+    Imported here so startup does not wait on `requests`.
+    """
 
-    # Mainloop to keep the program running
-    while program_enabled:
-        time.sleep(0.1)
+    from raven.assistant.actions.http_client import warm_up
+    ready()
+    warm_up()
+
+def run_weather_prefetch(settings, stop, ready):
+    """
+    Runs the background refresher for the home location's weather until stopped.
+    """
+
+    from raven.assistant.actions.weather import start_home_refresher, stop_home_refresher
+    start_home_refresher(settings)
+    try:
+        ready()
+        stop.wait()
+    finally:
+        stop_home_refresher(timeout=2.0)
+
+def run_settings_watcher(settings, stop, ready):
+    """
+    Watches settings.json for external edits until stopped.
+    """
+
+    watcher = SettingsWatcher(settings, poll=settings["settings_watch_poll"])
+    mode = watcher.start()
+    try:
+        if mode is None:
+            print("[Raven] Not watching settings.json: install watchdog or enable settings_watch_poll")
+        else:
+            print(f"[Raven] Watching settings.json ({mode})")
+        ready()
+        stop.wait()
+    finally:
+        watcher.stop()
+
+def run_gui(settings, stop, ready):
+    """
+    Builds the GUI once and runs it, hidden or shown, until stopped.
+    Keeps the GUI off the hotkey and main threads.
+    """
+
+    global gui
+    from raven import gui as panel
+
+    gui = panel
+    if stop.is_set():
+        return
+    gui.create_gui(settings, close_gui, shutdown_program,
+                   start_visible=settings["start_visible"] or gui_requested.is_set(), ready=ready)
+
+def stop_gui():
+    """
+    Stops the GUI's render loop.
+    """
+
+    if gui is not None:
+        gui.close()
+
+def run_hotkey(settings, stop, ready):
+    """
+    Registers the hotkey that opens the GUI and removes it when stopped.
+    """
+
+    import keyboard
+
+    hotkey = keyboard.add_hotkey("tab+`", lambda: open_gui(settings))
+    try:
+        ready()
+        stop.wait()
+    finally:
+        keyboard.remove_hotkey(hotkey)
 
 def open_gui(settings):
     """
-    Attempts to open the GUI with a reference to the current settings and a callback to properly update main.py when it closes.
+    Shows the GUI; requests it if it is still loading.
     """
 
     global gui_open
-    if not gui_open:
-        gui_open = True
-        create_gui(settings, close_gui, shutdown_program)
+    gui_open = True
+    if gui is not None:
+        gui.show()
+    else:
+        gui_requested.set()
 
 def close_gui():
     """
-    The callback for the GUI to call to tell main.py that the GUI was closed.
+    The callback for the GUI to call to tell main.py that the GUI was hidden.
     """
-    
+
     global gui_open
     gui_open = False
 
@@ -52,8 +187,7 @@ def shutdown_program():
     The callback from the GUI to shutdown the entire program.
     """
 
-    global program_enabled
-    program_enabled = False
+    supervisor.request_shutdown()
 
 if __name__ == "__main__":
     main()
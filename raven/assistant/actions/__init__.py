@@ -1,3 +1,17 @@
 """Handlers package for Raven assistant actions (audio.handlers)."""
 
-__all__ = ["weather", "web", "media", "basic"]
+from .registry import register, register_lazy, dispatch, get_stats
+from .executor import submit
+
+# Built-in actions. Their modules are only imported the first time the intent fires.
+# They run on the action executor; "stop" runs inline so it can cancel the others.
+register_lazy("greeting", "raven.assistant.actions.basic", "handle_greeting", takes_payload=False)
+register_lazy("time", "raven.assistant.actions.basic", "handle_time", takes_payload=False)
+register_lazy("stop", "raven.assistant.actions.basic", "handle_stop", takes_payload=False, inline=True)
+register_lazy("weather", "raven.assistant.actions.weather", "handle_weather", deadline=6.0)
+register_lazy("open", "raven.assistant.actions.web", "handle_open")
+register_lazy("search", "raven.assistant.actions.web", "handle_search")
+register_lazy("play", "raven.assistant.actions.media", "handle_play")
+
+__all__ = ["weather", "web", "media", "basic", "registry", "cache", "http_client", "executor", "sites",
+           "register", "register_lazy", "dispatch", "submit", "get_stats"]
@@ -1,5 +1,7 @@
 import datetime
 
+from .executor import executor
+
 def handle_greeting():
     print("[Raven] Hello there!")
 
@@ -13,4 +15,5 @@ def handle_time():
 
 
 def handle_stop():
-    print("[Raven] Stop/cancel received.")
+    cancelled = executor.cancel_all("stop")
+    print(f"[Raven] Stop/cancel received, cancelled {cancelled} running action(s).")
@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+class TTLCache:
+    """
+    A bounded LRU cache whose entries expire after a time-to-live.
+
+    When `path` is given the cache is persisted as JSON so entries survive
+    restarts. The file is read lazily on first access and rewritten (via a
+    temporary file) whenever an entry is added.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, path: Optional[Path] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._loaded = path is None
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for `key`, or None if it is missing or expired.
+        """
+
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None or entry["expires"] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["value"]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Stores `value` under `key` for `ttl` seconds (defaults to the cache TTL).
+        The value must be JSON serializable when the cache is persisted.
+        """
+
+        with self._lock:
+            self._load()
+            self._entries[key] = {"value": value, "expires": time.time() + (self.ttl if ttl is None else ttl)}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the hit/miss counters and the current number of entries.
+        """
+
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+
+        try:
+            with self.path.open("r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"[Raven] Failed to load cache {self.path.name}: {e}")
+            return
+
+        now = time.time()
+        for key, entry in data.items():
+            if entry.get("expires", 0) > now:
+                self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        if self.path is None:
+            return
+
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            with tmp_path.open("w", encoding="utf-8") as fh:
+                json.dump(self._entries, fh)
+            tmp_path.replace(self.path)
+        except Exception as e:
+            print(f"[Raven] Failed to save cache {self.path.name}: {e}")
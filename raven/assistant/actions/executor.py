@@ -0,0 +1,267 @@
+"""
+Runs actions off the command thread.
+
+Recognized commands are handed to `executor`, which runs each action on a
+small thread pool under a per-action deadline, so a slow action (a weather
+lookup on a bad network, a browser that takes seconds to launch) never holds
+up the next command. Every job has a CancelToken: the "stop" intent cancels
+all jobs in flight, and a job is cancelled by itself once its deadline
+passes. Cancellation is cooperative. `http_client` checks the running
+action's token before and after each request and shortens timeouts to the
+deadline, and actions check it before side effects like opening the browser.
+Results of cancelled jobs are discarded.
+
+The command's trace moves with the job and is finished by the worker once
+the action ends.
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from ... import tracing
+from .registry import ACTIONS, dispatch
+
+# Seconds an action may run when it was registered without a deadline
+DEFAULT_DEADLINE = 10.0
+MAX_WORKERS = 4
+
+# The token of the action running on this thread
+local = threading.local()
+
+class Cancelled(Exception):
+    """
+    Raised inside an action that was cancelled or ran past its deadline.
+    """
+
+class CancelToken:
+    """
+    Cancellation flag and deadline (on the `time.monotonic` clock) of one job.
+    """
+
+    __slots__ = ("deadline", "reason", "_event")
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.reason = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+        return self._event.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """
+        Seconds left until the deadline, or None without one.
+        """
+
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+def current_token() -> Optional[CancelToken]:
+    """
+    Returns the token of the action running on this thread, if any.
+    """
+
+    return getattr(local, "token", None)
+
+def check_cancelled():
+    """
+    Raises Cancelled if the action running on this thread was cancelled.
+    """
+
+    token = current_token()
+    if token is not None:
+        token.check()
+
+def bind(func: Callable) -> Callable:
+    """
+    Wraps `func` to run under this thread's token, for work an action hands
+    to another pool (e.g. the weather lookups).
+    """
+
+    token = current_token()
+    if token is None:
+        return func
+
+    def run(*args, **kwargs):
+        previous = current_token()
+        local.token = token
+        try:
+            return func(*args, **kwargs)
+        finally:
+            local.token = previous
+
+    return run
+
+class Job:
+    """
+    One action run by the executor.
+    """
+
+    __slots__ = ("id", "intent", "payload", "token", "submitted", "finished", "status", "result", "error")
+
+    def __init__(self, job_id: int, intent: str, payload: Optional[str], token: CancelToken):
+        self.id = job_id
+        self.intent = intent
+        self.payload = payload
+        self.token = token
+        self.submitted = time.monotonic()
+        self.finished = None
+        self.status = "queued"
+        self.result = None
+        self.error = None
+
+class ActionExecutor:
+    """
+    Runs registered actions on a thread pool and tracks the jobs in flight.
+
+    Actions registered with `inline=True` (like "stop") run right away on
+    the calling thread instead, so they are never queued behind the work
+    they are meant to cancel.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, name: str = "Raven"):
+        self.max_workers = max_workers
+        self.name = name
+        self.jobs: Dict[int, Job] = {}
+        self.counts = {"done": 0, "cancelled": 0, "timed out": 0, "failed": 0}
+
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def submit(self, intent: str, payload: Optional[str] = None, **kwargs) -> Optional[Job]:
+        """
+        Starts the action registered for `intent`.
+        Returns its Job, or None if no action is registered.
+        """
+
+        entry = ACTIONS.get(intent)
+        if entry is None:
+            return None
+
+        deadline = entry["deadline"] if entry["deadline"] is not None else DEFAULT_DEADLINE
+        job = Job(next(self._ids), intent, payload, CancelToken(deadline))
+        with self._lock:
+            self.jobs[job.id] = job
+        tracing.annotate(handled=True)
+
+        if entry["inline"]:
+            self._run(job, kwargs)
+            return job
+
+        # The worker finishes the command's trace once the action ends
+        trace = tracing.detach()
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="raven-action")
+            self._pool.submit(self._run, job, kwargs, trace)
+        return job
+
+    def _run(self, job: Job, kwargs: Dict[str, Any], trace: Optional[tracing.Trace] = None):
+        if trace is not None:
+            tracing.current.trace = trace
+        local.token = job.token
+        job.status = "running"
+
+        try:
+            # Cancelled while it waited for a worker
+            job.token.check()
+            with tracing.span("action"):
+                _, job.result = dispatch(job.intent, job.payload, **kwargs)
+            job.status = "done"
+        except Cancelled:
+            pass
+        except Exception as e:
+            job.status = "failed"
+            job.error = e
+            print(f"[{self.name}] Action {job.intent!r} failed: {e!r}")
+        finally:
+            local.token = None
+            job.finished = time.monotonic()
+
+            # Whatever a cancelled action returned is discarded
+            if job.status == "running" or (job.status == "done" and job.token.cancelled):
+                job.status = "timed out" if job.token.reason == "deadline" else "cancelled"
+                job.result = None
+                print(f"[{self.name}] Action {job.intent!r} {job.status} after "
+                      f"{(job.finished - job.submitted) * 1000:.0f} ms")
+
+            with self._lock:
+                self.jobs.pop(job.id, None)
+                self.counts[job.status] += 1
+
+            tracing.annotate(action=job.status)
+            if trace is not None:
+                tracing.current.trace = None
+                tracing.finish(trace)
+
+    def cancel_all(self, reason: str = "cancelled") -> int:
+        """
+        Cancels every job in flight (except the calling one).
+        Returns the number of jobs cancelled.
+        """
+
+        own = current_token()
+        with self._lock:
+            jobs = [job for job in self.jobs.values() if job.token is not own and not job.token.cancelled]
+        for job in jobs:
+            job.token.cancel(reason)
+        return len(jobs)
+
+    def in_flight(self) -> List[Dict[str, Any]]:
+        """
+        Returns the intent, status and age in seconds of each job in flight.
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return [{"id": job.id, "intent": job.intent, "status": job.status, "age": now - job.submitted,
+                 "remaining": job.token.remaining()} for job in jobs]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts, in_flight=len(self.jobs))
+
+    def shutdown(self):
+        """
+        Cancels the jobs in flight and releases the workers. The pool is
+        recreated if another action is submitted.
+        """
+
+        self.cancel_all("shutdown")
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        # Jobs still waiting for a worker will never run
+        with self._lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.status == "queued":
+                    del self.jobs[job_id]
+                    self.counts["cancelled"] += 1
+
+# Shared executor for recognized commands
+executor = ActionExecutor()
+
+def submit(intent: str, payload: Optional[str] = None, **kwargs) -> Optional[Job]:
+    """
+    Starts the action for `intent` on the shared executor.
+    """
+
+    return executor.submit(intent, payload, **kwargs)
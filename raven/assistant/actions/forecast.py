@@ -0,0 +1,155 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# Extra Open-Meteo fields requested alongside `current_weather`, so one
+# request per location can answer "later", "tomorrow" and "rain soon" questions.
+HOURLY_FIELDS = "temperature_2m,precipitation_probability,weathercode"
+DAILY_FIELDS = "weathercode,temperature_2m_max,temperature_2m_min,precipitation_probability_max"
+FORECAST_DAYS = 3
+
+# Precipitation probability (percent) from which rain is reported as likely
+RAIN_LIKELY = 50
+
+HOURS_RE = re.compile(r"next (\d+|few|couple) hours?")
+WORD_HOURS = {"few": 3, "couple": 2}
+
+class ForecastDataset:
+    """
+    Columnar view of an Open-Meteo payload: hourly and daily variables as
+    NumPy arrays indexed by local timestamps, so time-window questions are
+    answered with vectorized lookups instead of new requests.
+    """
+
+    __slots__ = ("hour_times", "hourly", "day_times", "daily", "utc_offset")
+
+    def __init__(self, data: Dict[str, Any]):
+        hourly = data.get("hourly") or {}
+        daily = data.get("daily") or {}
+
+        self.hour_times = np.array(hourly.get("time", []), dtype="datetime64[m]")
+        self.hourly = {k: np.array(v, dtype=float) for k, v in hourly.items() if k != "time"}
+        self.day_times = np.array(daily.get("time", []), dtype="datetime64[D]")
+        self.daily = {k: np.array(v, dtype=float) for k, v in daily.items() if k != "time"}
+        self.utc_offset = int(data.get("utc_offset_seconds") or 0)
+
+    def local_now(self) -> np.datetime64:
+        """
+        Returns the current time in the forecast location's timezone.
+        """
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=self.utc_offset)
+        return np.datetime64(now, "m")
+
+    def hours(self, start: np.datetime64, end: np.datetime64) -> Dict[str, np.ndarray]:
+        """
+        Returns views of the hourly arrays for start <= time < end.
+        """
+
+        i, j = np.searchsorted(self.hour_times, [start, end])
+        window = {k: v[i:j] for k, v in self.hourly.items()}
+        window["time"] = self.hour_times[i:j]
+        return window
+
+    def day(self, date: np.datetime64) -> Optional[Dict[str, float]]:
+        """
+        Returns the daily values for `date`, or None if it is outside the forecast.
+        """
+
+        i = int(np.searchsorted(self.day_times, date))
+        if i >= len(self.day_times) or self.day_times[i] != date:
+            return None
+        return {k: v[i] for k, v in self.daily.items()}
+
+def parse_when(when: str, now: np.datetime64) -> Tuple[str, np.datetime64, np.datetime64]:
+    """
+    Turns a time qualifier from the intent detector into a window.
+
+    Returns ("day", date, date) for whole-day questions and
+    ("hours", start, end) for hour ranges, in local time.
+    """
+
+    today = now.astype("datetime64[D]")
+    midnight = (today + 1).astype("datetime64[m]")
+    at = lambda h: today.astype("datetime64[m]") + np.timedelta64(h, "h")
+
+    if when == "tomorrow":
+        return "day", today + 1, today + 1
+    if when == "today":
+        return "day", today, today
+    if when == "this morning":
+        return "hours", max(now, at(6)), at(12)
+    if when == "this afternoon":
+        return "hours", max(now, at(12)), at(18)
+    if when in ("this evening", "tonight"):
+        return "hours", max(now, at(18)), at(24 if when == "this evening" else 30)
+
+    m = HOURS_RE.search(when)
+    if m:
+        count = WORD_HOURS.get(m.group(1)) or int(m.group(1))
+        return "hours", now, now + np.timedelta64(count, "h")
+
+    # "later", "later today", ...
+    return "hours", now, midnight
+
+def describe_hours(window: Dict[str, np.ndarray], label: str, condition_names: Dict[int, str]) -> Optional[str]:
+    temps = window.get("temperature_2m")
+    if temps is None or not len(temps) or np.isnan(temps).all():
+        return None
+
+    parts = [f"{label} it will be {np.nanmin(temps):.0f} to {np.nanmax(temps):.0f}°F"]
+
+    codes = window.get("weathercode")
+    if codes is not None and len(codes) and not np.isnan(codes).all():
+        common = int(np.bincount(codes[~np.isnan(codes)].astype(np.int64)).argmax())
+        if common in condition_names:
+            parts[0] += f", mostly {condition_names[common]}"
+
+    precip = window.get("precipitation_probability")
+    if precip is not None and len(precip) and not np.isnan(precip).all():
+        likely = np.flatnonzero(precip >= RAIN_LIKELY)
+        if len(likely):
+            first = likely[0]
+            hour = window["time"][first].astype(datetime).strftime("%I %p").lstrip("0")
+            parts.append(f"Rain is likely from around {hour} ({precip[first]:.0f}% chance)")
+        else:
+            parts.append(f"Rain is unlikely ({np.nanmax(precip):.0f}% chance at most)")
+
+    return ". ".join(parts) + "."
+
+def describe_day(values: Dict[str, float], label: str, condition_names: Dict[int, str]) -> Optional[str]:
+    high = values.get("temperature_2m_max")
+    low = values.get("temperature_2m_min")
+    if high is None or low is None or np.isnan(high) or np.isnan(low):
+        return None
+
+    message = f"{label} expect a high of {high:.0f}°F and a low of {low:.0f}°F"
+    code = values.get("weathercode")
+    if code is not None and not np.isnan(code) and int(code) in condition_names:
+        message += f" with {condition_names[int(code)]}"
+
+    precip = values.get("precipitation_probability_max")
+    if precip is not None and not np.isnan(precip):
+        message += f". There is a {precip:.0f}% chance of precipitation"
+
+    return message + "."
+
+def describe_outlook(dataset: ForecastDataset, when: str, location: str, condition_names: Dict[int, str]) -> Optional[str]:
+    """
+    Answers a time-qualified weather question from `dataset`.
+    Returns None when the requested window is not covered by the forecast.
+    """
+
+    kind, start, end = parse_when(when, dataset.local_now())
+    if when.startswith("next"):
+        label = f"Over the {when} in {location}"
+    else:
+        label = f"{when[0].upper()}{when[1:]} in {location}"
+
+    if kind == "day":
+        values = dataset.day(start)
+        return describe_day(values, label, condition_names) if values else None
+
+    return describe_hours(dataset.hours(start, end), label, condition_names)
@@ -0,0 +1,223 @@
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from .executor import Cancelled, current_token
+
+# Hosts the built-in actions talk to; warm_up() opens a connection to each
+KNOWN_HOSTS = [
+    "nominatim.openstreetmap.org",
+    "ipinfo.io",
+    "api.open-meteo.com",
+    "wttr.in",
+]
+
+# Connection pool and retry configuration (see configure())
+POOL_SIZE = 4
+DEFAULT_TIMEOUT = 6.0
+RETRIES = 2
+BACKOFF = 0.3
+
+session: Optional[requests.Session] = None
+session_lock = threading.Lock()
+
+# host -> timing counters, see get_stats()
+host_stats: Dict[str, Dict[str, float]] = {}
+stats_lock = threading.Lock()
+
+def record(host: str, field: str, elapsed: Optional[float] = None):
+    with stats_lock:
+        stats = host_stats.setdefault(host, {
+            "connects": 0, "connect_time": 0.0,
+            "requests": 0, "request_time": 0.0,
+            "errors": 0,
+        })
+        if field == "connect":
+            stats["connects"] += 1
+            stats["connect_time"] += elapsed
+        elif field == "request":
+            stats["requests"] += 1
+            stats["request_time"] += elapsed
+        else:
+            stats["errors"] += 1
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        record(self.host, "connect", time.perf_counter() - start)
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        record(self.host, "connect", time.perf_counter() - start)
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose pools time every new TCP/TLS connection.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+class CancellableRetry(Retry):
+    """
+    Retry policy that stops retrying (and backing off) once the action that
+    sent the request is cancelled or out of time.
+    """
+
+    def increment(self, *args, **kwargs):
+        token = current_token()
+        if token is not None:
+            token.check()
+        return super().increment(*args, **kwargs)
+
+    def sleep(self, *args, **kwargs):
+        token = current_token()
+        if token is not None:
+            token.check()
+        super().sleep(*args, **kwargs)
+
+def create_session() -> requests.Session:
+    retry = CancellableRetry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=RETRIES,
+        backoff_factor=BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = TimedAdapter(pool_connections=len(KNOWN_HOSTS) * 2, pool_maxsize=POOL_SIZE, max_retries=retry)
+
+    s = requests.Session()
+    s.headers["User-Agent"] = "RavenAssistant/1.0"
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+def get_session() -> requests.Session:
+    """
+    Returns the shared keep-alive session, creating it on first use.
+    """
+
+    global session
+    if session is None:
+        with session_lock:
+            if session is None:
+                session = create_session()
+    return session
+
+def configure(pool_size: Optional[int] = None, timeout: Optional[float] = None,
+              retries: Optional[int] = None, backoff: Optional[float] = None):
+    """
+    Changes the pool size, default timeout and retry policy.
+    Open connections are dropped and the session is rebuilt on next use.
+    """
+
+    global POOL_SIZE, DEFAULT_TIMEOUT, RETRIES, BACKOFF, session
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+    if timeout is not None:
+        DEFAULT_TIMEOUT = timeout
+    if retries is not None:
+        RETRIES = retries
+    if backoff is not None:
+        BACKOFF = backoff
+
+    with session_lock:
+        old, session = session, None
+    if old is not None:
+        old.close()
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Sends a request through the shared session and records its timing.
+    Accepts the same keyword arguments as `requests.request`.
+
+    Inside an action the request is skipped once the action is cancelled,
+    its timeout is cut to the action's deadline, and a response that arrives
+    after a cancel is dropped (raising executor.Cancelled).
+    """
+
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    host = urlsplit(url).hostname or ""
+
+    token = current_token()
+    if token is not None:
+        token.check()
+        remaining = token.remaining()
+        if remaining is not None and isinstance(kwargs["timeout"], (int, float)):
+            kwargs["timeout"] = max(min(kwargs["timeout"], remaining), 0.01)
+
+    start = time.perf_counter()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except Exception:
+        record(host, "error")
+        if token is not None:
+            token.check()
+        raise
+    record(host, "request", time.perf_counter() - start)
+
+    if token is not None and token.cancelled:
+        response.close()
+        raise Cancelled(token.reason)
+    return response
+
+def get(url: str, **kwargs) -> requests.Response:
+    """
+    Shared-session replacement for `requests.get`.
+    """
+
+    return request("GET", url, **kwargs)
+
+def warm_up(hosts: Optional[list] = None):
+    """
+    Opens a pooled connection to each host so the first real request skips
+    the TCP and TLS handshake. Failures are ignored.
+    """
+
+    def touch(host):
+        try:
+            request("HEAD", f"https://{host}/", timeout=3.0, allow_redirects=False)
+        except Exception:
+            pass
+
+    threads = [threading.Thread(target=touch, args=(host,), daemon=True) for host in (hosts or KNOWN_HOSTS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+def get_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Returns per-host connection and request counters.
+    Times are totals in seconds; averages are included for convenience.
+    """
+
+    with stats_lock:
+        stats = {host: dict(values) for host, values in host_stats.items()}
+
+    for values in stats.values():
+        values["avg_connect_time"] = values["connect_time"] / values["connects"] if values["connects"] else None
+        values["avg_request_time"] = values["request_time"] / values["requests"] if values["requests"] else None
+    return stats
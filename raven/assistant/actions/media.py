@@ -2,6 +2,8 @@ import webbrowser
 from urllib.parse import quote_plus
 import re
 
+from .executor import check_cancelled
+
 
 def handle_play(media: str):
     if not media:
@@ -11,6 +13,9 @@ def handle_play(media: str):
     m = media.strip()
     print(f"[Raven] Play request received for: {m}")
 
+    # Don't launch the browser for a command that was cancelled meanwhile
+    check_cancelled()
+
     if re.search(r"^https?://", m, re.IGNORECASE):
         try:
             webbrowser.open(m)
@@ -0,0 +1,123 @@
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# intent -> action entry. An entry either holds a handler directly (registered
+# with @register) or the module/attribute to import the first time it fires
+# (registered with register_lazy).
+ACTIONS: Dict[str, Dict[str, Any]] = {}
+
+_import_lock = threading.Lock()
+
+def _new_entry(intent: str, module: Optional[str], attr: Optional[str], handler: Optional[Callable], takes_payload: bool,
+               deadline: Optional[float], inline: bool) -> Dict[str, Any]:
+    return {
+        "intent": intent,
+        "module": module,
+        "attr": attr,
+        "handler": handler,
+        "takes_payload": takes_payload,
+        "deadline": deadline,
+        "inline": inline,
+        "import_time": 0.0 if handler else None,
+        "runs": 0,
+        "run_time": 0.0,
+        "last_run_time": None,
+    }
+
+def register(intent: str, takes_payload: bool = True, deadline: Optional[float] = None, inline: bool = False):
+    """
+    Decorator registering a handler for `intent`.
+
+    Handlers that take a payload receive it as their only positional argument
+    (an empty string when the intent had none). `deadline` is the number of
+    seconds the action executor lets the handler run (its default when None);
+    `inline` handlers run on the command thread instead of the executor.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        ACTIONS[intent] = _new_entry(intent, func.__module__, func.__name__, func, takes_payload, deadline, inline)
+        return func
+
+    return decorator
+
+def register_lazy(intent: str, module: str, attr: str, takes_payload: bool = True,
+                  deadline: Optional[float] = None, inline: bool = False):
+    """
+    Registers `module.attr` as the handler for `intent` without importing it.
+    The module is imported the first time the intent is dispatched.
+    """
+
+    ACTIONS[intent] = _new_entry(intent, module, attr, None, takes_payload, deadline, inline)
+
+def resolve(intent: str) -> Optional[Callable]:
+    """
+    Returns the handler for `intent`, importing its module if needed.
+    Returns None when no action is registered for the intent.
+    """
+
+    entry = ACTIONS.get(intent)
+    if entry is None:
+        return None
+
+    handler = entry["handler"]
+    if handler is not None:
+        return handler
+
+    with _import_lock:
+        if entry["handler"] is None:
+            start = time.perf_counter()
+            module = importlib.import_module(entry["module"])
+            entry["handler"] = getattr(module, entry["attr"])
+            entry["import_time"] = time.perf_counter() - start
+            print(f"[Raven] Loaded action {intent!r} from {entry['module']} in {entry['import_time'] * 1000:.1f} ms")
+
+    return entry["handler"]
+
+def dispatch(intent: str, payload: Optional[str] = None, **kwargs):
+    """
+    Runs the handler registered for `intent`.
+    Extra keyword arguments are passed through to the handler.
+
+    Returns:
+        tuple: (handled, result) where `handled` is False if no action is registered.
+    """
+
+    handler = resolve(intent)
+    if handler is None:
+        return False, None
+
+    entry = ACTIONS[intent]
+    start = time.perf_counter()
+    try:
+        if entry["takes_payload"]:
+            result = handler(payload or "", **kwargs)
+        else:
+            result = handler(**kwargs)
+    finally:
+        elapsed = time.perf_counter() - start
+        entry["runs"] += 1
+        entry["run_time"] += elapsed
+        entry["last_run_time"] = elapsed
+        print(f"[Raven] Action {intent!r} ran in {elapsed * 1000:.1f} ms")
+
+    return True, result
+
+def get_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns import and run timings for every registered action.
+    Times are in seconds; `import_time` is None until the action has been loaded.
+    """
+
+    stats = {}
+    for intent, entry in ACTIONS.items():
+        runs = entry["runs"]
+        stats[intent] = {
+            "loaded": entry["handler"] is not None,
+            "import_time": entry["import_time"],
+            "runs": runs,
+            "last_run_time": entry["last_run_time"],
+            "avg_run_time": entry["run_time"] / runs if runs else None,
+        }
+    return stats
@@ -0,0 +1,443 @@
+"""
+Site directory lookup for the "open" action.
+
+`data/host_tlds.json` maps spoken names ("github", "apple music") to hosts.
+It is compiled into a binary index next to it (`host_tlds.idx`) the first
+time a lookup needs it, and rebuilt at that point if the JSON has changed
+since the index was built. The JSON is not watched afterwards: edits made
+while Raven runs take effect after a restart. The index is memory-mapped, so only the pages a lookup touches are read and a large
+directory costs almost no resident memory. It holds:
+
+- the names in a compact form (lowercase, letters and digits only, so
+  "Apple Music", "apple-music" and "applemusic" are the same name) with
+  their hosts and their position in the JSON (earlier entries win ties);
+- a trie of the compact names for exact lookups;
+- an inverted index of character trigrams, which narrows fuzzy lookups
+  ("get hub", "you tub") to the few names sharing enough trigrams before
+  the edit distance is computed.
+
+Rebuild by hand with: python -m raven.assistant.actions.sites --build
+"""
+
+import bisect
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from ...settings import BASE_DIR
+
+SITES_PATH = BASE_DIR / "data" / "host_tlds.json"
+INDEX_PATH = BASE_DIR / "data" / "host_tlds.idx"
+
+MAGIC = b"RVSI"
+VERSION = 1
+
+# magic, version, source mtime (ns), source size, entries, nodes, grams
+HEADER = struct.Struct("<4sIQQIII")
+
+# Sections, in file order: (name, dtype); None is a raw byte blob
+SECTIONS = (
+    ("key_offsets", np.uint32),
+    ("keys", None),
+    ("value_offsets", np.uint32),
+    ("values", None),
+    ("priority", np.uint32),
+    ("node_first", np.int32),
+    ("node_count", np.int32),
+    ("node_entry", np.int32),
+    ("node_label", np.uint8),
+    ("gram_keys", np.uint32),
+    ("gram_offsets", np.uint32),
+    ("postings", np.uint32),
+)
+SECTION_TABLE = struct.Struct("<" + "QQ" * len(SECTIONS))
+
+# Fuzzy matching limits: a match must also share MIN_SHARED_GRAMS of its
+# trigrams with the spoken name (Dice coefficient)
+MAX_CANDIDATES = 32
+MIN_SHARED_GRAMS = 0.5
+FILLER_RE = re.compile(r"^(?:the|my)\s+|\s+(?:website|site|page|app|dot com)$")
+COMPACT_RE = re.compile(r"[\W_]+")
+
+def compact(name: str) -> bytes:
+    """
+    The form names are indexed and looked up by: lowercase UTF-8 without
+    spaces or punctuation.
+    """
+
+    return COMPACT_RE.sub("", name.lower()).encode("utf-8")
+
+def max_edits(length: int) -> int:
+    """
+    Edits allowed for a name of `length` bytes; short names must match exactly.
+    """
+
+    if length <= 4:
+        return 0
+    return 1 if length <= 8 else 2
+
+def trigrams(key: bytes) -> np.ndarray:
+    """
+    The key's byte trigrams, padded at both ends and packed into integers.
+    """
+
+    padded = b"\x02" + key + b"\x03"
+    return np.array(sorted({(padded[i] << 16) | (padded[i + 1] << 8) | padded[i + 2]
+                            for i in range(len(padded) - 2)}), dtype=np.uint32)
+
+def edit_distance(a: bytes, b: bytes, limit: int) -> int:
+    """
+    Levenshtein distance between `a` and `b`, or `limit + 1` once it is
+    known to exceed `limit`. Only the diagonal band of width `limit` is filled.
+    """
+
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    over = limit + 1
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        lo, hi = max(1, i - limit), min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        ca = a[i - 1]
+        best = current[0]
+        for j in range(lo, hi + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < best:
+                best = cost
+        if best > limit:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+def plausible(key: bytes, name: bytes, shared: int) -> bool:
+    """
+    Whether `key`, within the edit limit of indexed `name`, sounds like a
+    mishearing of it rather than a different site. A key that is the name
+    plus extra letters ("bingo" for "bing") is a different word, and so is
+    one sharing too few trigrams with it.
+    """
+
+    if len(key) > len(name) and (key.startswith(name) or key.endswith(name)):
+        return False
+    return 2 * shared >= MIN_SHARED_GRAMS * (len(trigrams(key)) + len(trigrams(name)))
+
+def build_index(source: Path = SITES_PATH, path: Path = INDEX_PATH) -> int:
+    """
+    Compiles the site directory at `source` into the index at `path`.
+    Returns the number of names indexed.
+    """
+
+    with source.open("r", encoding="utf-8") as fh:
+        sites = json.load(fh)
+    stat = os.stat(source)
+
+    # The first entry for each compact name wins
+    entries = {}
+    for position, (name, host) in enumerate(sites.items()):
+        key = compact(name)
+        if key and key not in entries:
+            entries[key] = (host, position)
+    keys = sorted(entries)
+
+    def blob(items):
+        encoded = [item.encode("utf-8") if isinstance(item, str) else item for item in items]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        return offsets, b"".join(encoded)
+
+    key_offsets, key_blob = blob(keys)
+    value_offsets, value_blob = blob(entries[key][0] for key in keys)
+    priority = np.array([entries[key][1] for key in keys], dtype=np.uint32)
+
+    # Trie in breadth-first order, so each node's children are contiguous
+    # and sorted by label. A node covers keys[lo:hi], which share `depth` bytes.
+    first, count, entry, label = [0], [0], [-1], [0]
+    pending = [(0, 0, len(keys), 0)]
+    for node, lo, hi, depth in pending:
+        if lo < hi and len(keys[lo]) == depth:
+            entry[node] = lo
+            lo += 1
+        first[node] = len(first)
+        while lo < hi:
+            byte = keys[lo][depth]
+            end = lo
+            while end < hi and keys[end][depth] == byte:
+                end += 1
+            pending.append((len(first), lo, end, depth + 1))
+            first.append(0)
+            count.append(0)
+            entry.append(-1)
+            label.append(byte)
+            count[node] += 1
+            lo = end
+
+    # Trigram postings, ordered by trigram
+    postings = {}
+    for entry_id, key in enumerate(keys):
+        for gram in trigrams(key).tolist():
+            postings.setdefault(gram, []).append(entry_id)
+    gram_keys = sorted(postings)
+    gram_offsets = np.zeros(len(gram_keys) + 1, dtype=np.uint32)
+    np.cumsum([len(postings[gram]) for gram in gram_keys], out=gram_offsets[1:])
+    flat = [entry_id for gram in gram_keys for entry_id in postings[gram]]
+
+    arrays = {
+        "key_offsets": key_offsets, "keys": key_blob,
+        "value_offsets": value_offsets, "values": value_blob,
+        "priority": priority,
+        "node_first": first, "node_count": count, "node_entry": entry, "node_label": label,
+        "gram_keys": gram_keys, "gram_offsets": gram_offsets, "postings": flat,
+    }
+
+    # Header, section table, then the sections aligned to 8 bytes
+    position = HEADER.size + SECTION_TABLE.size
+    table, chunks = [], []
+    for name, dtype in SECTIONS:
+        data = arrays[name] if dtype is None else np.asarray(arrays[name], dtype=dtype).tobytes()
+        padding = -position % 8
+        chunks.append(b"\0" * padding + data)
+        position += padding
+        table += [position, len(data)]
+        position += len(data)
+
+    header = HEADER.pack(MAGIC, VERSION, stat.st_mtime_ns, stat.st_size, len(keys), len(first), len(gram_keys))
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("wb") as fh:
+        fh.write(header)
+        fh.write(SECTION_TABLE.pack(*table))
+        for chunk in chunks:
+            fh.write(chunk)
+    tmp_path.replace(path)
+    return len(keys)
+
+class SiteIndex:
+    """
+    Read-only view of a compiled site index.
+
+    The file is opened and mapped on the first lookup (building it first if
+    it is missing or was built from a different JSON) and kept for the life
+    of the index; `close` makes the next lookup check again. Exact names are found by walking
+    the trie; other names are matched to the indexed name with the smallest
+    edit distance within `max_edits`, among the MAX_CANDIDATES names sharing
+    the most trigrams with them, as long as the difference is `plausible`.
+    Otherwise nothing is returned and the caller opens the name as spoken.
+
+    The first lookup loads the index while other threads wait on the lock.
+    """
+
+    def __init__(self, source: Path = SITES_PATH, path: Path = INDEX_PATH):
+        self.source = source
+        self.path = path
+        self.entries = 0
+        self.lookups = 0
+
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._loaded = False
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        Returns the host for a spoken site name, or None if nothing is close.
+        """
+
+        key = compact(FILLER_RE.sub("", name.strip().lower()))
+        if not key or not self._load():
+            return None
+        self.lookups += 1
+
+        entry = self._exact(key)
+        if entry is None:
+            entry = self._fuzzy(key)
+        return None if entry is None else self._string("values", entry)
+
+    def close(self):
+        with self._lock:
+            self._unmap()
+            self._loaded = False
+
+    def _load(self) -> bool:
+        if self._loaded:
+            return self._mmap is not None
+
+        with self._lock:
+            if self._loaded:
+                return self._mmap is not None
+
+            try:
+                if self._stale():
+                    started = time.perf_counter()
+                    count = build_index(self.source, self.path)
+                    print(f"[Raven] Indexed {count} site names in {(time.perf_counter() - started) * 1000:.0f} ms")
+                self._map()
+            except FileNotFoundError:
+                return False
+            except Exception as e:
+                print(f"[Raven] Failed to load the site index: {e}")
+                self._unmap()
+                return False
+            finally:
+                # Only now may lookups skip the lock: the mapping is complete (or absent)
+                self._loaded = True
+            return True
+
+    def _stale(self) -> bool:
+        try:
+            with self.path.open("rb") as fh:
+                magic, version, mtime, size, *_ = HEADER.unpack(fh.read(HEADER.size))
+        except (OSError, struct.error):
+            return True
+
+        try:
+            stat = os.stat(self.source)
+        except FileNotFoundError:
+            # An index shipped without its JSON is still usable
+            return False
+        return (magic, version, mtime, size) != (MAGIC, VERSION, stat.st_mtime_ns, stat.st_size)
+
+    def _map(self):
+        with self.path.open("rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, _, entries, nodes, grams = HEADER.unpack_from(self._mmap)
+        if (magic, version) != (MAGIC, VERSION):
+            raise ValueError(f"{self.path.name} is not a version {VERSION} site index")
+        table = SECTION_TABLE.unpack_from(self._mmap, HEADER.size)
+        self.entries = entries
+
+        # Scalar reads go through memoryviews, batch reads through NumPy
+        view = self._view = memoryview(self._mmap)
+        for i, (name, dtype) in enumerate(SECTIONS):
+            offset, length = table[2 * i], table[2 * i + 1]
+            section = view[offset:offset + length]
+            if dtype is None:
+                setattr(self, "_" + name, section)
+            else:
+                setattr(self, "_" + name, section.cast(np.dtype(dtype).char))
+        self._gram_array = np.frombuffer(self._gram_keys, dtype=np.uint32)
+        self._key_offset_array = np.frombuffer(self._key_offsets, dtype=np.uint32)
+        self._postings_array = np.frombuffer(self._postings, dtype=np.uint32)
+
+    def _unmap(self):
+        # NumPy arrays and views must go before the mapping can be closed
+        self._gram_array = self._postings_array = self._key_offset_array = None
+        for name in [name for name, _ in SECTIONS] + ["view"]:
+            section = self.__dict__.pop("_" + name, None)
+            if section is not None:
+                section.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Still referenced by a lookup on another thread; freed with it
+                pass
+            self._mmap = None
+
+    def _string(self, section: str, entry: int):
+        offsets = getattr(self, f"_{section[:-1]}_offsets")
+        data = getattr(self, "_" + section)[offsets[entry]:offsets[entry + 1]]
+        return bytes(data) if section == "keys" else str(data, "utf-8")
+
+    def _exact(self, key: bytes) -> Optional[int]:
+        first, count, labels = self._node_first, self._node_count, self._node_label
+        node = 0
+        for byte in key:
+            lo = first[node]
+            hi = lo + count[node]
+            node = bisect.bisect_left(labels, byte, lo, hi)
+            if node == hi or labels[node] != byte:
+                return None
+        entry = self._node_entry[node]
+        return None if entry < 0 else entry
+
+    def _fuzzy(self, key: bytes) -> Optional[int]:
+        limit = max_edits(len(key))
+        if limit == 0:
+            return None
+
+        # Names within `limit` edits share all but at most 3 trigrams per edit
+        grams = trigrams(key)
+        positions = np.searchsorted(self._gram_array, grams)
+        found = positions < len(self._gram_array)
+        found[found] = self._gram_array[positions[found]] == grams[found]
+        positions = positions[found]
+        needed = len(grams) - 3 * limit
+        if len(positions) < needed:
+            return None
+
+        # Count only the entries in the postings, not every entry of the index
+        offsets = self._gram_offsets
+        postings = [self._postings_array[offsets[p]:offsets[p + 1]] for p in positions.tolist()]
+        candidates, shared = np.unique(np.concatenate(postings), return_counts=True)
+        keep = shared >= max(needed, 1)
+        candidates, shared = candidates[keep], shared[keep]
+
+        # ...and differ in length by at most `limit`
+        key_offsets = self._key_offset_array
+        lengths = key_offsets[candidates + 1].astype(np.int64) - key_offsets[candidates]
+        keep = np.abs(lengths - len(key)) <= limit
+        candidates, shared = candidates[keep], shared[keep]
+        if len(shared) > MAX_CANDIDATES:
+            top = np.argpartition(-shared, MAX_CANDIDATES)[:MAX_CANDIDATES]
+            candidates, shared = candidates[top], shared[top]
+
+        # Try candidates in tie-break order (most shared trigrams, then
+        # earliest in the JSON), so a later one only wins with fewer edits
+        # and the search can stop at one edit, the fewest a non-exact match has
+        priority = np.frombuffer(self._priority, dtype=np.uint32)[candidates]
+        order = np.lexsort((priority, -shared))
+        best = None
+        for entry, common in zip(candidates[order].tolist(), shared[order].tolist()):
+            name = self._string("keys", entry)
+            distance = edit_distance(key, name, limit)
+            if distance > limit or not plausible(key, name, common):
+                continue
+            best, limit = entry, distance - 1
+            if limit < 1:
+                break
+        return best
+
+# Shared index for the "open" action, loaded on first use
+site_index = SiteIndex()
+
+def resolve_site(name: str) -> Optional[str]:
+    """
+    Returns the host for a spoken site name from data/host_tlds.json, or None.
+    """
+
+    return site_index.resolve(name)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or query the site index.")
+    parser.add_argument("names", nargs="*", help="site names to resolve")
+    parser.add_argument("--build", action="store_true", help="rebuild the index from the JSON")
+    args = parser.parse_args()
+
+    if args.build:
+        started = time.perf_counter()
+        count = build_index()
+        print(f"Indexed {count} names into {INDEX_PATH.name} in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    for name in args.names:
+        started = time.perf_counter()
+        host = resolve_site(name)
+        print(f"{name!r} -> {host!r} ({(time.perf_counter() - started) * 1000:.3f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,56 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from urllib.parse import quote_plus
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
 import re
-import requests
+import threading
+import time
+
+from . import http_client
+from .executor import Cancelled, bind, check_cancelled
+from .cache import TTLCache
+from .forecast import ForecastDataset, describe_outlook, HOURLY_FIELDS, DAILY_FIELDS, FORECAST_DAYS
+from ...settings import BASE_DIR
+
+# Geocoding results as (lat, lon, display_name, address). Place names are
+# effectively static and our public IP rarely changes, so both are cached on
+# disk and repeat lookups never touch the network.
+GEOCODE_TTL = 30 * 24 * 3600
+IP_LOCATION_TTL = 24 * 3600
+IP_LOCATION_KEY = "@ip"
+HOME_LOCATION_KEY = "@home"
+geocode_cache = TTLCache(max_entries=256, ttl=GEOCODE_TTL, path=BASE_DIR / "data" / "geocode_cache.json")
+
+# Forecasts are cached per grid cell of FORECAST_GRID degrees (0.05° is ~5 km).
+# Open-Meteo refreshes current conditions every 15 minutes, so an entry is
+# fresh until the next update is due. Stale entries up to FORECAST_MAX_STALE
+# seconds old are still served immediately while a background refresh runs.
+FORECAST_URL = 'https://api.open-meteo.com/v1/forecast'
+FORECAST_GRID = 0.05
+FORECAST_DEFAULT_TTL = 900
+FORECAST_MAX_STALE = 3600
+FORECAST_MAX_ENTRIES = 64
+forecast_cache: "OrderedDict[Tuple[float, float], Dict[str, Any]]" = OrderedDict()
+forecast_lock = threading.Lock()
+forecast_refreshing = set()
+
+# handle_weather answers within WEATHER_BUDGET seconds. If Open-Meteo has not
+# answered after HEDGE_DELAY seconds a hedged request goes to wttr.in and the
+# first usable answer wins.
+WEATHER_BUDGET = 4.0
+HEDGE_DELAY = 1.2
+weather_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="raven-weather")
+
+# Background refresher for the home location (see start_home_refresher).
+# A bare "what's the weather" is answered from `home_weather` while it is
+# younger than HOME_WEATHER_MAX_AGE seconds.
+HOME_WEATHER_MAX_AGE = 1800
+HOME_REFRESH_MIN_WAIT = 60
+HOME_REFRESH_MAX_BACKOFF = 900
+home_weather: Optional[Dict[str, Any]] = None
+home_refresher: Optional[threading.Thread] = None
+home_refresher_stop = threading.Event()
 
 # Map Open-Meteo weather codes to short descriptions
 wc_map = {
@@ -78,30 +127,170 @@ def format_location_name(display_name: Optional[str] = None, address: Optional[D
     return 'your location'
 
 
-def parse_meteo_message(lat: float, lon: float, display_name: Optional[str] = None, address: Optional[Dict[str, Any]] = None) -> Optional[str]:
-    """Query Open-Meteo for current weather and format a TTS-friendly sentence.
+def normalize_location(location: str) -> str:
+    """Normalize a location query for cache lookups (case, punctuation and whitespace)."""
+    return ' '.join(re.sub(r"[^\w\s]", ' ', location.lower()).split())
 
-    Parameters
-    - lat, lon: Coordinates to query.
-    - display_name: Optional full display name (from Nominatim or ipinfo) used for fallback labelling.
-    - address: Optional structured address dict (Nominatim `address`) used to format a concise location.
+def geocode_location(location: str) -> Tuple[float, float, Optional[str], Optional[Dict[str, Any]]]:
+    """Forward-geocode `location` with Nominatim, using the geocoding cache.
 
-    Returns a short string suitable for display and TTS, or None on unexpected failures
-    (so callers can try fallbacks).
+    Returns (lat, lon, display_name, address). Raises on lookup failures.
     """
+    key = normalize_location(location)
+    cached = geocode_cache.get(key)
+    if cached is not None:
+        return tuple(cached)
+
+    nom_url = 'https://nominatim.openstreetmap.org/search'
+    headers = {'User-Agent': 'RavenAssistant/1.0'}
+    params = {'q': location, 'format': 'json', 'limit': 1, 'addressdetails': 1}
+    r = http_client.get(nom_url, params=params, headers=headers, timeout=6.0)
+    r.raise_for_status()
+    data = r.json()
+    if not data:
+        raise RuntimeError('geocoding returned no results')
+    place = data[0]
+    result = (float(place.get('lat')), float(place.get('lon')), place.get('display_name'), place.get('address'))
+
+    geocode_cache.set(key, list(result))
+    return result
+
+def locate_by_ip() -> Tuple[float, float, Optional[str], Optional[Dict[str, Any]]]:
+    """Find the user's approximate location from their public IP via ipinfo.io, using the geocoding cache.
+
+    Returns (lat, lon, display_name, address). Raises on lookup failures.
+    """
+    cached = geocode_cache.get(IP_LOCATION_KEY)
+    if cached is not None:
+        return tuple(cached)
+
+    ipr = http_client.get('https://ipinfo.io/json', timeout=4.0)
+    ipr.raise_for_status()
+    ipj = ipr.json()
+    loc_field = ipj.get('loc')
+    if not loc_field:
+        raise RuntimeError('ipinfo returned no loc')
+    lat_s, lon_s = loc_field.split(',')
+    display_name = ', '.join([p for p in [ipj.get('city'), ipj.get('region'), ipj.get('country')] if p]) or 'your location'
+    result = (float(lat_s), float(lon_s), display_name, None)
+
+    geocode_cache.set(IP_LOCATION_KEY, list(result), ttl=IP_LOCATION_TTL)
+    # Remember the last known home location for longer than the IP entry so a
+    # forecast can be started before the IP lookup is repeated.
+    geocode_cache.set(HOME_LOCATION_KEY, list(result))
+    return result
+
+def forecast_bucket(lat: float, lon: float) -> Tuple[float, float]:
+    """Snap coordinates to the forecast cache grid."""
+    return (round(round(lat / FORECAST_GRID) * FORECAST_GRID, 4), round(round(lon / FORECAST_GRID) * FORECAST_GRID, 4))
+
+def forecast_expiry(data: Dict[str, Any], fetched: float) -> float:
+    """Return when a forecast payload is due to be replaced upstream.
+
+    Open-Meteo stamps `current_weather` with the (local) start of its update
+    interval; the next update lands one interval later.
+    """
+    cw = data.get('current_weather') or {}
+    interval = cw.get('interval') or FORECAST_DEFAULT_TTL
     try:
-        params = {
-            'latitude': lat,
-            'longitude': lon,
-            'current_weather': 'true',
-            'temperature_unit': 'fahrenheit',
-            'windspeed_unit': 'mph',
-            'timezone': 'auto'
-        }
-        r = requests.get('https://api.open-meteo.com/v1/forecast', params=params, timeout=6.0)
-        if r.status_code != 200:
+        start = datetime.fromisoformat(cw['time']).replace(tzinfo=timezone.utc).timestamp()
+        expires = start - data.get('utc_offset_seconds', 0) + interval
+    except Exception:
+        expires = fetched + interval
+
+    # Guard against clock skew and odd timestamps
+    return min(max(expires, fetched + 60), fetched + interval)
+
+def request_forecast(lat: float, lon: float) -> Optional[Dict[str, Any]]:
+    """Fetch the raw Open-Meteo payload (current, hourly and daily) for the given coordinates."""
+    params = {
+        'latitude': lat,
+        'longitude': lon,
+        'current_weather': 'true',
+        'hourly': HOURLY_FIELDS,
+        'daily': DAILY_FIELDS,
+        'forecast_days': FORECAST_DAYS,
+        'temperature_unit': 'fahrenheit',
+        'windspeed_unit': 'mph',
+        'timezone': 'auto'
+    }
+    r = http_client.get(FORECAST_URL, params=params, timeout=6.0)
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def refresh_forecast(bucket: Tuple[float, float]) -> Optional[Dict[str, Any]]:
+    """Fetch the forecast for a grid cell and store it in the forecast cache."""
+    try:
+        data = request_forecast(*bucket)
+    except Exception as e:
+        print(f"[Raven] Forecast refresh failed for {bucket}: {e}")
+        data = None
+
+    with forecast_lock:
+        forecast_refreshing.discard(bucket)
+        if not data:
             return None
-        data = r.json()
+
+        fetched = time.time()
+        forecast_cache[bucket] = {'data': data, 'fetched': fetched, 'expires': forecast_expiry(data, fetched)}
+        forecast_cache.move_to_end(bucket)
+        while len(forecast_cache) > FORECAST_MAX_ENTRIES:
+            forecast_cache.popitem(last=False)
+
+    return data
+
+def get_forecast(lat: float, lon: float) -> Optional[Dict[str, Any]]:
+    """Return the full Open-Meteo payload for the grid cell containing (lat, lon).
+
+    Fresh entries are returned from memory. Stale entries (up to
+    FORECAST_MAX_STALE seconds past expiry) are returned immediately and
+    refreshed in the background. Anything older is fetched synchronously.
+    """
+    bucket = forecast_bucket(lat, lon)
+    now = time.time()
+
+    with forecast_lock:
+        entry = forecast_cache.get(bucket)
+        if entry is not None:
+            forecast_cache.move_to_end(bucket)
+            if now < entry['expires']:
+                return entry['data']
+
+            if now < entry['expires'] + FORECAST_MAX_STALE:
+                if bucket not in forecast_refreshing:
+                    forecast_refreshing.add(bucket)
+                    threading.Thread(target=refresh_forecast, args=(bucket,), daemon=True).start()
+                return entry['data']
+
+        forecast_refreshing.add(bucket)
+
+    return refresh_forecast(bucket)
+
+def get_forecast_dataset(lat: float, lon: float) -> Optional[ForecastDataset]:
+    """Return the columnar hourly/daily dataset for the grid cell containing (lat, lon).
+
+    The dataset is built once per cached payload and kept next to it.
+    """
+    data = get_forecast(lat, lon)
+    if not data:
+        return None
+
+    with forecast_lock:
+        entry = forecast_cache.get(forecast_bucket(lat, lon))
+        if entry is not None and entry['data'] is data:
+            if entry.get('dataset') is None:
+                entry['dataset'] = ForecastDataset(data)
+            return entry['dataset']
+
+    return ForecastDataset(data)
+
+def format_meteo_message(data: Dict[str, Any], display_name: Optional[str] = None, address: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Format the `current_weather` block of an Open-Meteo payload as a TTS-friendly sentence.
+
+    Returns None when the payload has no usable current conditions.
+    """
+    try:
         cw = data.get('current_weather')
         if not cw:
             return None
@@ -121,65 +310,245 @@ def parse_meteo_message(lat: float, lon: float, display_name: Optional[str] = No
 
         location = format_location_name(display_name, address)
 
-        message = f"The weather in {location} is {temp_str}. It is current weather is {condition}. The wind is {wind_mph:.1f} mph"
+        message = f"The weather in {location} is {temp_str}. Current conditions are {condition}. The wind is {wind_mph:.1f} mph"
         return message
     except Exception:
         return None
 
-def handle_weather(location: Optional[str] = None) -> str:
+def parse_meteo_message(lat: float, lon: float, display_name: Optional[str] = None, address: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Query Open-Meteo for current weather and format a TTS-friendly sentence.
+
+    Parameters
+    - lat, lon: Coordinates to query.
+    - display_name: Optional full display name (from Nominatim or ipinfo) used for fallback labelling.
+    - address: Optional structured address dict (Nominatim `address`) used to format a concise location.
+
+    The forecast comes from `get_forecast`, so repeated questions about the
+    same area are answered from the forecast cache.
+
+    Returns a short string suitable for display and TTS, or None on unexpected failures
+    (so callers can try fallbacks).
+    """
+    try:
+        data = get_forecast(lat, lon)
+        if not data:
+            return None
+        return format_meteo_message(data, display_name, address)
+    except Exception:
+        return None
+
+def parse_meteo_outlook(lat: float, lon: float, display_name: Optional[str] = None, address: Optional[Dict[str, Any]] = None, when: str = 'later') -> Optional[str]:
+    """Answer a time-qualified question ("tomorrow", "later", "next 3 hours", ...) from the cached forecast.
+
+    Returns None when the forecast does not cover the requested window.
+    """
+    try:
+        dataset = get_forecast_dataset(lat, lon)
+        if dataset is None:
+            return None
+        return describe_outlook(dataset, when, format_location_name(display_name, address), wc_map)
+    except Exception as e:
+        print(f"[Raven] Could not answer weather for {when!r}: {e!r}")
+        return None
+
+def parse_wttr_message(lat: float, lon: float, display_name: Optional[str] = None, address: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Query wttr.in (secondary provider) and format the same sentence as `parse_meteo_message`.
+
+    Returns None on any failure.
+    """
+    try:
+        r = http_client.get(f'https://wttr.in/{lat:.4f},{lon:.4f}', params={'format': 'j1'}, timeout=6.0)
+        if r.status_code != 200:
+            return None
+        cc = (r.json().get('current_condition') or [None])[0]
+        if not cc:
+            return None
+
+        temp_str = f"{float(cc['temp_F']):.1f}°F"
+        condition = (cc.get('weatherDesc') or [{}])[0].get('value', '').strip().lower() or None
+        wind_mph = float(cc.get('windspeedMiles') or 0)
+
+        location = format_location_name(display_name, address)
+
+        return f"The weather in {location} is {temp_str}. Current conditions are {condition}. The wind is {wind_mph:.1f} mph"
+    except Exception:
+        return None
+
+def hedged_weather_message(place: Tuple[float, float, Optional[str], Optional[Dict[str, Any]]], deadline: float, primary=None) -> Optional[str]:
+    """Return the first usable weather sentence for `place` before `deadline`.
+
+    Open-Meteo is queried first (or `primary`, an already running Open-Meteo
+    future, is reused). If it has not answered within HEDGE_DELAY seconds, or
+    fails, wttr.in is queried as well and whichever answers first wins.
+    """
+    pending = {primary or weather_executor.submit(bind(parse_meteo_message), *place)}
+    hedged = False
+
+    while pending:
+        check_cancelled()
+        remaining = deadline - time.monotonic()
+        timeout = max(0.0, min(remaining, HEDGE_DELAY) if not hedged else remaining)
+
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            msg = future.result()
+            if msg:
+                return msg
+
+        if remaining <= 0:
+            break
+        if not hedged:
+            hedged = True
+            print("[Raven] Weather provider slow or failing, hedging with wttr.in")
+            pending.add(weather_executor.submit(bind(parse_wttr_message), *place))
+
+    return None
+
+def result_before(future, deadline: float):
+    """Return the result of `future`, or raise TimeoutError once `deadline` passes."""
+    return future.result(timeout=max(0.0, deadline - time.monotonic()))
+
+def home_weather_age() -> Optional[float]:
+    """Return how many seconds old the prefetched home weather is, or None if there is none."""
+    snapshot = home_weather
+    if snapshot is None:
+        return None
+    return time.time() - snapshot['fetched']
+
+def refresh_home_weather() -> float:
+    """Fetch the home location's current conditions into `home_weather`.
+
+    Returns the time (epoch seconds) at which Open-Meteo will have newer data.
+    Raises when the location or forecast cannot be fetched.
+    """
+    global home_weather
+
+    place = locate_by_ip()
+    bucket = forecast_bucket(*place[:2])
+    data = refresh_forecast(bucket)
+    msg = format_meteo_message(data, place[2], place[3]) if data else None
+    if not msg:
+        raise RuntimeError('open-meteo returned no usable data')
+
+    fetched = time.time()
+    home_weather = {'message': msg, 'place': place, 'fetched': fetched}
+    return forecast_expiry(data, fetched)
+
+def home_refresher_loop(settings: dict):
+    """Keep `home_weather` current until `home_refresher_stop` is set.
+
+    Refreshes right after each Open-Meteo update, idles while the assistant is
+    disabled and backs off exponentially while offline.
+    """
+    backoff = HOME_REFRESH_MIN_WAIT
+    while not home_refresher_stop.is_set():
+        if not settings.get("assistant_enabled", False):
+            home_refresher_stop.wait(HOME_REFRESH_MIN_WAIT)
+            continue
+
+        try:
+            next_update = refresh_home_weather()
+        except Exception as e:
+            print(f"[Raven] Home weather refresh failed, retrying in {backoff}s: {e!r}")
+            home_refresher_stop.wait(backoff)
+            backoff = min(backoff * 2, HOME_REFRESH_MAX_BACKOFF)
+            continue
+
+        backoff = HOME_REFRESH_MIN_WAIT
+        home_refresher_stop.wait(max(next_update - time.time() + 30, HOME_REFRESH_MIN_WAIT))
+
+def start_home_refresher(settings: dict):
+    """Start the background home weather refresher (no-op if already running)."""
+    global home_refresher
+
+    if home_refresher is not None and home_refresher.is_alive():
+        return
+    home_refresher_stop.clear()
+    home_refresher = threading.Thread(target=home_refresher_loop, args=(settings,), daemon=True, name="raven-home-weather")
+    home_refresher.start()
+
+def stop_home_refresher(timeout: Optional[float] = None):
+    """Ask the background home weather refresher to exit, waiting up to `timeout` seconds."""
+    home_refresher_stop.set()
+    if timeout is not None and home_refresher is not None:
+        home_refresher.join(timeout)
+
+def handle_weather(location: Optional[str] = None, when: Optional[str] = None) -> str:
     """Public entrypoint: return a short weather sentence for `location`.
 
     If `location` is provided we forward-geocode it with Nominatim and query
-    Open-Meteo. If not provided the function attempts to determine the user's
-    location via `ipinfo.io` (best-effort) and reverse-geocodes with Nominatim
-    to get a structured address. All external calls use short timeouts and the
-    function falls back to `wttr.in` when structured data isn't available.
+    Open-Meteo as soon as the coordinates arrive. If not provided the user's
+    location is looked up via `ipinfo.io` while the forecast for the last
+    known home location is already being fetched; the home forecast is used
+    when the IP lookup agrees with it (or fails). When the background home
+    refresher is running, a recent prefetched answer is returned directly.
+    Forecasts fall back to a hedged `wttr.in` request when Open-Meteo is
+    slow, and the whole call returns within WEATHER_BUDGET seconds.
+
+    `when` is the time qualifier from the intent detector ("tomorrow",
+    "later", "next 3 hours", ...). It is answered from the hourly/daily data
+    of the same cached forecast, falling back to current conditions.
 
     The returned string is suitable for display in the live GUI and for TTS.
     """
     loc = (location or '').strip()
 
+    # Answer from the prefetched home weather when it is recent enough
+    age = home_weather_age()
+    if not loc and not when and age is not None and age <= HOME_WEATHER_MAX_AGE:
+        msg = home_weather['message']
+        print(f"[Raven] {msg} (prefetched {age:.0f}s ago)")
+        return msg
+
+    deadline = time.monotonic() + WEATHER_BUDGET
+
     # Determine coordinates and a display name
     try:
+        msg = None
+        primary = None
         if loc:
-            # forward geocode via Nominatim
-            nom_url = 'https://nominatim.openstreetmap.org/search'
-            headers = {'User-Agent': 'RavenAssistant/1.0'}
-            params = {'q': loc, 'format': 'json', 'limit': 1, 'addressdetails': 1}
-            r = requests.get(nom_url, params=params, headers=headers, timeout=6.0)
-            r.raise_for_status()
-            data = r.json()
-            if not data:
-                raise RuntimeError('geocoding returned no results')
-            place = data[0]
-            lat = float(place.get('lat'))
-            lon = float(place.get('lon'))
-            display_name = place.get('display_name')
-            address = place.get('address')
+            place = result_before(weather_executor.submit(bind(geocode_location), loc), deadline)
         else:
-            # use IP-based location (simple): ipinfo -> coords
-            ipr = requests.get('https://ipinfo.io/json', timeout=4.0)
-            ipr.raise_for_status()
-            ipj = ipr.json()
-            loc_field = ipj.get('loc')
-            if not loc_field:
-                raise RuntimeError('ipinfo returned no loc')
-            lat_s, lon_s = loc_field.split(',')
-            lat = float(lat_s)
-            lon = float(lon_s)
-            display_name = ', '.join([p for p in [ipj.get('city'), ipj.get('region'), ipj.get('country')] if p]) or 'your location'
-            address = None
-
-        # Query Open-Meteo and return a compact formatted message.
-        msg = parse_meteo_message(lat, lon, display_name, address)
+            ip_future = weather_executor.submit(bind(locate_by_ip))
+            home = geocode_cache.get(HOME_LOCATION_KEY)
+            home_future = weather_executor.submit(bind(parse_meteo_message), *home) if home else None
+
+            try:
+                # Leave time to hedge the home forecast if the IP lookup stalls
+                place = result_before(ip_future, deadline - HEDGE_DELAY if home else deadline)
+            except Exception as exc:
+                if not home:
+                    raise
+                print(f"[Raven] IP location unavailable ({exc!r}), using last known home location")
+                place = tuple(home)
+
+            if home and forecast_bucket(*place[:2]) == forecast_bucket(*home[:2]):
+                place, primary = tuple(home), home_future
+
+        if when:
+            # The current-conditions request already in flight fills the forecast cache
+            if primary is not None:
+                wait([primary], timeout=max(0.0, deadline - time.monotonic()))
+            try:
+                msg = result_before(weather_executor.submit(bind(parse_meteo_outlook), *place, when), deadline)
+            except Exception:
+                msg = None
+
+        if not msg:
+            msg = hedged_weather_message(place, deadline, primary=primary)
+
         if not msg:
-            raise RuntimeError('open-meteo returned no usable data')
+            check_cancelled()
+            raise RuntimeError('no weather provider answered in time')
 
         # Print and return the message as requested
         print(f"[Raven] {msg}")
         return msg
 
+    except Cancelled:
+        # Reported by the action executor
+        raise
     except Exception as exc:
-        err = f"[Raven] Unable to get weather: {exc}"
+        err = f"[Raven] Unable to get weather: {exc!r}"
         print(err)
         return 'Unable to get weather.'
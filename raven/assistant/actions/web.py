@@ -1,42 +1,32 @@
-import os
 import re
 import webbrowser
 from urllib.parse import quote_plus
-import json
-from pathlib import Path
 
-# Load host->tld mapping from repo `data/host_tlds.json`
-HOST_TLDS = {}
-try:
-    mapping_path = Path(__file__).resolve().parents[3] / "data" / "host_tlds.json"
-    if mapping_path.exists():
-        with open(mapping_path, "r", encoding="utf-8") as fh:
-            HOST_TLDS = json.load(fh)
-except Exception:
-    HOST_TLDS = {}
+from .executor import check_cancelled
+from .sites import resolve_site
 
 
 def handle_open(target: str):
     print(f"[Raven] Opening: {target}")
     t = target.strip()
 
-    if ' ' in t:
-        handle_search(t)
-        return
-
     if re.search(r"^https?://", t, re.IGNORECASE):
         url = t
     else:
-        token = t.lower()
-        mapped = HOST_TLDS.get(token)
+        # Site names (including "apple music" or a misheard "get hub") from data/host_tlds.json
+        mapped = resolve_site(t)
         if mapped:
             url = "https://" + mapped if not re.search(r"^https?://", mapped) else mapped
+        elif ' ' in t:
+            handle_search(t)
+            return
+        elif '.' in t:
+            url = "https://" + t
         else:
-            if '.' in token:
-                url = "https://" + t
-            else:
-                url = f"https://{t}.com"
+            url = f"https://{t}.com"
 
+    # Don't launch the browser for a command that was cancelled meanwhile
+    check_cancelled()
     try:
         webbrowser.open(url)
     except Exception as e:
@@ -46,6 +36,7 @@ def handle_open(target: str):
 def handle_search(query: str):
     print(f"[Raven] Searching for: {query}")
     url = "https://www.google.com/search?q=" + quote_plus(query)
+    check_cancelled()
     try:
         webbrowser.open(url)
     except Exception:
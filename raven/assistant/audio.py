@@ -0,0 +1,229 @@
+import threading
+
+import numpy as np
+
+class RingBuffer:
+    """
+    Preallocated int16 ring buffer for mono audio.
+
+    Blocks are written in place; `written` counts every sample ever written,
+    so positions can be expressed as absolute sample indices. `buffer` can be
+    existing int16 storage of `capacity` samples (e.g. shared memory).
+    """
+
+    def __init__(self, capacity: int, buffer: np.ndarray = None):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.int16) if buffer is None else buffer
+        self.written = 0
+
+    def write(self, block: np.ndarray) -> np.ndarray:
+        """
+        Writes a block of int16 samples (copied as they are) or float32
+        (-1.0..1.0) samples. Float samples are scaled by 32767 and truncated,
+        matching `(block * 32767).astype(np.int16)` bit for bit without the
+        temporaries.
+
+        Returns a view of the written samples when they did not wrap,
+        otherwise a view of the tail that did.
+        """
+
+        n = len(block)
+        pos = self.written % self.capacity
+        first = min(n, self.capacity - pos)
+
+        self._store(block[:first], self.buffer[pos:pos + first])
+        if first < n:
+            self._store(block[first:], self.buffer[:n - first])
+            view = self.buffer[:n - first]
+        else:
+            view = self.buffer[pos:pos + first]
+
+        self.written += n
+        return view
+
+    def _store(self, src: np.ndarray, dst: np.ndarray):
+        if src.dtype == np.int16:
+            np.copyto(dst, src)
+        else:
+            np.multiply(src, 32767, out=dst, casting="unsafe")
+
+    def linear(self) -> np.ndarray:
+        """
+        Returns a zero-copy view of everything written so far.
+        Only valid while the buffer has not wrapped.
+        """
+
+        if self.written > self.capacity:
+            raise ValueError("ring buffer has wrapped")
+        return self.buffer[:self.written]
+
+    def full(self) -> bool:
+        return self.written >= self.capacity
+
+    def segments(self, start: int, end: int):
+        """
+        Yields views covering absolute samples [start, end), oldest first.
+        Samples that have already been overwritten are skipped.
+        """
+
+        start = max(start, self.written - self.capacity, 0)
+        end = min(end, self.written)
+        while start < end:
+            pos = start % self.capacity
+            n = min(end - start, self.capacity - pos)
+            yield self.buffer[pos:pos + n]
+            start += n
+
+def preroll_capacity(sample_rate: int, frame_length: int, seconds: float) -> int:
+    """
+    Number of samples in a pre-roll of whole frames covering about `seconds`.
+    """
+
+    return max(1, int(seconds * sample_rate) // frame_length) * frame_length
+
+class CommandRecorder:
+    """
+    Collects one spoken command from a CaptureHub into a bounded buffer.
+
+    `endpoint(block)` is called for every int16 block and returns True once
+    the command is over; `done` is set then, or when the buffer is full.
+    `stream(block)`, if given, receives every block as it is captured (e.g.
+    to feed a streaming recognizer).
+    """
+
+    def __init__(self, max_samples: int, endpoint, stream=None):
+        self.buffer = RingBuffer(max_samples)
+        self.endpoint = endpoint
+        self.stream = stream
+        self.done = threading.Event()
+
+    def feed(self, frame: np.ndarray, start: int = 0):
+        if self.done.is_set():
+            return
+
+        chunk = self.buffer.write(frame[:self.buffer.capacity - self.buffer.written])
+        if self.stream is not None:
+            self.stream(chunk)
+        if self.endpoint(chunk) or self.buffer.full():
+            self.done.set()
+
+class CaptureHub:
+    """
+    Owns the single audio input stream.
+
+    Every frame is converted to int16 once, kept in a short pre-roll ring
+    buffer and handed to each consumer as `consumer(frame, start)`, where
+    `start` is the absolute index of the frame's first sample. Frames are
+    views that are only valid during the call.
+
+    Input overflows/underflows reported by the driver are counted; an
+    overflow means samples were lost because a callback ran too late.
+    """
+
+    def __init__(self, sample_rate: int, frame_length: int, preroll_seconds: float = 1.0, ring: RingBuffer = None):
+        self.sample_rate = sample_rate
+        self.frame_length = frame_length
+
+        # Whole frames only, so a frame never wraps inside the ring
+        if ring is None:
+            ring = RingBuffer(preroll_capacity(sample_rate, frame_length, preroll_seconds))
+        self.ring = ring
+
+        self.overflows = 0
+        self.underflows = 0
+
+        self.consumers = []
+        self.stream = None
+        self._lock = threading.Lock()
+
+    def add_consumer(self, consumer):
+        with self._lock:
+            self.consumers = self.consumers + [consumer]
+
+    def remove_consumer(self, consumer):
+        with self._lock:
+            self.consumers = [c for c in self.consumers if c is not consumer]
+
+    def attach(self, consumer, start: int) -> int:
+        """
+        Replays the pre-roll from absolute sample `start` to `consumer`, then
+        subscribes it to live frames, so it sees every sample from `start` on.
+
+        Returns the number of samples replayed from the pre-roll.
+        """
+
+        with self._lock:
+            replayed = 0
+            position = max(start, self.ring.written - self.ring.capacity)
+            for segment in self.ring.segments(start, self.ring.written):
+                consumer(segment, position + replayed)
+                replayed += len(segment)
+            self.consumers = self.consumers + [consumer]
+        return replayed
+
+    def preroll(self, end: int) -> np.ndarray:
+        """
+        Returns a copy of the pre-roll samples that arrived before absolute sample `end`.
+        """
+
+        with self._lock:
+            segments = list(self.ring.segments(end - self.ring.capacity, end))
+            return np.concatenate(segments) if segments else np.zeros(0, dtype=np.int16)
+
+    @property
+    def position(self) -> int:
+        """
+        Absolute index of the next sample to arrive.
+        """
+
+        return self.ring.written
+
+    def stats(self) -> dict:
+        """
+        Returns the stream position and the driver's overflow/underflow counts.
+        """
+
+        return {
+            "position": self.position,
+            "overflows": self.overflows,
+            "underflows": self.underflows,
+        }
+
+    def callback(self, indata, frames, time_info, status):
+        if status:
+            self.overflows += bool(status.input_overflow)
+            self.underflows += bool(status.input_underflow)
+
+        with self._lock:
+            start = self.ring.written
+            frame = self.ring.write(indata[:, 0])
+            for consumer in self.consumers:
+                consumer(frame, start)
+
+    def start(self):
+        """
+        Opens and starts the input stream.
+        Samples arrive as int16, the format Porcupine and the recognizers use,
+        so the callback only copies them into the pre-roll.
+        """
+
+        import sounddevice as sd
+
+        self.stream = sd.InputStream(
+            channels=1,
+            samplerate=self.sample_rate,
+            blocksize=self.frame_length,
+            dtype="int16",
+            callback=self.callback
+        )
+        self.stream.start()
+
+    def stop(self):
+        """
+        Stops and closes the input stream.
+        """
+
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
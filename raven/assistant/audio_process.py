@@ -0,0 +1,411 @@
+"""
+Audio capture and wake-word detection in a separate process.
+
+The GUI, the keyboard hook and network actions all compete for the GIL in
+the main process; when the audio callback waits on them the driver drops
+input. With `audio_process` enabled the input stream and Porcupine run in
+a child process instead:
+
+- Frames are written to a ring buffer in shared memory. The child is the
+  only writer; it stores the samples and then publishes the new `written`
+  count in the shared header, so readers need no lock.
+- Wake-word detections and changes in the driver's overflow/underflow
+  counts come back over a multiprocessing queue.
+- The only value going the other way, whether the wake-word energy gate is
+  on, is a flag in the shared header that the child reads every frame.
+- `RemoteCaptureHub` gives the main process the CaptureHub interface on top
+  of the shared ring, so command capture and recognition work unchanged.
+"""
+
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+from .audio import RingBuffer, preroll_capacity
+
+# Porcupine's fixed input format
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 512
+
+# Shared header: samples written, input overflows, input underflows (written
+# by the child), energy gate enabled (written by the main process)
+HEADER_FIELDS = 4
+HEADER_BYTES = 64
+GATE_FIELD = 3
+
+class SharedRingBuffer(RingBuffer):
+    """
+    RingBuffer whose samples and counters live in a SharedMemory block.
+
+    Only one process may write. Readers take `written`, read the samples
+    they need and check `written` again to see whether any were overwritten
+    in the meantime.
+    """
+
+    def __init__(self, capacity: int, shm: shared_memory.SharedMemory):
+        # RingBuffer.__init__ would reset the shared counter
+        self.capacity = capacity
+        self.shm = shm
+        self.header = np.ndarray(HEADER_FIELDS, dtype=np.int64, buffer=shm.buf)
+        self.buffer = np.ndarray(capacity, dtype=np.int16, buffer=shm.buf, offset=HEADER_BYTES)
+
+    @staticmethod
+    def size(capacity: int) -> int:
+        return HEADER_BYTES + capacity * 2
+
+    @property
+    def written(self) -> int:
+        return int(self.header[0])
+
+    @written.setter
+    def written(self, value: int):
+        self.header[0] = value
+
+    def release(self):
+        # Views must go before the mapping can be closed
+        self.header = self.buffer = None
+        self.shm.close()
+
+def audio_process_main(access_key: str, keyword_path: str, sensitivity: float,
+                       shm_name: str, capacity: int, events, stop):
+    """
+    Entry point of the audio process: runs the input stream and Porcupine
+    until `stop` is set. The energy gate follows the header's GATE_FIELD. Posts ("ready",), ("wake", wake_end, detected_at),
+    ("status", overflows, underflows) and ("error", message) to `events`.
+    """
+
+    import pvporcupine
+
+    from .audio import CaptureHub
+    from .vad import EnergyGate
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = SharedRingBuffer(capacity, shm)
+    porcupine = None
+    hub = None
+
+    try:
+        porcupine = pvporcupine.create(access_key=access_key, keyword_paths=[keyword_path], sensitivities=[sensitivity])
+        if porcupine.sample_rate != SAMPLE_RATE or porcupine.frame_length != FRAME_LENGTH:
+            raise ValueError(f"unexpected Porcupine format {porcupine.sample_rate} Hz / {porcupine.frame_length}")
+
+        hub = CaptureHub(SAMPLE_RATE, FRAME_LENGTH, ring=ring)
+        header = ring.header
+        reported = [0, 0]
+        gate = None
+
+        def wake_word_consumer(pcm, start):
+            nonlocal gate
+            # Driver status is counted by the hub before consumers run
+            if hub.overflows != reported[0] or hub.underflows != reported[1]:
+                reported[:] = hub.overflows, hub.underflows
+                header[1], header[2] = reported
+                events.put(("status", hub.overflows, hub.underflows))
+
+            # Turned on or off live from the main process
+            if bool(header[GATE_FIELD]) != (gate is not None):
+                gate = EnergyGate(FRAME_LENGTH) if header[GATE_FIELD] else None
+
+            frames = gate.admit(pcm, start) if gate is not None else ((pcm, start),)
+            for frame, frame_start in frames:
+                # perf_counter is system-wide, so the main process can compare it
+                if porcupine.process(frame) >= 0:
+                    events.put(("wake", frame_start + len(frame), time.perf_counter()))
+
+        hub.add_consumer(wake_word_consumer)
+        hub.start()
+        events.put(("ready",))
+        stop.wait()
+
+    except Exception as e:
+        events.put(("error", f"{e!r}"))
+
+    finally:
+        if hub is not None:
+            hub.stop()
+        if porcupine is not None:
+            porcupine.delete()
+        ring.release()
+
+class RemoteCaptureHub:
+    """
+    CaptureHub interface over the audio process's shared ring.
+
+    Wake-word detection happens in the audio process, so this hub only
+    serves command capture: while a consumer is attached a reader thread
+    delivers new frames from the ring, and it sleeps otherwise.
+    """
+
+    def __init__(self, ring: SharedRingBuffer, sample_rate: int = SAMPLE_RATE, frame_length: int = FRAME_LENGTH):
+        self.ring = ring
+        self.sample_rate = sample_rate
+        self.frame_length = frame_length
+        self.consumers = []
+        self.read_position = 0
+        self.overruns = 0
+
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._running = False
+        self._scratch = np.zeros(ring.capacity, dtype=np.int16)
+        self._reader = None
+
+    def add_consumer(self, consumer):
+        self.attach(consumer, self.position)
+
+    def remove_consumer(self, consumer):
+        with self._lock:
+            self.consumers = [c for c in self.consumers if c is not consumer]
+            if not self.consumers:
+                self._active.clear()
+
+    def attach(self, consumer, start: int) -> int:
+        """
+        Replays the ring from absolute sample `start`, then subscribes
+        `consumer` to new frames. Returns the number of samples replayed.
+        """
+
+        with self._lock:
+            if not self.consumers:
+                self.read_position = self.ring.written
+            replayed = self._deliver((consumer,), start, self.read_position)
+            self.consumers = self.consumers + [consumer]
+            self._active.set()
+        return replayed
+
+    def preroll(self, end: int) -> np.ndarray:
+        """
+        Returns a copy of the samples before absolute sample `end` still in the ring.
+        """
+
+        samples = np.concatenate([np.zeros(0, dtype=np.int16)] +
+                                 list(self.ring.segments(end - self.ring.capacity, end)))
+        # Drop whatever the writer overwrote while we were copying
+        lost = self.ring.written - self.ring.capacity - (end - len(samples))
+        return samples[max(lost, 0):]
+
+    @property
+    def position(self) -> int:
+        return self.ring.written
+
+    def set_gate(self, enabled: bool):
+        """
+        Turns the wake-word energy gate in the audio process on or off.
+        """
+
+        self.ring.header[GATE_FIELD] = int(enabled)
+
+    def stats(self) -> dict:
+        return {
+            "position": self.position,
+            "overflows": int(self.ring.header[1]),
+            "underflows": int(self.ring.header[2]),
+            "overruns": self.overruns,
+        }
+
+    def _deliver(self, consumers, start: int, end: int) -> int:
+        # Copy out of the ring first so the writer can't change a frame under
+        # a consumer, then check nothing was overwritten during the copy
+        ring = self.ring
+        position = max(start, ring.written - ring.capacity, 0)
+        delivered = 0
+
+        while position < end:
+            oldest = ring.written - ring.capacity
+            if position < oldest:
+                self.overruns += 1
+                position = oldest
+                continue
+
+            offset = position % ring.capacity
+            n = min(end - position, ring.capacity - offset)
+            chunk = self._scratch[:n]
+            np.copyto(chunk, ring.buffer[offset:offset + n])
+            if ring.written - ring.capacity > position:
+                continue
+
+            for consumer in consumers:
+                consumer(chunk, position)
+            position += n
+            delivered += n
+        return delivered
+
+    def _read_loop(self):
+        period = self.frame_length / self.sample_rate / 2
+        while True:
+            # Sleeps without waking while nothing is attached; stop() sets the event
+            self._active.wait()
+            if not self._running:
+                return
+
+            with self._lock:
+                end = self.ring.written
+                if end > self.read_position and self.consumers:
+                    self._deliver(self.consumers, self.read_position, end)
+                self.read_position = end
+
+            time.sleep(period)
+
+    def start(self):
+        self._running = True
+        with self._lock:
+            # stop() leaves the event set
+            if not self.consumers:
+                self._active.clear()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True, name="raven-audio-reader")
+        self._reader.start()
+
+    def stop(self):
+        self._running = False
+        self._active.set()
+        if self._reader is not None:
+            self._reader.join(1.0)
+            self._reader = None
+
+class AudioProcess:
+    """
+    Starts and stops the audio process and dispatches its events.
+
+    `on_wake(wake_end, detected_at)` is called from the event thread for
+    every detection. `ready` is set once the child is listening; `failed`
+    (with the child's message in `error`) when it reports an error.
+
+    `wait_ready` and `wait` block on the child's process sentinel and a
+    wakeup pipe written on those events and by `interrupt`, so waiting for
+    the child costs no periodic wakeups.
+    """
+
+    def __init__(self, access_key: str, keyword_path: str, on_wake=None, sensitivity: float = 0.9,
+                 gate_enabled: bool = False, preroll_seconds: float = 1.0, name: str = "Raven"):
+        self.on_wake = on_wake
+        self.name = name
+
+        capacity = preroll_capacity(SAMPLE_RATE, FRAME_LENGTH, preroll_seconds)
+        self.shm = shared_memory.SharedMemory(create=True, size=SharedRingBuffer.size(capacity))
+        self.ring = SharedRingBuffer(capacity, self.shm)
+        self.ring.header[:] = 0
+        self.hub = RemoteCaptureHub(self.ring)
+        self.hub.set_gate(gate_enabled)
+
+        ctx = mp.get_context("spawn")
+        self.events = ctx.Queue()
+        self.stop_event = ctx.Event()
+        self.ready = threading.Event()
+        self.failed = threading.Event()
+        self.error = None
+        self.interrupted = False
+        self._wakeup_reader, self._wakeup_writer = mp.Pipe(duplex=False)
+        self._wakeup_lock = threading.Lock()
+        self.process = ctx.Process(
+            target=audio_process_main,
+            args=(access_key, keyword_path, sensitivity, self.shm.name, capacity, self.events, self.stop_event),
+            daemon=True,
+            name="raven-audio"
+        )
+        self.event_thread = threading.Thread(target=self._event_loop, daemon=True, name="raven-audio-events")
+
+    def start(self):
+        self.process.start()
+        self.event_thread.start()
+        self.hub.start()
+
+    def _event_loop(self):
+        while True:
+            event = self.events.get()
+            kind = event[0]
+
+            if kind == "wake":
+                if self.on_wake is not None:
+                    self.on_wake(event[1], event[2])
+            elif kind == "status":
+                print(f"[{self.name}] Audio input overflows: {event[1]}, underflows: {event[2]}")
+            elif kind == "ready":
+                self.ready.set()
+                self._wake_waiters()
+            elif kind == "error":
+                print(f"[{self.name}] Audio process error: {event[1]}")
+                self.error = event[1]
+                self.failed.set()
+                self._wake_waiters()
+            elif kind == "closed":
+                return
+
+    def check(self):
+        """
+        Raises RuntimeError if the audio process reported an error or exited.
+        """
+
+        if self.failed.is_set():
+            raise RuntimeError(f"audio process failed: {self.error}")
+        if self.process.exitcode is not None or not self.process.is_alive():
+            raise RuntimeError(f"audio process exited with code {self.process.exitcode}")
+
+    def wait_ready(self, timeout: float = 10.0):
+        """
+        Waits until the audio process is listening. Raises RuntimeError if it
+        fails or exits first, TimeoutError if it takes longer than `timeout`.
+        """
+
+        deadline = time.monotonic() + timeout
+        while not self.ready.is_set():
+            self.check()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"audio process not ready after {timeout:.0f}s")
+            self._block(remaining)
+        self.check()
+
+    def wait(self):
+        """
+        Blocks until `interrupt` is called. Raises RuntimeError if the audio
+        process fails or exits first.
+        """
+
+        while not self.interrupted:
+            self.check()
+            self._block(None)
+
+    def interrupt(self):
+        """
+        Makes `wait` return. Safe to call from any thread, before or during the wait.
+        """
+
+        self.interrupted = True
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        with self._wakeup_lock:
+            if not self._wakeup_writer.closed:
+                self._wakeup_writer.send_bytes(b"")
+
+    def _block(self, timeout):
+        # Returns on a ready/error event, an interrupt or the child exiting
+        connection.wait([self.process.sentinel, self._wakeup_reader], timeout)
+        while self._wakeup_reader.poll():
+            self._wakeup_reader.recv_bytes()
+
+    def stop(self, timeout: float = 2.0):
+        """
+        Stops the audio process and releases the shared memory.
+        """
+
+        self.hub.stop()
+        # Setting a multiprocessing Event waits for its waiters to wake,
+        # which a child that has crashed never does
+        if self.process.is_alive():
+            self.stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+
+        self.events.put(("closed",))
+        self.event_thread.join(timeout)
+        with self._wakeup_lock:
+            self._wakeup_writer.close()
+        self._wakeup_reader.close()
+        self.ring.release()
+        self.shm.unlink()
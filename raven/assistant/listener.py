@@ -1,133 +1,393 @@
 import os
+import threading
 import time
-import pvporcupine
-import sounddevice as sd
-import numpy as np
-import speech_recognition as sr
-from dotenv import load_dotenv
-from threading import Thread
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .audio import CaptureHub, CommandRecorder
+from .pipeline import CommandPipeline
 from .processor import process_command
+from .vad import VoiceActivityDetector, EnergyGate
+from .recognizers import create_recognizer, SpeechNotUnderstood, RecognizerError
+from ..settings import Settings
+from .. import tracing
 
-# Load Picovoice API key from .env
-load_dotenv()
-ACCESS_KEY = os.getenv("RAVEN_PV_ACCESS_KEY")
-if ACCESS_KEY is None:
-    raise ValueError("RAVEN_PV_ACCESS_KEY not found in .env")
+# Wake-word model
+KEYWORD_PATH = "porcupine/Hey-Raven_en_windows_v3_0_0.ppn"
+
+# Seconds to wait for the audio process to start listening
+AUDIO_PROCESS_START_TIMEOUT = 10.0
 
 porcupine = None
 audio_stream = None
 agent_name = ""
 
-def start_listener(settings: dict):
+class Listener:
     """
-    Starts the wake-word listener.
-    Detects wake-word and triggers command recording.
+    The listening pipeline: wake-word detection, command capture, speech
+    recognition and dispatch, fed by a CaptureHub.
+
+    `detector` is anything with Porcupine's `process(pcm) -> int` interface and
+    `recognizer` a `recognizers.Recognizer`, so stand-ins can be swapped in
+    (see replay.py). `on_command(text, settings)` receives each transcript.
+    Without a detector, detections are reported through `wake_detected`
+    (see audio_process.py).
     """
 
-    global porcupine, audio_stream, agent_name
+    def __init__(self, settings: Settings, detector, recognizer, hub: CaptureHub, on_command=process_command, name: str = "Raven"):
+        self.settings = settings
+        self.detector = detector
+        self.recognizer = recognizer
+        self.hub = hub
+        self.on_command = on_command
+        self.name = name
+        self.sample_rate = hub.sample_rate
+        self.frame_length = hub.frame_length
 
-    # Wake-word model
-    path = "porcupine/Hey-Raven_en_windows_v3_0_0.ppn"
+        # Seconds from wake-word detection to dispatch, most recent last
+        self.dispatch_latencies = deque(maxlen=100)
+        # Recorder of the capture in progress, while it is attached to the hub
+        self.recorder = None
 
-    # Initialize Porcupine
-    porcupine = pvporcupine.create(
-        access_key=ACCESS_KEY,
-        keyword_paths=[path],
-        sensitivities=[0.9]
-    )
+        # At most one capture in flight and a small queue of commands waiting for
+        # recognition; repeated detections of one wake word are debounced
+        self.pipeline = CommandPipeline(
+            self.capture_command,
+            self.recognize_command,
+            refractory=settings.get("wake_refractory_seconds", 1.5),
+            max_queue=settings.get("command_queue_size", 2),
+            discard=self.discard_command
+        )
 
-    # Get the agent name from the Wake-word model file name for debugging
-    agent_name = path[path.index("-") + 1:path.index("_")]
-    print(f"[{agent_name}] Listening for wake word...")
-
-    frame_length = porcupine.frame_length
-    sample_rate = porcupine.sample_rate
-    recognizer = sr.Recognizer()
-
-    def record_command():
-        """
-        Records audio after wake-word detection until silence is detected.
-        Converts audio to text and processes the command if possible.
-        """
-
-        print(f"[{agent_name}] Listening for command...")
-
-        chunk_size = 1024
-        silence_threshold = 10
-        max_silence_chunks = 15
-        silence_chunks = 0
-        audio_buffer = deque()
-
-        def record_callback(indata, frames, time_info, status):
-            """
-            Appends sound data onto a deck unless silence is detected.
-            """
-            
-            # Add audio to buffer and track silence
-            nonlocal silence_chunks
-            chunk = (indata[:, 0] * 32767).astype(np.int16)
-            audio_buffer.append(chunk)
-            volume = int(np.abs(chunk).mean())
-            silence_chunks = 0 if volume > silence_threshold else silence_chunks + 1
-
-        # Repeatedly run record_callback until there is silence
-        with sd.InputStream(
-            channels=1,
-            samplerate=sample_rate,
-            blocksize=chunk_size,
-            callback=record_callback
-        ):
-            while silence_chunks < max_silence_chunks:
-                sd.sleep(50)
-
-        # Combine audio data and transcribe what was said
+        # Optional energy gate that skips the detector while the room is quiet
+        self.gate = None
+        self.set_gate(settings.get("wake_gate_enabled", False))
+
+        # Flags the audio callback checks, kept current by settings_changed
+        self.listening = False
+        self.wake_enabled = False
+        self.update_flags(settings.snapshot)
+
+    def start(self):
+        """
+        Starts the pipeline workers and subscribes to the hub.
+        Does not start the hub's audio stream.
+        """
+
+        self.pipeline.start()
+        self.settings.subscribe(self.settings_changed)
+        if self.detector is not None:
+            self.hub.add_consumer(self.wake_word_consumer)
+
+    def stop(self):
+        """
+        Unsubscribes from the hub and stops the pipeline workers.
+        """
+
+        if self.detector is not None:
+            self.hub.remove_consumer(self.wake_word_consumer)
+        self.settings.unsubscribe(self.settings_changed)
+        # End a capture in progress instead of waiting for audio that won't come
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.done.set()
+        self.pipeline.stop()
+
+    def set_gate(self, enabled: bool):
+        # The gate runs next to the detector, in the audio process when there is none here
+        if self.detector is None:
+            self.gate = None
+            if hasattr(self.hub, "set_gate"):
+                self.hub.set_gate(enabled)
+        else:
+            self.gate = EnergyGate(self.frame_length) if enabled else None
+
+    def update_flags(self, snapshot):
+        self.listening = snapshot.assistant_enabled and snapshot.stt_enabled
+        self.wake_enabled = self.listening and snapshot.wake_word_enabled
+
+    def settings_changed(self, snapshot, key: str):
+        """
+        Applies settings the running pipeline depends on, so edits (from the
+        GUI or settings.json) take effect without restarting the audio.
+        """
+
+        if key in ("assistant_enabled", "stt_enabled", "wake_word_enabled"):
+            self.update_flags(snapshot)
+        elif key == "wake_refractory_seconds":
+            self.pipeline.refractory = snapshot.wake_refractory_seconds
+        elif key == "command_queue_size":
+            self.pipeline.max_queue = max(int(snapshot.command_queue_size), 1)
+        elif key == "wake_gate_enabled":
+            self.set_gate(snapshot.wake_gate_enabled)
+        elif key in ("stt_backend", "vosk_model_path"):
+            # Captures already running finish with the old backend
+            self.recognizer = create_recognizer(self.settings)
+            print(f"[{self.name}] Speech recognition backend: {self.recognizer.name}")
+        elif key == "audio_process":
+            print(f"[{self.name}] audio_process takes effect after a restart")
+
+    def capture_command(self, wake_end: int, detected_at: float):
+        """
+        Records audio from the end of the wake word until silence is detected.
+        Runs on the pipeline's capture thread.
+
+        Returns (session, recorder, trace) for `recognize_command`.
+        """
+
+        # The trace starts at the detection; "wake" covers the handoff to this thread
+        trace = tracing.Trace(started=detected_at)
+        trace.add("wake", detected_at, time.perf_counter())
+
+        settings, hub, sample_rate = self.settings.snapshot, self.hub, self.sample_rate
+        print(f"[{self.name}] Listening for command...")
+
+        # End of speech is decided against the room's noise floor, calibrated
+        # from the audio just before the command and scaled by mic_sensitivity
+        vad = VoiceActivityDetector(sample_rate, settings.mic_sensitivity, block_size=self.frame_length)
+        vad.calibrate(hub.preroll(wake_end))
+
+        # The whole command is captured into one preallocated buffer; recording
+        # stops when it is full so talking over a TV can't grow it forever.
+        max_samples = int(settings.max_command_seconds * sample_rate)
+        # Streaming backends start decoding while the user is still speaking
+        session = self.recognizer.start(sample_rate)
+        session.on_partial = lambda text: print(f"[{self.name}] ... {text}")
+        recorder = CommandRecorder(max_samples, vad.process, session.feed)
+
+        # Start at the exact sample the wake word ended on; anything that
+        # arrived before we got here is replayed from the pre-roll
+        attached = time.perf_counter()
+        replayed = hub.attach(recorder.feed, wake_end)
+        self.recorder = recorder
+        print(f"[{self.name}] Capture attached {(time.perf_counter() - detected_at) * 1000:.1f} ms after wake word, "
+              f"{replayed / sample_rate * 1000:.0f} ms recovered from pre-roll")
+
+        recorder.done.wait()
+        ended = time.perf_counter()
+        hub.remove_consumer(recorder.feed)
+        self.recorder = None
+
+        # "endpoint" is the trailing silence the VAD waited through, inside "capture"
+        trace.add("capture", attached, ended)
+        trace.add("endpoint", ended - vad.endpoint_delay, ended)
+
+        print(f"[{self.name}] End of speech after {vad.endpoint_delay * 1000:.0f} ms of silence "
+              f"(noise floor {vad.noise_floor:.0f})")
+        if recorder.buffer.full():
+            print(f"[{self.name}] Command reached the {max_samples / sample_rate:.0f}s limit.")
+
+        return session, recorder, trace
+
+    def recognize_command(self, captured):
+        """
+        Converts a captured command to text and processes it if possible.
+        Runs on the pipeline's processing thread.
+        """
+
+        session, recorder, trace = captured
+        recognizer = self.recognizer
+
+        # Intent and action spans are added by process_command on this thread
+        tracing.current.trace = trace
+
+        # Transcribe what was said
         # If a message was detected, pass on the command to be processed
         try:
-            audio_data = np.concatenate(list(audio_buffer)).flatten().tobytes()
-            audio = sr.AudioData(audio_data, sample_rate, 2)
+            # Zero-copy byte view of the captured samples
+            audio_data = memoryview(recorder.buffer.linear()).cast("B")
             try:
-                command_text = recognizer.recognize_google(audio)
-                print(f"[{agent_name}] Command received: {command_text}")
-                process_command(command_text, settings)
-            except sr.UnknownValueError:
-                print(f"[{agent_name}] Could not understand audio.")
-            except sr.RequestError as e:
-                print(f"[{agent_name}] Speech recognition error: {e}")
+                with trace.span("stt"):
+                    command_text = recognizer.transcribe(session, audio_data)
+                print(f"[{self.name}] Command received: {command_text} "
+                      f"({recognizer.last_latency * 1000:.0f} ms after end of speech, RTF {recognizer.last_rtf or 0:.2f})")
+                trace.attrs["text"] = command_text
+                self.dispatch_latencies.append(time.perf_counter() - trace.started)
+                self.on_command(command_text, self.settings)
+            except SpeechNotUnderstood:
+                print(f"[{self.name}] Could not understand audio.")
+                trace.attrs["error"] = "not understood"
+            except RecognizerError as e:
+                print(f"[{self.name}] Speech recognition error: {e}")
+                trace.attrs["error"] = str(e)
         except Exception as e:
-            print(f"[{agent_name}] Error processing audio: {e}")
-    
-    def audio_callback(indata, frames, time_info, status):
+            print(f"[{self.name}] Error processing audio: {e}")
+            trace.attrs["error"] = repr(e)
+        finally:
+            # A trace handed to a running action is finished by the action executor
+            if getattr(tracing.current, "trace", None) is trace:
+                tracing.current.trace = None
+                tracing.finish(trace)
+
+        stats = self.pipeline.stats()
+        print(f"[{self.name}] Pipeline: {stats['suppressed']} duplicate detections suppressed, "
+              f"{stats['dropped']} dropped, queue depth {stats['queue_depth']}")
+        if self.gate is not None:
+            stats = self.gate.stats()
+            print(f"[{self.name}] Wake gate skipped {stats['skipped_ratio'] * 100:.0f}% of frames")
+        stats = self.hub.stats()
+        if stats["overflows"] or stats["underflows"]:
+            print(f"[{self.name}] Audio input: {stats['overflows']} overflows, {stats['underflows']} underflows")
+
+    def discard_command(self, captured):
+        """
+        Releases a captured command that will never be recognized (dropped
+        from a full queue or discarded on stop) and records its trace.
+        """
+
+        session, recorder, trace = captured
+        session.close()
+        trace.attrs["status"] = "dropped"
+        tracing.finish(trace)
+        print(f"[{self.name}] Dropped a command that was waiting for recognition.")
+
+    def wake_word_consumer(self, pcm, start):
         """
         Processes incoming audio for wake-word detection.
         Triggers command recording when detected.
         """
 
         # If this feature isn't enabled, don't run the code
-        if not settings.get("assistant_enabled", False) or not settings.get("stt_enabled", False):
+        if not self.listening:
             return
 
-        # Get the data from porcupine and process it for the wake word
-        pcm = (indata[:, 0] * 32767).astype(np.int16)
+        # Frames the energy gate holds back are replayed once it opens
+        gate = self.gate
+        frames = gate.admit(pcm, start) if gate is not None else ((pcm, start),)
 
-        try:
-            result = porcupine.process(pcm)
-        except Exception as e:
-            print(f"[{agent_name}] Porcupine error: {e}")
+        for frame, frame_start in frames:
+            # Process the (already int16) frame for the wake word
+            try:
+                result = self.detector.process(frame)
+            except Exception as e:
+                print(f"[{self.name}] Porcupine error: {e}")
+                return
+
+            # If the wake word was detected and the settings are enabled, start recording the command
+            if result >= 0 and self.wake_enabled:
+                self.wake_detected(frame_start + len(frame), time.perf_counter())
+
+    def wake_detected(self, wake_end: int, detected_at: float):
+        """
+        Starts recording the command that follows a wake word ending at
+        absolute sample `wake_end`, unless the detection is suppressed.
+        """
+
+        if not self.wake_enabled:
             return
 
-        # If the wake word was detected and the settings are enabled, start recording the command
-        if result >= 0 and settings.get("wake_word_enabled", False):
-            print(f"[{agent_name}] WAKE WORD DETECTED!")
-            Thread(target=record_command, daemon=True).start()
+        if self.pipeline.detect(wake_end, detected_at):
+            print(f"[{self.name}] WAKE WORD DETECTED!")
+
+def start_listener(settings: Settings, stop: threading.Event = None, ready=None):
+    """
+    Starts the wake-word listener.
+    Detects wake-word and triggers command recording.
+
+    Runs until `stop` is set (forever without one), then releases the audio
+    stream, the pipeline workers and Porcupine in that order. `ready()` is
+    called once the listener is running.
+    """
+
+    global porcupine, audio_stream, agent_name
+
+    from dotenv import load_dotenv
+
+    stop = stop or threading.Event()
+
+    # Load Picovoice API key from .env
+    load_dotenv()
+    access_key = os.getenv("RAVEN_PV_ACCESS_KEY")
+    if access_key is None:
+        raise ValueError("RAVEN_PV_ACCESS_KEY not found in .env")
 
-    audio_stream = sd.InputStream(
-        channels=1,
-        samplerate=sample_rate,
-        blocksize=frame_length,
-        callback=audio_callback
+    path = KEYWORD_PATH
+
+    # Get the agent name from the Wake-word model file name for debugging
+    agent_name = path[path.index("-") + 1:path.index("_")]
+
+    # The recognizer (speech_recognition import or Vosk model load) is built
+    # while Porcupine loads and the audio device opens
+    loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="raven-stt-init")
+    pending_recognizer = loader.submit(create_recognizer, settings)
+    loader.shutdown(wait=False)
+
+    def load_recognizer():
+        recognizer = pending_recognizer.result()
+        print(f"[{agent_name}] Speech recognition backend: {recognizer.name}")
+        return recognizer
+
+    if settings.get("audio_process", False):
+        # Capture and wake-word detection run in their own process, away from
+        # the GIL contention of the GUI and actions
+        from .audio_process import AudioProcess
+
+        process = AudioProcess(access_key, path, sensitivity=0.9,
+                               gate_enabled=settings.get("wake_gate_enabled", False), name=agent_name)
+        audio_stream = process
+        listener = None
+
+        try:
+            process.start()
+            listener = Listener(settings, None, load_recognizer(), process.hub, name=agent_name)
+            process.on_wake = listener.wake_detected
+            listener.start()
+
+            process.wait_ready(AUDIO_PROCESS_START_TIMEOUT)
+            print(f"[{agent_name}] Listening for wake word in audio process...")
+            if ready is not None:
+                ready()
+
+            # Sleeps until interrupt_listener() (after `stop` is set) and
+            # raises if the child dies, so the supervisor restarts the listener
+            if not stop.is_set():
+                process.wait()
+        finally:
+            process.stop()
+            if listener is not None:
+                listener.stop()
+            audio_stream = None
+        return
+
+    import pvporcupine
+
+    # Initialize Porcupine
+    porcupine = pvporcupine.create(
+        access_key=access_key,
+        keyword_paths=[path],
+        sensitivities=[0.9]
     )
-    audio_stream.start()
 
-    while True:
-        time.sleep(0.1)
+    try:
+        # One input stream shared by the wake-word detector and the command recorder.
+        # Frames arriving before the listener subscribes still fill the pre-roll.
+        hub = CaptureHub(porcupine.sample_rate, porcupine.frame_length)
+        audio_stream = hub
+        listener = None
+
+        try:
+            hub.start()
+            listener = Listener(settings, porcupine, load_recognizer(), hub, name=agent_name)
+            listener.start()
+            print(f"[{agent_name}] Listening for wake word...")
+            if ready is not None:
+                ready()
+            stop.wait()
+        finally:
+            # No more callbacks into Porcupine once the stream has stopped
+            hub.stop()
+            if listener is not None:
+                listener.stop()
+            audio_stream = None
+    finally:
+        porcupine.delete()
+        porcupine = None
+
+def interrupt_listener():
+    """
+    Wakes start_listener when it waits on the audio process rather than on
+    `stop`; call it after setting `stop`.
+    """
+
+    stream = audio_stream
+    if stream is not None and hasattr(stream, "interrupt"):
+        stream.interrupt()
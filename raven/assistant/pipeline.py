@@ -0,0 +1,156 @@
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+class CommandPipeline:
+    """
+    Bounded worker pipeline for wake word -> capture -> recognize/dispatch.
+
+    - Detections within `refractory` seconds of the last accepted one, or
+      while a capture is still running, are suppressed (Porcupine often fires
+      on several consecutive frames for one "Hey Raven").
+    - A single capture thread runs `capture(wake_end, detected_at)`, so there
+      is never more than one capture in flight.
+    - Captured utterances wait in a queue of at most `max_queue` items for the
+      processing thread, which runs `process(captured)`. When the queue is
+      full the oldest utterance is dropped.
+    - Utterances that will never be processed (dropped, or discarded by
+      `stop`) are passed to `discard(captured)` to release their resources.
+    """
+
+    def __init__(self, capture: Callable, process: Callable, refractory: float = 1.5, max_queue: int = 2,
+                 discard: Optional[Callable] = None):
+        self.capture = capture
+        self.process = process
+        self.discard = discard
+        self.refractory = refractory
+        self.max_queue = max_queue
+
+        self.detections = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self.max_queue_depth = 0
+
+        self.pending = None
+        self.capturing = False
+        self.last_accepted = float("-inf")
+        self.queue = deque()
+        self.running = False
+
+        self.cond = threading.Condition()
+        self.threads = []
+
+    def start(self):
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+
+        self.threads = [
+            threading.Thread(target=self._capture_loop, daemon=True, name="raven-capture"),
+            threading.Thread(target=self._process_loop, daemon=True, name="raven-commands"),
+        ]
+        for t in self.threads:
+            t.start()
+
+    def stop(self, timeout: float = 2.0):
+        """
+        Stops both worker threads; queued utterances are discarded.
+        """
+
+        with self.cond:
+            self.running = False
+            discarded = list(self.queue)
+            self.queue.clear()
+            self.cond.notify_all()
+        for captured in discarded:
+            self._discard(captured)
+        for t in self.threads:
+            t.join(timeout)
+
+    def detect(self, wake_end: int, detected_at: float) -> bool:
+        """
+        Reports a wake-word detection. Called from the audio callback, so it
+        only records the request and returns. Returns False if suppressed.
+        """
+
+        with self.cond:
+            self.detections += 1
+            if self.capturing or detected_at - self.last_accepted < self.refractory:
+                self.suppressed += 1
+                return False
+
+            self.capturing = True
+            self.last_accepted = detected_at
+            self.pending = (wake_end, detected_at)
+            self.cond.notify_all()
+            return True
+
+    def _capture_loop(self):
+        while True:
+            with self.cond:
+                while self.running and self.pending is None:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                job, self.pending = self.pending, None
+
+            try:
+                captured = self.capture(*job)
+            except Exception as e:
+                print(f"[Raven] Command capture failed: {e!r}")
+                captured = None
+
+            dropped = None
+            with self.cond:
+                self.capturing = False
+                if captured is not None and not self.running:
+                    # Stopped during the capture; nothing will process it
+                    dropped, captured = captured, None
+                if captured is not None:
+                    if len(self.queue) >= self.max_queue:
+                        dropped = self.queue.popleft()
+                        self.dropped += 1
+                    self.queue.append(captured)
+                    self.max_queue_depth = max(self.max_queue_depth, len(self.queue))
+                    self.cond.notify_all()
+
+            if dropped is not None:
+                self._discard(dropped)
+
+    def _process_loop(self):
+        while True:
+            with self.cond:
+                while self.running and not self.queue:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                captured = self.queue.popleft()
+
+            try:
+                self.process(captured)
+            except Exception as e:
+                print(f"[Raven] Command processing failed: {e!r}")
+
+    def _discard(self, captured):
+        if self.discard is None:
+            return
+        try:
+            self.discard(captured)
+        except Exception as e:
+            print(f"[Raven] Discarding a command failed: {e!r}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns detection, suppression and queue metrics.
+        """
+
+        with self.cond:
+            return {
+                "detections": self.detections,
+                "suppressed": self.suppressed,
+                "dropped": self.dropped,
+                "capturing": self.capturing,
+                "queue_depth": len(self.queue),
+                "max_queue_depth": self.max_queue_depth,
+            }
@@ -1,41 +1,108 @@
 import re
 from typing import Dict, Optional
 
-from .actions.basic import handle_greeting, handle_time, handle_stop
-from .actions.weather import handle_weather
-from .actions.web import handle_open, handle_search
-from .actions.media import handle_play
+from .actions import submit
+from .. import tracing
+
+# Intent rules in priority order: (intent, anchor words, compiled pattern, payload group).
+# Every rule can only match when one of its anchor words appears as a whole word
+# in the text, so the text is tokenized once and only the rules that could match
+# are run. The order of this table decides which intent wins.
+INTENT_RULES = [
+    ("weather", ("weather", "forecast", "temperature", "rain", "snow", "wind"),
+     re.compile(r"\b(?:weather|forecast|temperature|rain|snow|wind)\b(?:.*\b(?:in|for)\s+(.+))?"), 1),
+    ("greeting", ("hello", "hi", "hey", "hiya", "howdy", "yo", "good", "raven"),
+     re.compile(r"\b(hello|hi|hey|hiya|howdy|yo|good\s+(morning|afternoon|evening)|raven)\b"), None),
+    ("time", ("time",),
+     re.compile(r"\b(time|what(?:'s| is) the time|current time|tell me the time|what time)\b"), None),
+    ("stop", ("stop", "cancel", "pause", "quit", "exit", "never", "don"),
+     re.compile(r"\b(stop|cancel|pause|quit|exit|never mind|don't)\b"), None),
+    ("play", ("play", "start", "listen", "put"),
+     re.compile(r"\b(?:play|start|listen to|put on)\b\s+(.+)"), 1),
+    ("open", ("open", "go", "show", "visit", "take", "launch"),
+     re.compile(r"\b(?:open|go to|show|visit|take me to|launch)\b\s+([^\n]+)"), 1),
+    ("search", ("search", "find", "look", "lookup", "google", "what"),
+     re.compile(r"\b(?:search for|find|look up|lookup|google|look for|what is|what's)\b\s+(.+)"), 1),
+    ("youtube", ("youtube",),
+     re.compile(r"\byoutube\b"), None),
+]
+
+# Time qualifiers passed through with weather intents, e.g. "will it rain later"
+WHEN_RE = re.compile(
+    r"(?:\b(?:in|over|for|during)\s+)?(?:\bthe\s+)?\bnext\s+(\d+|few|couple)(?:\s+of)?\s+hours?\b"
+    r"|\b(tomorrow|tonight|today|this\s+(?:morning|afternoon|evening))\b"
+    r"|\b(later)(?:\s+(?:today|on))?\b"
+)
+
+# Preposition left dangling once a time qualifier is removed ("in paris for")
+LOCATION_TAIL_RE = re.compile(r"\s+(?:in|for|over|during|on)$")
+
+WORD_RE = re.compile(r"\w+")
+YOUTUBE_FILLER_RE = re.compile(r"\b(play|open|youtube|on|please)\b")
+
+def build_intent_index(rules: list) -> Dict[str, list]:
+    """
+    Maps each anchor word to the indices of the rules it can trigger.
+    """
+
+    index: Dict[str, list] = {}
+    for i, (intent, anchors, pattern, group) in enumerate(rules):
+        for anchor in anchors:
+            index.setdefault(anchor, []).append(i)
+    return index
+
+INTENT_INDEX = build_intent_index(INTENT_RULES)
+
+def match_rule(i: int, text: str) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Runs rule `i` of INTENT_RULES on `text`. Returns its result, or None if
+    it doesn't match.
+    """
+
+    intent, _, pattern, group = INTENT_RULES[i]
+    m = pattern.search(text)
+    if not m:
+        return None
 
-def detect_heuristic(text: str) -> Dict[str, Optional[str]]:
-    m = re.search(r"\b(?:weather|forecast|temperature|rain|snow|wind)\b(?:.*(?:in|for)\s+(.+))?", text)
-    if m:
-        loc = m.group(1).strip() if m.group(1) else None
-        return {"intent": "weather", "payload": loc}
-
-    if re.search(r"\b(hello|hi|hey|hiya|howdy|yo|good\s+(morning|afternoon|evening)|raven)\b", text):
-        return {"intent": "greeting", "payload": None}
-
-    if re.search(r"\b(time|what(?:'s| is) the time|current time|tell me the time|what time)\b", text):
-        return {"intent": "time", "payload": None}
-
-    if re.search(r"\b(stop|cancel|pause|quit|exit|never mind|don't)\b", text):
-        return {"intent": "stop", "payload": None}
+    if intent == "weather":
+        when = None
+        q = WHEN_RE.search(text)
+        if q:
+            if q.group(1):
+                when = f"next {q.group(1)} hours"
+            else:
+                when = " ".join((q.group(2) or q.group(3)).split())
+            # Take the qualifier out before capturing the location, so the
+            # location can't latch onto it ("weather in paris for tomorrow")
+            m = pattern.search(" ".join((text[:q.start()] + " " + text[q.end():]).split()))
+
+        loc = m.group(1).strip() if m and m.group(1) else None
+        if loc and when:
+            loc = LOCATION_TAIL_RE.sub("", loc) or None
+        return {"intent": "weather", "payload": loc, "when": when}
+
+    if intent == "youtube":
+        payload = YOUTUBE_FILLER_RE.sub("", text).strip()
+        return {"intent": "play", "payload": payload}
 
-    m = re.search(r"\b(?:play|start|listen to|put on)\b\s+(.+)", text)
-    if m:
-        return {"intent": "play", "payload": m.group(1).strip()}
+    payload = m.group(group).strip() if group else None
+    return {"intent": intent, "payload": payload}
 
-    m = re.search(r"\b(?:open|go to|show|visit|take me to|launch)\b\s+([^\n]+)", text)
-    if m:
-        return {"intent": "open", "payload": m.group(1).strip()}
+def detect_heuristic(text: str) -> Dict[str, Optional[str]]:
+    """
+    Detects the intent of `text` using the keyword rules in INTENT_RULES.
+    The text is split into words once and only the rules anchored on one of
+    those words are tried, highest priority first.
+    """
 
-    m = re.search(r"\b(?:search for|find|look up|lookup|google|look for|what is|what's)\b\s+(.+)", text)
-    if m:
-        return {"intent": "search", "payload": m.group(1).strip()}
+    candidates = set()
+    for word in WORD_RE.findall(text):
+        candidates.update(INTENT_INDEX.get(word, ()))
 
-    if re.search(r"\byoutube\b", text):
-        payload = re.sub(r"\b(play|open|youtube|on|please)\b", "", text).strip()
-        return {"intent": "play", "payload": payload}
+    for i in sorted(candidates):
+        result = match_rule(i, text)
+        if result is not None:
+            return result
 
     return {"intent": "unknown", "payload": text}
 
@@ -47,29 +114,25 @@ def process_command(command: str, settings: dict):
         return
     
     text = command.strip()
-    if settings["ai_mode"] == "heuristics":
-        result = detect_heuristic(text)
-    else:
-        result = detect_ai(text)
+    with tracing.span("intent"):
+        if settings["ai_mode"] == "heuristics":
+            result = detect_heuristic(text)
+        else:
+            result = detect_ai(text)
 
     intent = result.get("intent")
     payload = result.get("payload")
+    tracing.annotate(intent=intent)
 
     print(f"[Raven] {settings["ai_mode"]} intent: {intent!r}, payload: {payload!r}")
 
-    if intent == "greeting":
-        return handle_greeting()
-    if intent == "time":
-        return handle_time()
-    if intent == "weather":
-        return handle_weather(payload or "")
-    if intent == "open":
-        return handle_open(payload or "")
-    if intent == "play":
-        return handle_play(payload or "")
-    if intent == "stop":
-        return handle_stop()
-    if intent == "search":
-        return handle_search(payload or "")
+    # Anything besides intent/payload (e.g. a weather time qualifier) is passed to the handler
+    extras = {k: v for k, v in result.items() if k not in ("intent", "payload")}
+
+    # The action runs on the action executor; this thread is free for the next command
+    job = submit(intent, payload, **extras)
+    if job is not None:
+        return job
 
+    tracing.annotate(handled=False)
     print(f"[Raven] Unmatched command (raw): '{command}'")
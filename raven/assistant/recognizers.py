@@ -0,0 +1,223 @@
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+
+class SpeechNotUnderstood(Exception):
+    """Raised when a backend heard audio but produced no transcript."""
+
+class RecognizerError(Exception):
+    """Raised when a backend fails (network, missing model, ...)."""
+
+class RecognitionSession:
+    """
+    One utterance being recognized.
+
+    `feed` is called with int16 blocks while the user is still speaking (from
+    the audio thread, so it must be cheap); `finish` is called with the whole
+    utterance once speech has ended and returns the transcript. Streaming
+    backends call `on_partial(text)` whenever their partial transcript changes.
+    `close` releases a session that will never be finished (e.g. dropped).
+    """
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.started = time.perf_counter()
+        self.processing_time = 0.0
+        self.on_partial = None
+
+    def feed(self, block: np.ndarray):
+        pass
+
+    def partial(self) -> str:
+        return ""
+
+    def finish(self, audio: memoryview) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class Recognizer:
+    """
+    Base class for speech recognition backends. Subclasses create sessions.
+
+    `last_latency` is the time from `finish` being called to the transcript
+    being ready, and `last_rtf` the real-time factor (processing time over
+    audio duration) of the last utterance.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.last_latency = None
+        self.last_rtf = None
+
+    def start(self, sample_rate: int) -> RecognitionSession:
+        raise NotImplementedError
+
+    def transcribe(self, session: RecognitionSession, audio: memoryview) -> str:
+        """
+        Finishes `session` and records latency statistics.
+        """
+
+        start = time.perf_counter()
+        try:
+            return session.finish(audio)
+        finally:
+            self.last_latency = time.perf_counter() - start
+            duration = len(audio) / 2 / session.sample_rate
+            if duration:
+                self.last_rtf = (session.processing_time + self.last_latency) / duration
+
+class GoogleSession(RecognitionSession):
+    def __init__(self, sample_rate: int, recognizer):
+        super().__init__(sample_rate)
+        self.recognizer = recognizer
+
+    def finish(self, audio: memoryview) -> str:
+        import speech_recognition as sr
+
+        try:
+            return self.recognizer.recognize_google(sr.AudioData(audio, self.sample_rate, 2))
+        except sr.UnknownValueError as e:
+            raise SpeechNotUnderstood() from e
+        except sr.RequestError as e:
+            raise RecognizerError(str(e)) from e
+
+class GoogleRecognizer(Recognizer):
+    """
+    Cloud recognition through `speech_recognition.recognize_google`.
+    Needs the whole utterance and a network connection.
+    """
+
+    name = "google"
+
+    def __init__(self):
+        super().__init__()
+        import speech_recognition as sr
+        self.recognizer = sr.Recognizer()
+
+    def start(self, sample_rate: int) -> RecognitionSession:
+        return GoogleSession(sample_rate, self.recognizer)
+
+class VoskSession(RecognitionSession):
+    """
+    Streams audio into a Vosk recognizer on a worker thread while the user
+    speaks, so only the last few blocks remain to be decoded at the end.
+    """
+
+    def __init__(self, sample_rate: int, model):
+        super().__init__(sample_rate)
+        from vosk import KaldiRecognizer
+
+        self.kaldi = KaldiRecognizer(model, sample_rate)
+        self.blocks = queue.Queue()
+        self.texts = []
+        self.partial_text = ""
+        self.fed = 0
+        self.worker = threading.Thread(target=self._decode, daemon=True)
+        self.worker.start()
+
+    def _decode(self):
+        while True:
+            block = self.blocks.get()
+            if block is None:
+                return
+
+            start = time.perf_counter()
+            if self.kaldi.AcceptWaveform(block):
+                text = json.loads(self.kaldi.Result()).get("text", "")
+                if text:
+                    self.texts.append(text)
+                self.partial_text = ""
+                partial = text
+            else:
+                partial = json.loads(self.kaldi.PartialResult()).get("partial", "")
+                if partial == self.partial_text:
+                    partial = None
+                else:
+                    self.partial_text = partial
+            self.processing_time += time.perf_counter() - start
+
+            if self.on_partial is not None and partial:
+                self.on_partial(self.partial())
+
+    def feed(self, block: np.ndarray):
+        # Blocks are views into the capture buffer; copy the bytes out
+        self.blocks.put(block.tobytes())
+        self.fed += len(block)
+
+    def partial(self) -> str:
+        return " ".join(self.texts + [self.partial_text]).strip()
+
+    def finish(self, audio: memoryview) -> str:
+        # Anything captured that was not streamed (e.g. no feed calls) is decoded now
+        if self.fed * 2 < len(audio):
+            self.blocks.put(bytes(audio[self.fed * 2:]))
+        self.blocks.put(None)
+        self.worker.join()
+
+        text = json.loads(self.kaldi.FinalResult()).get("text", "")
+        if text:
+            self.texts.append(text)
+        transcript = " ".join(self.texts).strip()
+        if not transcript:
+            raise SpeechNotUnderstood()
+        return transcript
+
+    def close(self):
+        # Stops the worker without decoding what is left
+        if self.worker.is_alive():
+            self.on_partial = None
+            self.blocks.put(None)
+            self.worker.join()
+
+class VoskRecognizer(Recognizer):
+    """
+    Offline streaming recognition with Vosk (https://alphacephei.com/vosk/).
+    Needs the `vosk` package and a model directory (`vosk_model_path`).
+    """
+
+    name = "vosk"
+
+    def __init__(self, model_path: str):
+        super().__init__()
+        try:
+            from vosk import Model, SetLogLevel
+        except ImportError as e:
+            raise RecognizerError("the vosk package is not installed") from e
+
+        SetLogLevel(-1)
+        try:
+            self.model = Model(model_path)
+        except Exception as e:
+            raise RecognizerError(f"could not load Vosk model from {model_path!r}: {e}") from e
+
+    def start(self, sample_rate: int) -> RecognitionSession:
+        return VoskSession(sample_rate, self.model)
+
+BACKENDS = {
+    "google": lambda settings: GoogleRecognizer(),
+    "vosk": lambda settings: VoskRecognizer(settings.get("vosk_model_path", "models/vosk")),
+}
+
+def create_recognizer(settings: dict) -> Recognizer:
+    """
+    Creates the backend named by the `stt_backend` setting.
+    Falls back to Google when the chosen backend can't be loaded.
+    """
+
+    name = settings.get("stt_backend", "google")
+    factory = BACKENDS.get(name)
+    if factory is None:
+        print(f"[Raven] Unknown speech backend {name!r}, using google")
+        return GoogleRecognizer()
+
+    try:
+        return factory(settings)
+    except RecognizerError as e:
+        print(f"[Raven] Speech backend {name!r} unavailable ({e}), using google")
+        return GoogleRecognizer()
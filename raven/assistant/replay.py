@@ -0,0 +1,258 @@
+"""
+Faster-than-realtime replay of WAV files (or synthetic audio) through the
+listening pipeline, with stand-ins for Porcupine and the speech recognizer.
+
+Usage:
+    python -m raven.assistant.replay [file.wav ...] [--wake-at 1.0,6.5] [--text "what time is it"]
+
+Without files a synthetic clip (noise with speech-like bursts) is generated.
+The report covers throughput in audio-seconds per wall-second, the cost of
+each capture callback, and the time from wake-word detection to dispatch.
+Audio time is compressed, so a simulated recognizer latency (--stt-latency)
+makes commands pile up and get dropped much sooner than they would live.
+"""
+
+import argparse
+import time
+import wave
+from collections import deque
+from typing import List, Optional
+
+import numpy as np
+
+from .audio import CaptureHub
+from .listener import Listener
+from .recognizers import Recognizer, RecognitionSession
+from ..settings import DEFAULT_SETTINGS, Settings
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 512
+
+class ScriptedDetector:
+    """
+    Stand-in for Porcupine: reports the wake word on the frame that contains
+    each of the given sample positions.
+    """
+
+    frame_length = FRAME_LENGTH
+    sample_rate = SAMPLE_RATE
+
+    def __init__(self, wake_samples: List[int]):
+        self.wake_samples = sorted(wake_samples)
+        self.position = 0
+        self.next = 0
+        # Start indices of upcoming frames when an energy gate skips some
+        self.starts = deque()
+
+    def process(self, pcm) -> int:
+        if self.starts:
+            self.position = self.starts.popleft()
+        end = self.position + len(pcm)
+        hit = -1
+        while self.next < len(self.wake_samples) and self.wake_samples[self.next] < end:
+            hit = 0
+            self.next += 1
+        self.position = end
+        return hit
+
+    def delete(self):
+        pass
+
+class ScriptedSession(RecognitionSession):
+    def __init__(self, sample_rate: int, text: str, latency: float):
+        super().__init__(sample_rate)
+        self.text = text
+        self.latency = latency
+
+    def finish(self, audio: memoryview) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.text
+
+class ScriptedRecognizer(Recognizer):
+    """
+    Stand-in recognizer returning a fixed transcript after `latency` seconds.
+    """
+
+    name = "scripted"
+
+    def __init__(self, text: str = "what time is it", latency: float = 0.0):
+        super().__init__()
+        self.text = text
+        self.latency = latency
+
+    def start(self, sample_rate: int) -> RecognitionSession:
+        return ScriptedSession(sample_rate, self.text, self.latency)
+
+def load_wav(path: str) -> np.ndarray:
+    """
+    Reads a 16 kHz 16-bit WAV file as mono int16 (the first channel is used).
+    """
+
+    with wave.open(path, "rb") as fh:
+        if fh.getsampwidth() != 2 or fh.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path}: expected 16-bit {SAMPLE_RATE} Hz audio")
+        data = np.frombuffer(fh.readframes(fh.getnframes()), dtype=np.int16)
+        return data[::fh.getnchannels()].copy()
+
+def synthetic_audio(seconds: float = 30.0, commands: int = 5, seed: int = 0):
+    """
+    Generates room noise with speech-like bursts.
+    Returns (samples, wake word sample positions).
+    """
+
+    rng = np.random.default_rng(seed)
+    samples = rng.normal(0, 40, int(seconds * SAMPLE_RATE))
+    wakes = []
+
+    spacing = seconds / commands
+    for i in range(commands):
+        start = int((i * spacing + 1.0) * SAMPLE_RATE)
+        length = int(1.5 * SAMPLE_RATE)
+        t = np.arange(length) / SAMPLE_RATE
+        burst = 3000 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+        samples[start:start + length] += burst[:len(samples) - start]
+        wakes.append(start)
+
+    return np.clip(samples, -32768, 32767).astype(np.int16), wakes
+
+def replay(samples: np.ndarray, wake_samples: List[int], text: str = "what time is it",
+           recognizer_latency: float = 0.0, settings: Optional[dict] = None, dispatch: bool = False,
+           detector: Optional[ScriptedDetector] = None) -> dict:
+    """
+    Feeds `samples` through the listener as fast as possible and returns
+    timing statistics. `detector` replaces the ScriptedDetector built from
+    `wake_samples` (e.g. a subclass that records or costs something).
+    """
+
+    # The refractory period is measured in wall time, which the replay compresses;
+    # captures still in flight continue to suppress overlapping detections
+    settings = Settings(dict(DEFAULT_SETTINGS, wake_refractory_seconds=0, **(settings or {})))
+    commands = []
+
+    def on_command(command, settings):
+        commands.append(command)
+        if dispatch:
+            from .processor import process_command
+            process_command(command, settings)
+
+    hub = CaptureHub(SAMPLE_RATE, FRAME_LENGTH)
+    detector = detector if detector is not None else ScriptedDetector(wake_samples)
+    listener = Listener(settings, detector, ScriptedRecognizer(text, recognizer_latency),
+                        hub, on_command=on_command, name="Replay")
+
+    # Tell the detector where gated frames start, since skipped frames never reach it
+    if listener.gate is not None:
+        admit = listener.gate.admit
+
+        def tracked_admit(frame, start):
+            frames = admit(frame, start)
+            detector.starts.extend(s for _, s in frames)
+            return frames
+
+        listener.gate.admit = tracked_admit
+
+    # Where each capture started and ended, in samples of `samples`
+    captures = []
+    capture = listener.pipeline.capture
+
+    def tracked_capture(wake_end, detected_at):
+        captured = capture(wake_end, detected_at)
+        captures.append((wake_end, wake_end + captured[1].buffer.written))
+        return captured
+
+    listener.pipeline.capture = tracked_capture
+
+    listener.start()
+
+    frames = len(samples) // FRAME_LENGTH
+    block = samples[:frames * FRAME_LENGTH].reshape(frames, FRAME_LENGTH, 1)
+    costs = np.zeros(frames, dtype=np.int64)
+
+    def settle():
+        # A real device keeps producing audio while the capture thread starts
+        # and finishes; wait for it so the replay doesn't outrun the pre-roll
+        # or suppress the next wake word because a finished capture is still
+        # winding down
+        while listener.pipeline.capturing and (listener.recorder is None or listener.recorder.done.is_set()):
+            time.sleep(0.0002)
+
+    started = time.perf_counter()
+    for i in range(frames):
+        t0 = time.perf_counter_ns()
+        hub.callback(block[i], FRAME_LENGTH, None, None)
+        costs[i] = time.perf_counter_ns() - t0
+        settle()
+    fed = time.perf_counter() - started
+
+    # Trailing silence so a capture still running at the end of the clip can
+    # reach its endpoint, then let the queued commands finish
+    silence = np.zeros((FRAME_LENGTH, 1), dtype=np.int16)
+    for _ in range(int(settings.snapshot.max_command_seconds * SAMPLE_RATE) // FRAME_LENGTH + 1):
+        if not listener.pipeline.capturing:
+            break
+        hub.callback(silence, FRAME_LENGTH, None, None)
+        settle()
+
+    deadline = time.perf_counter() + 10 + recognizer_latency * (listener.pipeline.max_queue + 1)
+    while listener.pipeline.stats()["queue_depth"] and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    time.sleep(recognizer_latency + 0.05)
+    listener.stop()
+
+    audio_seconds = frames * FRAME_LENGTH / SAMPLE_RATE
+    latencies = np.array(listener.dispatch_latencies) * 1000
+    stats = listener.pipeline.stats()
+    return {
+        "audio_seconds": audio_seconds,
+        "wall_seconds": fed,
+        "speedup": audio_seconds / fed if fed else float("inf"),
+        "callback_us_mean": costs.mean() / 1000,
+        "callback_us_p50": np.percentile(costs, 50) / 1000,
+        "callback_us_p99": np.percentile(costs, 99) / 1000,
+        "callback_us_max": costs.max() / 1000,
+        "detections": stats["detections"],
+        "suppressed": stats["suppressed"],
+        "dropped": stats["dropped"],
+        "commands": len(commands),
+        "captures": captures,
+        "gate": listener.gate.stats() if listener.gate is not None else None,
+        "dispatch_ms_p50": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "dispatch_ms_max": float(latencies.max()) if len(latencies) else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay audio through the Raven listening pipeline.")
+    parser.add_argument("files", nargs="*", help="16 kHz 16-bit WAV files (synthetic audio if omitted)")
+    parser.add_argument("--wake-at", default="", help="comma-separated wake word times in seconds (default: start of each file)")
+    parser.add_argument("--text", default="what time is it", help="transcript returned by the stand-in recognizer")
+    parser.add_argument("--stt-latency", type=float, default=0.0, help="simulated recognition latency in seconds")
+    parser.add_argument("--gate", action="store_true", help="enable the wake-word energy gate")
+    parser.add_argument("--dispatch", action="store_true", help="run real actions for recognized commands")
+    args = parser.parse_args()
+
+    if args.files:
+        clips = [load_wav(path) for path in args.files]
+        samples = np.concatenate(clips)
+        if args.wake_at:
+            wakes = [int(float(t) * SAMPLE_RATE) for t in args.wake_at.split(",")]
+        else:
+            offsets = np.cumsum([0] + [len(c) for c in clips[:-1]])
+            wakes = [int(o) for o in offsets]
+    else:
+        samples, wakes = synthetic_audio()
+
+    report = replay(samples, wakes, args.text, args.stt_latency, {"wake_gate_enabled": args.gate}, args.dispatch)
+
+    print()
+    print(f"Audio:      {report['audio_seconds']:.1f}s replayed in {report['wall_seconds']:.2f}s "
+          f"({report['speedup']:.0f}x realtime)")
+    print(f"Callback:   mean {report['callback_us_mean']:.1f}us, p50 {report['callback_us_p50']:.1f}us, "
+          f"p99 {report['callback_us_p99']:.1f}us, max {report['callback_us_max']:.1f}us")
+    print(f"Detections: {report['detections']} ({report['suppressed']} suppressed, {report['dropped']} dropped), "
+          f"{report['commands']} commands dispatched")
+    if report["dispatch_ms_p50"] is not None:
+        print(f"Detection to dispatch: p50 {report['dispatch_ms_p50']:.1f}ms, max {report['dispatch_ms_max']:.1f}ms")
+
+if __name__ == "__main__":
+    main()
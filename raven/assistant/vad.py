@@ -0,0 +1,214 @@
+import numpy as np
+
+class VoiceActivityDetector:
+    """
+    Energy/zero-crossing voice activity detector used to end command capture.
+
+    The noise floor is calibrated from audio captured before the command and
+    keeps adapting while no one is speaking. A block counts as speech when its
+    energy is `speech_ratio` times the floor, where the ratio follows the
+    `mic_sensitivity` setting (0-100, higher = more sensitive). Low-energy
+    blocks with a high zero-crossing rate (fricatives like "s") also count.
+    """
+
+    def __init__(self, sample_rate: int, sensitivity: float = 50, block_size: int = 512,
+                 hangover: float = 0.8, short_hangover: float = 0.3,
+                 min_speech: float = 0.15, no_speech_timeout: float = 4.0):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.speech_ratio = 1.5 + (100.0 - min(max(float(sensitivity), 0.0), 100.0)) / 100.0 * 8.0
+
+        self.hangover = int(hangover * sample_rate)
+        self.short_hangover = int(short_hangover * sample_rate)
+        self.min_speech = int(min_speech * sample_rate)
+        self.no_speech_timeout = int(no_speech_timeout * sample_rate)
+
+        self.noise_floor = 1.0
+        self.speech_samples = 0
+        self.silence_samples = 0
+        self.total_samples = 0
+        self.clear_samples = 0
+        self.ended = False
+
+        # Scratch buffers so per-block features don't allocate
+        self._f = np.zeros(block_size, dtype=np.float32)
+        self._prod = np.zeros(block_size, dtype=np.float32)
+        self._neg = np.zeros(block_size, dtype=bool)
+
+    def features(self, block: np.ndarray):
+        """
+        Returns (mean energy, zero-crossing rate) of an int16 block.
+        """
+
+        n = len(block)
+        f = self._f[:n]
+        np.copyto(f, block)
+        energy = float(np.dot(f, f)) / n if n else 0.0
+
+        if n < 2:
+            return energy, 0.0
+        prod = self._prod[:n - 1]
+        np.multiply(f[:-1], f[1:], out=prod)
+        neg = self._neg[:n - 1]
+        np.less(prod, 0, out=neg)
+        return energy, np.count_nonzero(neg) / (n - 1)
+
+    def calibrate(self, samples: np.ndarray):
+        """
+        Sets the noise floor from audio recorded before the command, using the
+        quieter blocks so a wake word inside `samples` doesn't inflate it.
+        """
+
+        energies = [self.features(samples[i:i + self.block_size])[0]
+                    for i in range(0, len(samples) - self.block_size + 1, self.block_size)]
+        if energies:
+            self.noise_floor = max(float(np.percentile(energies, 20)), 1.0)
+
+    def process(self, block: np.ndarray) -> bool:
+        """
+        Feeds an int16 block of any length. Returns True once speech has ended
+        (or never started within `no_speech_timeout`).
+        """
+
+        for i in range(0, len(block), self.block_size):
+            if self.ended:
+                break
+            self._process_block(block[i:i + self.block_size])
+        return self.ended
+
+    def _process_block(self, block: np.ndarray):
+        n = len(block)
+        energy, zcr = self.features(block)
+        threshold = self.noise_floor * self.speech_ratio
+        self.total_samples += n
+
+        speech = energy > threshold or (energy > threshold * 0.5 and zcr > 0.25)
+        if speech:
+            self.speech_samples += n
+            self.silence_samples = 0
+            self.clear_samples = 0
+        else:
+            self.silence_samples += n
+            # Energy back near the floor means speech has clearly stopped
+            self.clear_samples = self.clear_samples + n if energy < self.noise_floor * 2.0 else 0
+
+            # Track the floor: fall quickly, rise slowly
+            alpha = 0.3 if energy < self.noise_floor else 0.05
+            self.noise_floor = max(self.noise_floor + alpha * (energy - self.noise_floor), 1.0)
+
+        if self.speech_samples >= self.min_speech:
+            self.ended = (self.silence_samples >= self.hangover or
+                          self.clear_samples >= self.short_hangover)
+        elif self.total_samples >= self.no_speech_timeout:
+            self.ended = True
+
+    @property
+    def endpoint_delay(self) -> float:
+        """
+        Seconds of trailing silence consumed before the end of speech was declared.
+        """
+
+        return self.silence_samples / self.sample_rate
+
+class EnergyGate:
+    """
+    Cheap pre-gate in front of the wake-word engine.
+
+    Frame energy is computed in one vectorized pass; while it stays below the
+    calibrated floor times `open_ratio` the keyword engine is skipped. Skipped
+    frames are kept in a short lookback buffer and replayed when the gate
+    opens, so the start of the wake word still reaches the engine. The gate
+    stays open for `hold_frames` frames after the last loud one.
+    """
+
+    def __init__(self, frame_length: int, lookback_frames: int = 10, open_ratio: float = 3.0,
+                 hold_frames: int = 30, calibration_frames: int = 30):
+        self.frame_length = frame_length
+        self.open_ratio = open_ratio
+        self.hold_frames = hold_frames
+        self.calibration_frames = calibration_frames
+
+        self.noise_floor = None
+        self.calibrated = 0
+        self.hold = 0
+        self.processed = 0
+        self.skipped = 0
+
+        # Preallocated lookback of skipped frames and their absolute start indices
+        self.lookback = np.zeros((lookback_frames, frame_length), dtype=np.int16)
+        self.lookback_starts = [0] * lookback_frames
+        self.lookback_count = 0
+        self.lookback_next = 0
+
+        self._f = np.zeros(frame_length, dtype=np.float32)
+
+    def energy(self, frame: np.ndarray) -> float:
+        f = self._f[:len(frame)]
+        np.copyto(f, frame)
+        return float(np.dot(f, f)) / max(len(frame), 1)
+
+    def admit(self, frame: np.ndarray, start: int):
+        """
+        Returns the (frame, start) pairs the keyword engine should process now:
+        nothing while the gate is closed, the replayed lookback plus this frame
+        when it opens, and just this frame while it stays open.
+        """
+
+        energy = self.energy(frame)
+
+        # Calibrate the floor from the first frames before gating anything
+        if self.calibrated < self.calibration_frames:
+            self.calibrated += 1
+            self.noise_floor = energy if self.noise_floor is None else self.noise_floor + (energy - self.noise_floor) / self.calibrated
+            self.processed += 1
+            return ((frame, start),)
+
+        loud = energy > max(self.noise_floor, 1.0) * self.open_ratio
+        if loud:
+            opening = self.hold == 0
+            self.hold = self.hold_frames
+            self.processed += 1
+            if opening and self.lookback_count:
+                frames = self._drain_lookback()
+                frames.append((frame, start))
+                return frames
+            return ((frame, start),)
+
+        # Quiet frames track the floor: fall quickly, rise slowly
+        alpha = 0.2 if energy < self.noise_floor else 0.01
+        self.noise_floor += alpha * (energy - self.noise_floor)
+
+        if self.hold:
+            self.hold -= 1
+            self.processed += 1
+            return ((frame, start),)
+
+        slot = self.lookback_next
+        self.lookback[slot, :len(frame)] = frame
+        self.lookback_starts[slot] = start
+        self.lookback_next = (slot + 1) % len(self.lookback)
+        self.lookback_count = min(self.lookback_count + 1, len(self.lookback))
+        self.skipped += 1
+        return ()
+
+    def _drain_lookback(self):
+        size = len(self.lookback)
+        first = (self.lookback_next - self.lookback_count) % size
+        frames = [(self.lookback[(first + i) % size], self.lookback_starts[(first + i) % size])
+                  for i in range(self.lookback_count)]
+        self.lookback_count = 0
+        self.processed += len(frames)
+        return frames
+
+    def stats(self) -> dict:
+        """
+        Returns how many frames went to the keyword engine and how many were skipped.
+        """
+
+        total = self.processed + self.skipped
+        return {
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "skipped_ratio": self.skipped / total if total else 0.0,
+            "noise_floor": self.noise_floor,
+        }
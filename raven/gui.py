@@ -1,9 +1,36 @@
+import threading
+import time
 import dearpygui.dearpygui as dpg
-from .settings import DEFAULT_SETTINGS, save_settings
+from .settings import DEFAULT_SETTINGS
+from . import tracing
 
 close_callback = None
 shutdown_callback = None
 
+# The panel is built once and then hidden/shown by moving the viewport off
+# screen; while hidden the render loop sleeps on `wake` instead of drawing
+HIDDEN_POS = [-32000, -32000]
+visible = False
+running = False
+screen_pos = [100, 100]
+show_requested_at = None
+hide_requested = False
+
+# Low-power rendering: full frame rate while the user interacts, IDLE_FPS
+# once there has been no input for IDLE_AFTER seconds
+IDLE_AFTER = 2.0
+IDLE_FPS = 10
+last_input = 0.0
+
+# Set to make the render loop act on a show/hide/close request or a settings change
+wake = threading.Event()
+pending_values = {}
+pending_lock = threading.Lock()
+latency_dirty = False
+
+# Rows in the recent-commands latency table
+LATENCY_ROWS = 8
+
 toggles = {
             "assistant_enabled": "Assistant Enabled",
             "stt_enabled": "STT Enabled",
@@ -16,27 +43,62 @@ suppress_callbacks = False
 
 def exit():
     """
-    Handles closing the GUI window and stopping DearPyGUI.
+    Handles closing the GUI window: the panel is hidden, not destroyed.
     """
 
-    close_callback()
-    dpg.stop_dearpygui()
+    hide()
+
+def show():
+    """
+    Shows the control panel. Safe to call from any thread (e.g. the hotkey hook).
+    """
 
-def create_gui(settings: dict, c_cb: callable, s_cb: callable):
+    global show_requested_at
+    if not visible and show_requested_at is None:
+        show_requested_at = time.perf_counter()
+    wake.set()
+
+def hide():
+    """
+    Hides the control panel. Safe to call from any thread.
+    """
+
+    global hide_requested
+    hide_requested = True
+    wake.set()
+
+def close():
+    """
+    Stops the render loop so `create_gui` returns. Safe to call from any thread.
     """
-    Creates and runs the Raven Control Panel GUI.
+
+    global running
+    running = False
+    wake.set()
+
+def input_received(sender=None, app_data=None):
+    global last_input
+    last_input = time.perf_counter()
+
+def create_gui(settings: dict, c_cb: callable, s_cb: callable, start_visible: bool = True, ready: callable = None):
+    """
+    Creates the Raven Control Panel GUI once and runs it until `close()`.
 
     Parameters
     ----------
-    settings : dict
-        The settings dictionary being edited.
+    settings : Settings
+        The live settings being edited; changes are saved automatically.
     c_cb : callable
-        Callback executed when the window closes.
+        Callback executed when the window is hidden.
     s_cb : callable
         Callback executed when shutting down the entire program.
+    start_visible : bool
+        Whether the panel is shown right away.
+    ready : callable
+        Called once the panel has been built.
     """
 
-    global close_callback, shutdown_callback, toggles
+    global close_callback, shutdown_callback, toggles, running, visible, hide_requested, show_requested_at
     close_callback = c_cb
     shutdown_callback = s_cb
 
@@ -93,22 +155,24 @@ def create_gui(settings: dict, c_cb: callable, s_cb: callable):
             finally:
                 suppress_callbacks = False
 
-        save_settings(settings)
-
     def value_callback(sender, app_data, user_data):
         """
         Generic callback for non-boolean widgets (sliders, input text, combos).
         """
 
+        # Saved in the background; a slider drag is written once it settles
         settings[user_data] = app_data
-        save_settings(settings)
 
     dpg.create_context()
     dpg.create_viewport(
         title="Raven Control Panel",
         width=600,
         height=475,
-        always_on_top=True
+        always_on_top=True,
+        # The window's close button hides the panel through the exit callback
+        disable_close=True,
+        x_pos=(screen_pos if start_visible else HIDDEN_POS)[0],
+        y_pos=(screen_pos if start_visible else HIDDEN_POS)[1]
     )
 
     with dpg.window(label="Raven Control Panel", tag="main_win"):
@@ -201,9 +265,152 @@ def create_gui(settings: dict, c_cb: callable, s_cb: callable):
             user_data="tts_voice"
         )
 
+        # --- Per-command latency from the tracing spans ---
+        dpg.add_separator()
+        with dpg.collapsing_header(label="Command Latency"):
+            dpg.add_text("No commands yet", tag="latency_summary")
+            for stage in tracing.STAGES + ("total",):
+                dpg.add_text("", tag=f"latency_{stage}")
+            dpg.add_simple_plot(label="Recent totals (ms)", tag="latency_plot", histogram=True, height=60, default_value=[0.0])
+
+            with dpg.table(header_row=True):
+                dpg.add_table_column(label="Command")
+                for stage in tracing.STAGES + ("total",):
+                    dpg.add_table_column(label=stage)
+                for row in range(LATENCY_ROWS):
+                    with dpg.table_row():
+                        for col in range(len(tracing.STAGES) + 2):
+                            dpg.add_text("", tag=f"latency_row_{row}_{col}")
+
+    def trace_finished(trace):
+        """
+        Marks the latency panel for a refresh on the render thread.
+        """
+
+        global latency_dirty
+        latency_dirty = True
+        wake.set()
+
+    def settings_changed(snapshot, key):
+        """
+        Queues changes made elsewhere (e.g. a hand-edited settings.json) so the
+        render thread updates the widgets in place.
+        """
+
+        with pending_lock:
+            pending_values[key] = settings[key]
+        wake.set()
+
+    # Any input switches back to full frame rate
+    with dpg.handler_registry():
+        dpg.add_mouse_move_handler(callback=input_received)
+        dpg.add_mouse_click_handler(callback=input_received)
+        dpg.add_mouse_wheel_handler(callback=input_received)
+        dpg.add_key_press_handler(callback=input_received)
+
     dpg.setup_dearpygui()
     dpg.show_viewport()
     dpg.set_primary_window("main_win", True)
     dpg.set_exit_callback(exit)
-    dpg.start_dearpygui()
-    dpg.destroy_context()
+    settings.subscribe(settings_changed)
+    tracing.subscribe(trace_finished)
+    update_latency_panel()
+
+    running = True
+    visible = start_visible
+    hide_requested = False
+    if start_visible and show_requested_at is None:
+        show_requested_at = time.perf_counter()
+    if ready is not None:
+        ready()
+
+    try:
+        render_loop()
+    finally:
+        settings.unsubscribe(settings_changed)
+        tracing.unsubscribe(trace_finished)
+        running = visible = False
+        show_requested_at = None
+        dpg.destroy_context()
+
+def update_latency_panel():
+    """
+    Refreshes the latency panel from the recent traces, updating widgets in place.
+    """
+
+    traces = list(tracing.recent)
+    if not traces:
+        return
+
+    stats = tracing.stage_stats()
+    dpg.set_value("latency_summary", f"Last {len(traces)} commands (p50 / p95):")
+    for stage in tracing.STAGES + ("total",):
+        if stage in stats:
+            dpg.set_value(f"latency_{stage}", f"{stage:>9}: {stats[stage]['p50']:7.1f} / {stats[stage]['p95']:7.1f} ms")
+    dpg.set_value("latency_plot", [trace.total() * 1000 for trace in traces])
+
+    newest = traces[::-1][:LATENCY_ROWS]
+    for row in range(LATENCY_ROWS):
+        if row < len(newest):
+            trace = newest[row]
+            durations = trace.durations()
+            cells = [trace.attrs.get("text") or trace.attrs.get("error") or trace.attrs.get("status", "")]
+            cells += [f"{durations[stage] * 1000:.0f}" if stage in durations else "-" for stage in tracing.STAGES]
+            cells.append(f"{trace.total() * 1000:.0f}")
+        else:
+            cells = [""] * (len(tracing.STAGES) + 2)
+        for col, cell in enumerate(cells):
+            dpg.set_value(f"latency_row_{row}_{col}", cell)
+
+def render_loop():
+    """
+    Draws frames while the panel is visible and sleeps while it is hidden.
+    """
+
+    global visible, hide_requested, show_requested_at, screen_pos, latency_dirty
+
+    while running and dpg.is_dearpygui_running():
+        wake.clear()
+
+        if latency_dirty:
+            latency_dirty = False
+            update_latency_panel()
+
+        with pending_lock:
+            updates = dict(pending_values)
+            pending_values.clear()
+        for key, value in updates.items():
+            if dpg.does_item_exist(key):
+                dpg.set_value(key, value)
+
+        if hide_requested:
+            hide_requested = False
+            if visible:
+                screen_pos = dpg.get_viewport_pos()
+                dpg.set_viewport_pos(HIDDEN_POS)
+                dpg.render_dearpygui_frame()
+                visible = False
+                if close_callback is not None:
+                    close_callback()
+
+        if show_requested_at is not None:
+            if not visible:
+                dpg.set_viewport_pos(screen_pos)
+                visible = True
+            input_received()
+            dpg.render_dearpygui_frame()
+            print(f"[Raven] Control panel visible {(time.perf_counter() - show_requested_at) * 1000:.1f} ms after request")
+            show_requested_at = None
+            continue
+
+        if not visible:
+            # Nothing to draw: sleep until shown, closed or updated. The window
+            # is off screen where it gets no input; every wake-up renders a
+            # frame, which also handles the window messages queued meanwhile
+            wake.wait()
+            dpg.render_dearpygui_frame()
+            continue
+
+        dpg.render_dearpygui_frame()
+        if time.perf_counter() - last_input > IDLE_AFTER:
+            wake.wait(1 / IDLE_FPS)
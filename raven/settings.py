@@ -1,5 +1,10 @@
 import json
+import os
+import threading
+import time
+from collections import deque
 from pathlib import Path
+from typing import Optional
 
 # Primary directory containing the entire project
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -20,18 +25,411 @@ DEFAULT_SETTINGS = {
   "mic_sensitivity": 50,
   "hotkey_enabled": True,
   "hotkey": "",
-  "tts_voice": "Default"
+  "tts_voice": "Default",
+  "network_warmup": True,
+  "weather_prefetch": True,
+  "max_command_seconds": 10,
+  "stt_backend": "google",
+  "vosk_model_path": "models/vosk",
+  "wake_refractory_seconds": 1.5,
+  "command_queue_size": 2,
+  "wake_gate_enabled": False,
+  "audio_process": False,
+  "settings_watch": True,
+  "settings_watch_poll": False,
+  "trace_commands": True
 }
 
-def load_settings() -> dict:
+# Bounds of numeric settings; values read from settings.json are clamped to
+# them (volume and mic_sensitivity are the GUI sliders' ranges)
+SETTING_RANGES = {
+  "volume": (0, 100),
+  "mic_sensitivity": (0, 100),
+  "max_command_seconds": (1, 60),
+  "wake_refractory_seconds": (0, 10),
+  "command_queue_size": (1, 16),
+}
+
+class SettingsSnapshot:
+    """
+    Read-only, typed view of the settings at one point in time.
+
+    Every key of DEFAULT_SETTINGS is an attribute, coerced to the type of its
+    default. Hot paths (like the audio callback) read `settings.snapshot`
+    once and use its attributes instead of repeated dict lookups on the
+    shared, mutable settings.
+    """
+
+    __slots__ = tuple(DEFAULT_SETTINGS)
+
+    def __init__(self, values: dict):
+        for key, default in DEFAULT_SETTINGS.items():
+            object.__setattr__(self, key, _coerce(values.get(key, default), default))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("settings snapshots are read-only")
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+# Strings accepted for boolean settings
+BOOL_STRINGS = {
+    "true": True, "yes": True, "on": True, "1": True,
+    "false": False, "no": False, "off": False, "0": False,
+}
+
+def _parse_bool(value) -> Optional[bool]:
+    """
+    Reads `value` as a boolean setting, or returns None if it isn't one.
+    """
+
+    if isinstance(value, bool):
+        return value
+    # bool("false") is True, so spell out what counts as on and off
+    if isinstance(value, str):
+        return BOOL_STRINGS.get(value.strip().lower())
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    return None
+
+def _coerce(value, default):
+    """
+    Converts `value` to the type of `default`, falling back to `default`.
+    """
+
+    if isinstance(default, bool):
+        parsed = _parse_bool(value)
+        return default if parsed is None else parsed
+    if isinstance(default, (int, float)):
+        # Sliders produce floats for integer defaults; keep them as numbers
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        try:
+            return type(default)(value)
+        except (TypeError, ValueError):
+            return default
+    if isinstance(default, str):
+        return value if isinstance(value, str) else str(value)
+    return value
+
+class SettingsWriter:
+    """
+    Writes settings to disk on a background thread.
+
+    Changes are coalesced: the file is written once changes have stopped for
+    `debounce` seconds, or at most `max_delay` seconds after the first
+    pending change, so dragging a slider costs one write instead of one per
+    event. The thread sleeps on an event while nothing is pending.
+    """
+
+    # Seconds a saved file still counts as our own when it is read back
+    OWN_WRITE_WINDOW = 5.0
+
+    def __init__(self, path: Path, debounce: float = 0.5, max_delay: float = 2.0):
+        self.path = path
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.writes = 0
+        self.changes = 0
+        self.last_written = None
+
+        # (time.monotonic(), data) of the latest saves, newest last
+        self.recent = deque(maxlen=8)
+
+        self.pending = None
+        self.changed = threading.Event()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def schedule(self, data: dict):
+        with self._lock:
+            self.pending = data
+            self.changes += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="raven-settings-writer")
+                self._thread.start()
+        self.changed.set()
+
+    def _run(self):
+        while True:
+            self.changed.wait()
+            first = time.monotonic()
+
+            # Keep waiting while changes keep coming, up to max_delay
+            while True:
+                self.changed.clear()
+                remaining = self.max_delay - (time.monotonic() - first)
+                if remaining <= 0 or not self.changed.wait(min(self.debounce, remaining)):
+                    break
+
+            self.flush()
+
+    def flush(self):
+        """
+        Writes any pending change now.
+        """
+
+        with self._write_lock:
+            with self._lock:
+                data, self.pending = self.pending, None
+                if data is None:
+                    return
+                # Recorded before the file is replaced, so a watcher that
+                # reads the new file right away knows it is ours
+                self.last_written = data
+                self.recent.append((time.monotonic(), data))
+            save_settings(data, self.path)
+            self.writes += 1
+
+    def owns(self, data: dict) -> bool:
+        """
+        True if `data` is the pending change or one of the latest saves. A
+        watcher can read a save late, after newer changes were made.
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            if self.pending is not None and data == self.pending:
+                return True
+            return any(data == saved for at, saved in self.recent if now - at <= self.OWN_WRITE_WINDOW)
+
+class Settings(dict):
+    """
+    The live settings: a dict that publishes every change.
+
+    Setting a key swaps in a new `snapshot` (a SettingsSnapshot, replaced in
+    one assignment so readers never see a half-applied change), notifies
+    observers with `observer(snapshot, key)` and schedules a coalesced write
+    to `path` (nothing is written when `path` is None).
+    """
+
+    def __init__(self, values: dict, path: Path = None):
+        super().__init__(values)
+        self.snapshot = SettingsSnapshot(self)
+        self.observers = []
+        self.writer = SettingsWriter(path) if path is not None else None
+        self._lock = threading.Lock()
+
+    def __setitem__(self, key, value):
+        self.apply({key: value})
+
+    def update(self, *args, **kwargs):
+        self.apply(dict(*args, **kwargs))
+
+    def apply(self, changes: dict, persist: bool = True) -> list:
+        """
+        Applies several changes with one snapshot swap, then notifies
+        observers once per changed key. `persist=False` skips the write
+        (used when the changes came from the file). Returns the changed keys.
+        """
+
+        with self._lock:
+            changed = [key for key, value in changes.items()
+                       if key not in self or dict.__getitem__(self, key) != value]
+            if not changed:
+                return changed
+            for key in changed:
+                super().__setitem__(key, changes[key])
+            snapshot = self.snapshot = SettingsSnapshot(self)
+            if persist and self.writer is not None:
+                self.writer.schedule(dict(self))
+
+        for key in changed:
+            for observer in self.observers:
+                try:
+                    observer(snapshot, key)
+                except Exception as e:
+                    print(f"Settings observer failed for {key!r}: {e!r}")
+        return changed
+
+    def subscribe(self, observer):
+        self.observers = self.observers + [observer]
+
+    def unsubscribe(self, observer):
+        self.observers = [o for o in self.observers if o is not observer]
+
+    def flush(self):
+        """
+        Writes pending changes to disk immediately (e.g. on shutdown).
+        """
+
+        if self.writer is not None:
+            self.writer.flush()
+
+def validate_settings(data: dict, current: dict) -> tuple:
+    """
+    Merges `data` read from settings.json with DEFAULT_SETTINGS.
+    Values that don't fit the type of their default keep their `current`
+    value; numbers outside SETTING_RANGES are clamped to it. Unknown keys
+    are kept as they are.
+
+    Returns (merged settings, list of rejected keys, list of clamped keys).
+    """
+
+    merged = dict(data)
+    rejected = []
+    clamped = []
+    for key, default in DEFAULT_SETTINGS.items():
+        if key not in data:
+            merged[key] = current.get(key, default)
+            continue
+
+        value = data[key]
+        if isinstance(default, bool):
+            # Hand-edited "false", "off", 0 and the like are read as booleans
+            value = _parse_bool(value)
+            ok = value is not None
+            if ok:
+                merged[key] = value
+        elif isinstance(default, (int, float)):
+            # NaN (which json accepts) can't be compared or clamped
+            ok = isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+        elif isinstance(default, str):
+            ok = isinstance(value, str)
+        else:
+            ok = True
+
+        if not ok:
+            rejected.append(key)
+            merged[key] = current.get(key, default)
+        elif key in SETTING_RANGES:
+            lo, hi = SETTING_RANGES[key]
+            if not lo <= value <= hi:
+                clamped.append(key)
+                merged[key] = min(max(value, lo), hi)
+    return merged, rejected, clamped
+
+class SettingsWatcher:
+    """
+    Applies external edits of settings.json to the live Settings.
+
+    Uses `watchdog` (inotify, ReadDirectoryChangesW, FSEvents) when it is
+    installed. Without it, and only if `poll` is set, the file's mtime and
+    size are compared every `interval` seconds; polling wakes the process
+    that often, so it is off by default. The file is re-read, validated and applied with
+    `Settings.apply(persist=False)`, so observers (listener, GUI) update
+    live. The writer's own saves produce no changes and are ignored.
+    """
+
+    def __init__(self, settings: Settings, path: Path = SETTINGS_PATH, interval: float = 1.0, poll: bool = False):
+        self.settings = settings
+        self.path = path
+        self.interval = interval
+        self.poll = poll
+        self.reloads = 0
+
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._observer = None
+        self._thread = None
+        self._last_error = None
+
+    def start(self) -> Optional[str]:
+        """
+        Starts watching. Returns "watchdog", "polling", or None when neither is available.
+        """
+
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            if not self.poll:
+                return None
+            self._thread = threading.Thread(target=self._poll, daemon=True, name="raven-settings-watcher")
+            self._thread.start()
+            return "polling"
+
+        watcher = self
+        target = os.path.abspath(self.path)
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                paths = (event.src_path, getattr(event, "dest_path", ""))
+                if any(p and os.path.abspath(p) == target for p in paths):
+                    watcher.reload()
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), str(self.path.parent), recursive=False)
+        self._observer.daemon = True
+        self._observer.start()
+        return "watchdog"
+
+    def stop(self, timeout: float = 2.0):
+        self.stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _poll(self):
+        last = self._stat()
+        while not self.stop_event.wait(self.interval):
+            current = self._stat()
+            if current != last:
+                last = current
+                self.reload()
+
+    def reload(self) -> list:
+        """
+        Re-reads settings.json and applies what changed. Returns the changed keys.
+        """
+
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                with self.path.open("r", encoding="utf-8") as fh:
+                    data = json.load(fh)
+                if not isinstance(data, dict):
+                    raise ValueError("expected a JSON object")
+            except (OSError, ValueError) as e:
+                # Editors often write in several steps; report each problem once
+                if str(e) != self._last_error:
+                    self._last_error = str(e)
+                    print(f"Ignoring settings.json change: {e}")
+                return []
+            self._last_error = None
+
+            # Our own save (possibly an older one) or what is already in
+            # memory; newer in-memory changes may still be pending
+            writer = self.settings.writer
+            if writer is not None and writer.owns(data):
+                return []
+            if data == dict(self.settings):
+                return []
+
+            merged, rejected, clamped = validate_settings(data, self.settings)
+            for key in rejected:
+                print(f"Ignoring invalid value for {key!r} in settings.json: {data[key]!r}")
+            for key in clamped:
+                print(f"Out of range value for {key!r} in settings.json: {data[key]!r}, using {merged[key]!r}")
+
+            changed = self.settings.apply(merged, persist=False)
+            if changed:
+                self.reloads += 1
+                print(f"Reloaded settings.json in {(time.perf_counter() - started) * 1000:.1f} ms "
+                      f"(changed: {', '.join(changed)})")
+            return changed
+
+def load_settings() -> Settings:
     """
     Loads the settings.json file.
     - If the file does not exist, create it with DEFAULT_SETTINGS.
     - If the file exists but is missing keys, they are filled in.
+    - Values of the wrong type are replaced by their default, numbers out
+      of range are clamped.
     - If loading fails, DEFAULT_SETTINGS is returned.
 
     Returns:
-        dict: The merged settings dictionary.
+        Settings: The merged settings, saved in the background when changed.
     """
 
     if not SETTINGS_PATH.exists():
@@ -42,32 +440,45 @@ def load_settings() -> dict:
         with SETTINGS_PATH.open("r", encoding="utf-8") as fh:
             file_data = json.load(fh)
 
-        # Merge file data with defaults (defaults override missing keys)
-        merged = DEFAULT_SETTINGS.copy()
-        for key, default_value in DEFAULT_SETTINGS.items():
-            merged[key] = file_data.get(key, default_value)
+        # Merge file data with defaults (defaults override missing or invalid keys)
+        merged, rejected, clamped = validate_settings(file_data, DEFAULT_SETTINGS)
+        for key in rejected:
+            print(f"Ignoring invalid value for {key!r} in settings.json: {file_data[key]!r}")
+        for key in clamped:
+            print(f"Out of range value for {key!r} in settings.json: {file_data[key]!r}, using {merged[key]!r}")
 
-        return merged
+        return Settings({key: merged[key] for key in DEFAULT_SETTINGS}, SETTINGS_PATH)
 
     except Exception as e:
         print(f"Failed to load settings.json — using defaults. Error: {e}")
-        return DEFAULT_SETTINGS.copy()
+        return Settings(DEFAULT_SETTINGS.copy(), SETTINGS_PATH)
 
-def save_settings(settings: dict):
+def save_settings(settings: dict, path: Path = SETTINGS_PATH):
     """
     Safely saves the settings to settings.json.
-    Uses a temporary file to avoid corruption on crash or interruption.
+    Uses a temporary file to avoid corruption on crash or interruption,
+    and fsyncs it so the replace can't leave an empty file after a power loss.
     """
 
-    tmp_path = SETTINGS_PATH.with_suffix(".tmp")
+    tmp_path = path.with_suffix(".tmp")
 
     try:
         # Write settings to temp file first
         with tmp_path.open("w", encoding="utf-8") as fh:
             json.dump(settings, fh, indent=2)
+            fh.flush()
+            os.fsync(fh.fileno())
 
         # Atomically replace the real settings file
-        tmp_path.replace(SETTINGS_PATH)
+        tmp_path.replace(path)
+
+        # Persist the rename itself (directories can't be opened on Windows)
+        if os.name == "posix":
+            fd = os.open(path.parent, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
 
     except Exception as e:
         print(f"Failed to save settings.json: {e}")
@@ -0,0 +1,146 @@
+import threading
+import time
+from typing import Callable, Optional
+
+class Subsystem:
+    """
+    One supervised part of the program.
+
+    `target(stop, ready)` runs the subsystem: it calls `ready()` once it is up,
+    blocks until the `stop` event is set and releases its resources before
+    returning. Returning or raising before `stop` is set counts as a crash.
+    `on_stop()`, if given, is called when stopping to unblock a target that
+    waits on something other than `stop`.
+    """
+
+    def __init__(self, name: str, target: Callable, restart: bool = True, on_stop: Optional[Callable] = None):
+        self.name = name
+        self.target = target
+        self.restart = restart
+        self.on_stop = on_stop
+
+        self.stop = threading.Event()
+        self.started = threading.Event()
+        self.thread = None
+        self.restarts = 0
+        self.startup_time = None
+        self.shutdown_time = None
+
+class Supervisor:
+    """
+    Starts, watches and stops the program's subsystems.
+
+    Subsystems start in the order they were added and stop in reverse, each
+    releasing its own resources. Crashed subsystems are restarted after a
+    backoff that doubles from RESTART_MIN_WAIT up to RESTART_MAX_WAIT and
+    resets once a run has lasted RESTART_RESET seconds. Every wait blocks on
+    an event, so an idle program doesn't wake up.
+    """
+
+    RESTART_MIN_WAIT = 0.5
+    RESTART_MAX_WAIT = 30.0
+    RESTART_RESET = 60.0
+
+    def __init__(self, name: str = "Raven"):
+        self.name = name
+        self.subsystems = []
+        self.shutdown_requested = threading.Event()
+
+    def add(self, name: str, target: Callable, restart: bool = True, on_stop: Optional[Callable] = None) -> Subsystem:
+        subsystem = Subsystem(name, target, restart, on_stop)
+        self.subsystems.append(subsystem)
+        return subsystem
+
+    def start(self, timeout: float = 10.0):
+        """
+        Starts every subsystem and waits up to `timeout` seconds for each to be ready.
+        """
+
+        began = time.perf_counter()
+        for subsystem in self.subsystems:
+            subsystem.thread = threading.Thread(target=self._run, args=(subsystem,), daemon=True, name=f"raven-{subsystem.name}")
+            subsystem.thread.start()
+
+        for subsystem in self.subsystems:
+            if not subsystem.started.wait(max(timeout - (time.perf_counter() - began), 0)):
+                print(f"[{self.name}] {subsystem.name} is still starting after {timeout:.0f}s")
+        print(f"[{self.name}] Started in {(time.perf_counter() - began) * 1000:.0f} ms")
+
+    def _run(self, subsystem: Subsystem):
+        backoff = self.RESTART_MIN_WAIT
+
+        while not subsystem.stop.is_set():
+            began = time.perf_counter()
+
+            def ready():
+                subsystem.startup_time = time.perf_counter() - began
+                print(f"[{self.name}] {subsystem.name} started in {subsystem.startup_time * 1000:.1f} ms")
+                subsystem.started.set()
+
+            try:
+                subsystem.target(subsystem.stop, ready)
+                if subsystem.stop.is_set() or not subsystem.restart:
+                    break
+                print(f"[{self.name}] {subsystem.name} exited unexpectedly")
+            except Exception as e:
+                print(f"[{self.name}] {subsystem.name} crashed: {e!r}")
+                if not subsystem.restart:
+                    break
+
+            # A failed first start shouldn't hold up the rest of the program
+            subsystem.started.set()
+
+            # Subsystems that ran for a while start again from the shortest wait
+            if time.perf_counter() - began >= self.RESTART_RESET:
+                backoff = self.RESTART_MIN_WAIT
+            print(f"[{self.name}] Restarting {subsystem.name} in {backoff:.1f}s")
+            if subsystem.stop.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.RESTART_MAX_WAIT)
+            subsystem.restarts += 1
+
+        # Don't leave start() waiting on a subsystem that never came up
+        subsystem.started.set()
+
+    def request_shutdown(self):
+        """
+        Asks the program to exit; safe to call from any thread (e.g. a GUI callback).
+        """
+
+        self.shutdown_requested.set()
+
+    def wait(self):
+        """
+        Blocks until a shutdown is requested.
+        """
+
+        try:
+            self.shutdown_requested.wait()
+        except KeyboardInterrupt:
+            self.shutdown_requested.set()
+
+    def stop(self, timeout: float = 3.0):
+        """
+        Stops the subsystems in reverse start order, giving each up to
+        `timeout` seconds to release its resources.
+        """
+
+        began = time.perf_counter()
+        for subsystem in reversed(self.subsystems):
+            stopping = time.perf_counter()
+            subsystem.stop.set()
+            if subsystem.on_stop is not None:
+                try:
+                    subsystem.on_stop()
+                except Exception as e:
+                    print(f"[{self.name}] Error stopping {subsystem.name}: {e!r}")
+
+            if subsystem.thread is not None:
+                subsystem.thread.join(timeout)
+                if subsystem.thread.is_alive():
+                    print(f"[{self.name}] {subsystem.name} did not stop within {timeout:.0f}s")
+                    continue
+
+            subsystem.shutdown_time = time.perf_counter() - stopping
+            print(f"[{self.name}] {subsystem.name} stopped in {subsystem.shutdown_time * 1000:.1f} ms")
+        print(f"[{self.name}] Shut down in {(time.perf_counter() - began) * 1000:.0f} ms")
@@ -0,0 +1,210 @@
+"""
+Per-command tracing.
+
+Each command gets a Trace with spans for the pipeline stages (wake, capture,
+endpoint, stt, intent, action) on the `time.perf_counter` clock. Finished
+traces are kept in memory for the control panel and written as JSON lines
+to a rotating file through a QueueHandler, so the threads that finish
+traces never wait on disk. Nothing runs on the audio callback: the wake
+span starts from the timestamp the detector already records.
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .settings import BASE_DIR
+
+TRACE_PATH = BASE_DIR / "data" / "traces.jsonl"
+TRACE_MAX_BYTES = 1_000_000
+TRACE_BACKUPS = 3
+
+STAGES = ("wake", "capture", "endpoint", "stt", "intent", "action")
+
+# Most recent finished traces, newest last
+recent = deque(maxlen=50)
+observers = []
+
+logger = logging.getLogger("raven.trace")
+logger.propagate = False
+queue_listener = None
+
+# The trace of the command being processed on this thread
+current = threading.local()
+
+class Trace:
+    """
+    Timing of one command through the pipeline.
+    """
+
+    __slots__ = ("id", "started", "spans", "attrs")
+
+    _ids = 0
+    _ids_lock = threading.Lock()
+
+    def __init__(self, started: Optional[float] = None):
+        with Trace._ids_lock:
+            Trace._ids += 1
+            self.id = Trace._ids
+        self.started = time.perf_counter() if started is None else started
+        self.spans = []
+        self.attrs = {}
+
+    def add(self, name: str, start: float, end: float):
+        self.spans.append((name, start, end))
+
+    def span(self, name: str):
+        return Span(self, name)
+
+    def durations(self) -> Dict[str, float]:
+        """
+        Seconds spent in each stage (summed if a stage occurs more than once).
+        """
+
+        totals = {}
+        for name, start, end in self.spans:
+            totals[name] = totals.get(name, 0.0) + end - start
+        return totals
+
+    def total(self) -> float:
+        return max((end for _, _, end in self.spans), default=self.started) - self.started
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "wall_time": time.time() - (time.perf_counter() - self.started),
+            "total_ms": round(self.total() * 1000, 3),
+            "spans": [{"name": name, "start_ms": round((start - self.started) * 1000, 3),
+                       "duration_ms": round((end - start) * 1000, 3)} for name, start, end in self.spans],
+            **self.attrs,
+        }
+
+class Span:
+    """
+    Context manager that records one span of a trace.
+    """
+
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: Optional[Trace], name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            self.trace.add(self.name, self.start, time.perf_counter())
+        return False
+
+def span(name: str) -> Span:
+    """
+    Records a span on this thread's current trace (a no-op without one).
+    """
+
+    return Span(getattr(current, "trace", None), name)
+
+def annotate(**attrs):
+    """
+    Adds attributes (e.g. intent, text) to this thread's current trace.
+    """
+
+    trace = getattr(current, "trace", None)
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+def detach() -> Optional[Trace]:
+    """
+    Hands this thread's current trace over to another thread, which then
+    finishes it (see actions/executor.py).
+    """
+
+    trace = getattr(current, "trace", None)
+    current.trace = None
+    return trace
+
+def start_file_logging(path: Path = TRACE_PATH):
+    """
+    Writes finished traces to a rotating JSONL file on a background thread.
+    """
+
+    global queue_listener
+    if queue_listener is not None:
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    records = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.setLevel(logging.INFO)
+    queue_listener = logging.handlers.QueueListener(records, handler)
+    queue_listener.start()
+
+def stop_file_logging():
+    """
+    Flushes queued traces to the file and stops the writer thread.
+    """
+
+    global queue_listener
+    if queue_listener is None:
+        return
+
+    queue_listener.stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    for handler in queue_listener.handlers:
+        handler.close()
+    queue_listener = None
+
+def finish(trace: Trace):
+    """
+    Records a finished trace: keeps it for the control panel, queues it for
+    the trace file and notifies observers.
+    """
+
+    recent.append(trace)
+    if queue_listener is not None:
+        logger.info("%s", json.dumps(trace.to_dict()))
+
+    for observer in observers:
+        try:
+            observer(trace)
+        except Exception as e:
+            print(f"[Raven] Trace observer failed: {e!r}")
+
+def subscribe(observer):
+    global observers
+    observers = observers + [observer]
+
+def unsubscribe(observer):
+    global observers
+    observers = [o for o in observers if o is not observer]
+
+def stage_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Returns p50/p95 milliseconds per stage (and in total) over the recent traces.
+    """
+
+    samples = {stage: [] for stage in STAGES + ("total",)}
+    for trace in list(recent):
+        for stage, seconds in trace.durations().items():
+            samples.setdefault(stage, []).append(seconds * 1000)
+        samples["total"].append(trace.total() * 1000)
+
+    return {stage: {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+            for stage, values in samples.items() if values}
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]